@@ -11,11 +11,16 @@ __init__.py - Shared global data.
 
 import re
 import os
+import tempfile
 from pathlib import Path
-from typing import TextIO
+
+from browser_choice.logwriter import LogWriter
+from browser_choice.runhistory import RunIndex
+from browser_choice.tracer import trace_function
 
 
 # pylint: disable=too-many-return-statements
+@trace_function
 def get_qube_type() -> str:
     """
     If running under Qubes OS, returns the qube type the application is
@@ -38,6 +43,7 @@ def get_qube_type() -> str:
     return "unknown"
 
 
+@trace_function
 def get_qubes_version() -> str:
     """
     If running under Qubes OS, returns the Qubes OS version this VM is running
@@ -67,6 +73,44 @@ def get_qubes_version() -> str:
     return "0"
 
 
+@trace_function
+def get_cache_dir() -> Path:
+    """
+    Returns the directory browser-choice should store cached data in,
+    following the XDG Base Directory Specification.
+    """
+
+    xdg_cache_home: str = os.environ.get("XDG_CACHE_HOME", "")
+    if xdg_cache_home != "" and Path(xdg_cache_home).is_absolute():
+        return Path(xdg_cache_home).joinpath("browser-choice")
+    return Path.home().joinpath(".cache/browser-choice")
+
+
+def write_cache_file(cache_file_path: Path, cache_text: str) -> None:
+    """
+    Atomically replaces a cache file with the specified text, so that a crash
+    or a concurrent reader never sees a partially written file. Failing to
+    write a cache file is not an error, so all errors are ignored.
+    """
+
+    temp_file_name: str | None = None
+    try:
+        cache_file_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            encoding="utf-8",
+            dir=cache_file_path.parent,
+            prefix=f".{cache_file_path.name}.",
+            delete=False,
+        ) as temp_file:
+            temp_file_name = temp_file.name
+            temp_file.write(cache_text)
+        os.replace(temp_file_name, cache_file_path)
+    except Exception:
+        if temp_file_name is not None:
+            Path(temp_file_name).unlink(missing_ok=True)
+
+
 def get_usersession_warn_label() -> str:
     """
     Gets the usersession_warn_label string appropriate for the current
@@ -91,7 +135,25 @@ class GlobalData:
     plugin_dir: Path = Path("/usr/share/browser-choice/plugins")
     log_dir_path: Path = Path.home().joinpath(".local/share/browser-choice")
     log_file_path: Path = log_dir_path.joinpath("log.txt")
-    log_file: TextIO | None = None
+    log_writer: LogWriter | None = None
+    log_index_file_path: Path = log_dir_path.joinpath("log-index.json")
+    run_index: RunIndex | None = None
+    benchmark_results_file_path: Path = log_dir_path.joinpath(
+        "benchmark-results.jsonl"
+    )
+    cache_dir_path: Path = get_cache_dir()
+    probe_cache_file_path: Path = cache_dir_path.joinpath("probe-cache.json")
+    plugin_index_file_path: Path = cache_dir_path.joinpath("plugin-index.json")
+    icon_cache_dir_path: Path = cache_dir_path.joinpath("icons")
+    apt_lists_max_age_file_path: Path = Path(
+        "/etc/browser-choice/apt-lists-max-age"
+    )
+    speculative_download_file_path: Path = Path(
+        "/etc/browser-choice/speculative-download"
+    )
+    log_view_max_lines_file_path: Path = Path(
+        "/etc/browser-choice/log-view-max-lines"
+    )
     qube_type: str = get_qube_type()
     qubes_version: str = get_qubes_version()
     uid = os.getuid()
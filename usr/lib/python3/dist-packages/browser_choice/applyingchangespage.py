@@ -6,23 +6,59 @@
 # pylint: disable=invalid-name,
 
 """
-applyingchangespage.py - Displays a log showing progress of application installation or removal.
+applyingchangespage.py - Displays logs showing progress of application installations or removals.
 """
 
-from PyQt5.QtCore import pyqtSignal
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtCore import (
+    pyqtSignal,
+    QTimer,
+)
+from PyQt5.QtWidgets import (
+    QLabel,
+    QPlainTextEdit,
+    QProgressBar,
+    QVBoxLayout,
+    QWidget,
+)
+
+from browser_choice import GlobalData
 
 ## NOTE: _ui modules are autogenerated by build-ui.sh.
 from browser_choice.applyingchangespage_ui import Ui_ApplyingChangesPage
 
+## How often queued log lines are added to the log views, in milliseconds.
+## Adding lines one at a time makes the GUI lag when an operation prints a
+## lot of output.
+LOG_VIEW_UPDATE_INTERVAL: int = 33
+DEFAULT_LOG_VIEW_MAX_LINES: int = 10000
+
+
+def get_log_view_max_lines() -> int:
+    """
+    Returns how many lines each log view keeps before discarding the oldest
+    ones. 0 means no lines are discarded. The log file always contains all
+    lines.
+    """
+
+    try:
+        max_lines_str: str = GlobalData.log_view_max_lines_file_path.read_text(
+            encoding="utf-8"
+        ).split("\n", maxsplit=1)[0]
+    except OSError:
+        return DEFAULT_LOG_VIEW_MAX_LINES
+    if not max_lines_str.isascii() or not max_lines_str.isdigit():
+        return DEFAULT_LOG_VIEW_MAX_LINES
+    return int(max_lines_str)
+
 
 class ApplyingChangesPage(QWidget):
     """
-    A wizard screen widget that displays the log output of a software change
-    operation.
+    A wizard screen widget that displays the progress and log output of
+    software change operations, one tab per operation.
     """
 
     continueClicked: pyqtSignal = pyqtSignal()
+    queueMoreClicked: pyqtSignal = pyqtSignal()
 
     def __init__(
         self,
@@ -33,6 +69,18 @@ class ApplyingChangesPage(QWidget):
         self.ui.setupUi(self)
         self.ui.continueButton.setEnabled(False)
         self.ui.continueButton.clicked.connect(self.continueClicked)
+        self.ui.queueMoreButton.clicked.connect(self.queueMoreClicked)
+        self.log_view_list: list[QPlainTextEdit] = []
+        self.progress_label_list: list[QLabel] = []
+        self.progress_bar_list: list[QProgressBar] = []
+        self.log_view_max_lines: int = get_log_view_max_lines()
+        self.ui.logView.setMaximumBlockCount(self.log_view_max_lines)
+
+        ## Lines waiting to be added to each log view, by operation index.
+        self.pending_line_dict: dict[int, list[str]] = {}
+        self.log_view_timer: QTimer = QTimer(self)
+        self.log_view_timer.setSingleShot(True)
+        self.log_view_timer.timeout.connect(self.flushLogLines)
 
     def setContinueEnabled(self, val: bool) -> None:
         """
@@ -41,9 +89,88 @@ class ApplyingChangesPage(QWidget):
 
         self.ui.continueButton.setEnabled(val)
 
-    def logLine(self, line: str) -> None:
+    def addOperation(self, title: str) -> int:
+        """
+        Adds a log view for a software change operation. Returns the index of
+        the operation's log view.
+        """
+
+        ## The first operation uses the tab from the .ui file, further
+        ## operations get a tab of their own that looks the same.
+        if len(self.log_view_list) == 0:
+            self.ui.operationTabWidget.setTabText(0, title)
+            self.log_view_list.append(self.ui.logView)
+            self.progress_label_list.append(self.ui.progressLabel)
+            self.progress_bar_list.append(self.ui.progressBar)
+            return 0
+
+        operation_tab: QWidget = QWidget()
+        tab_layout: QVBoxLayout = QVBoxLayout(operation_tab)
+        tab_layout.setContentsMargins(0, 0, 0, 0)
+        progress_label: QLabel = QLabel(self.ui.progressLabel.text())
+        progress_label.setWordWrap(True)
+        progress_bar: QProgressBar = QProgressBar()
+        progress_bar.setRange(0, 0)
+        log_view: QPlainTextEdit = QPlainTextEdit()
+        log_view.setStyleSheet(self.ui.logView.styleSheet())
+        log_view.setReadOnly(True)
+        log_view.setMaximumBlockCount(self.log_view_max_lines)
+        tab_layout.addWidget(progress_label)
+        tab_layout.addWidget(progress_bar)
+        tab_layout.addWidget(log_view)
+        self.log_view_list.append(log_view)
+        self.progress_label_list.append(progress_label)
+        self.progress_bar_list.append(progress_bar)
+        self.ui.operationTabWidget.addTab(operation_tab, title)
+        self.ui.operationTabWidget.setCurrentWidget(operation_tab)
+        return len(self.log_view_list) - 1
+
+    def setOperationProgress(
+        self,
+        operation_idx: int,
+        progress_str: str,
+        percent: float | None,
+        is_done: bool = False,
+    ) -> None:
+        """
+        Shows the progress of an operation. The progress bar shows activity
+        without a percentage while the percentage is unknown, unless the
+        operation is done.
+        """
+
+        self.progress_label_list[operation_idx].setText(progress_str)
+        progress_bar: QProgressBar = self.progress_bar_list[operation_idx]
+        if percent is None and not is_done:
+            progress_bar.setRange(0, 0)
+            return
+        progress_bar.setRange(0, 100)
+        if percent is not None:
+            progress_bar.setValue(round(percent))
+
+    def logLine(self, line: str, operation_idx: int = 0) -> None:
+        """
+        Queues a line of text to be appended to the log view of an operation.
+        Queued lines are appended together shortly afterwards.
+        """
+
+        self.pending_line_dict.setdefault(operation_idx, []).append(line)
+        if not self.log_view_timer.isActive():
+            self.log_view_timer.start(LOG_VIEW_UPDATE_INTERVAL)
+
+    def flushLogLines(self) -> None:
         """
-        Appends a line of text to the log view.
+        Appends all queued lines to the log views. Lines that would be
+        discarded right away due to the line limit are skipped.
         """
 
-        self.ui.logView.appendPlainText(line)
+        self.log_view_timer.stop()
+        for operation_idx, line_list in self.pending_line_dict.items():
+            if 0 < self.log_view_max_lines < len(line_list):
+                line_list = line_list[-self.log_view_max_lines :]
+            log_view: QPlainTextEdit = (
+                self.log_view_list[operation_idx]
+                if len(self.log_view_list) != 0
+                else self.ui.logView
+            )
+            log_view.appendPlainText("\n".join(line_list))
+        self.pending_line_dict.clear()
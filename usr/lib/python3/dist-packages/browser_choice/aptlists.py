@@ -0,0 +1,124 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+aptlists.py - Tracks whether the APT package lists are fresh enough that
+refreshing them before installing can be skipped.
+"""
+
+## NOTE: Keep in sync with /usr/libexec/browser-choice/apt-update-maybe.
+
+import time
+from pathlib import Path
+
+from browser_choice import GlobalData
+
+APT_LISTS_DIR: Path = Path("/var/lib/apt/lists")
+APT_SOURCES_PATH_LIST: list[Path] = [
+    Path("/etc/apt/sources.list"),
+    Path("/etc/apt/sources.list.d"),
+]
+DEFAULT_APT_LISTS_MAX_AGE: int = 3600
+
+## Helper scripts that only refresh the package lists if they are outdated,
+## using apt-update-maybe, along with the APT sources each helper installs
+## before doing so. If those sources are not installed yet, the helper will
+## always refresh the package lists.
+APT_UPDATE_MAYBE_HELPER_DICT: dict[str, list[Path]] = {
+    "/usr/libexec/browser-choice/tor-browser-install-helper": [],
+    "/usr/libexec/browser-choice/mullvad-browser-install-helper": [
+        Path("/etc/apt/sources.list.d/mullvad.sources"),
+    ],
+}
+
+
+def get_apt_lists_max_age() -> int:
+    """
+    Returns the maximum age of the package lists in seconds for them to still
+    count as fresh. 0 means the package lists are always refreshed.
+    """
+
+    try:
+        max_age_str: str = GlobalData.apt_lists_max_age_file_path.read_text(
+            encoding="utf-8"
+        ).split("\n", maxsplit=1)[0]
+    except OSError:
+        return DEFAULT_APT_LISTS_MAX_AGE
+    ## Surrounding whitespace is ignored, as by apt-update-maybe.
+    max_age_str = max_age_str.strip(" \t\r\f\v")
+    if not max_age_str.isascii() or not max_age_str.isdigit():
+        return DEFAULT_APT_LISTS_MAX_AGE
+    return int(max_age_str)
+
+
+def get_newest_mtime(path_list: list[Path]) -> int | None:
+    """
+    Returns the newest modification time, in whole seconds since the epoch,
+    of the specified files and directories and the files directly inside
+    them. Returns None if none of them exist.
+    """
+
+    newest_mtime: int | None = None
+    for path in path_list:
+        try:
+            entry_list: list[Path] = [path]
+            if path.is_dir():
+                entry_list.extend(path.iterdir())
+            for entry in entry_list:
+                if entry.name in ("lock", "partial"):
+                    continue
+                entry_mtime: int = int(entry.stat().st_mtime)
+                if newest_mtime is None or entry_mtime > newest_mtime:
+                    newest_mtime = entry_mtime
+        except OSError:
+            continue
+    return newest_mtime
+
+
+def get_apt_lists_age() -> int | None:
+    """
+    Returns how many seconds ago the package lists were last refreshed, or
+    None if they are older than the APT sources, and thus outdated no matter
+    their age.
+    """
+
+    lists_time: int | None = get_newest_mtime([APT_LISTS_DIR])
+    if lists_time is None:
+        return None
+    sources_time: int | None = get_newest_mtime(APT_SOURCES_PATH_LIST)
+    if sources_time is not None and sources_time > lists_time:
+        return None
+    return int(time.time()) - lists_time
+
+
+def apt_lists_are_fresh(required_source_list: list[Path] | None = None) -> bool:
+    """
+    Returns True if the package lists are newer than all APT sources, and
+    younger than the configured maximum age. If any of the specified APT
+    sources are not installed, the package lists are not fresh since they
+    will have to be refreshed after installing them.
+    """
+
+    if required_source_list is not None and not all(
+        x.exists() for x in required_source_list
+    ):
+        return False
+    max_age: int = get_apt_lists_max_age()
+    if max_age == 0:
+        return False
+    lists_age: int | None = get_apt_lists_age()
+    return lists_age is not None and lists_age <= max_age
+
+
+def get_update_maybe_helper_sources(script: str) -> list[Path] | None:
+    """
+    If a script runs a helper that uses apt-update-maybe, returns the APT
+    sources the helper installs. Returns None otherwise.
+    """
+
+    for helper_path, source_list in APT_UPDATE_MAYBE_HELPER_DICT.items():
+        if helper_path in script.split():
+            return source_list
+    return None
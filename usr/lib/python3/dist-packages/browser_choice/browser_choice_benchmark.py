@@ -0,0 +1,573 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+browser_choice_benchmark.py - Measures how long browser-choice takes to load
+and probe plugins, and how much memory it needs to do so, using generated
+plugin catalogs whose probe scripts are stubs that only wait for a
+configurable time. Runs offline, without changing the system. Results are
+stored so that different versions of browser-choice can be compared.
+
+Run with 'python3 -m browser_choice.browser_choice_benchmark'.
+"""
+
+## NOTE: browser_choice_core reads its cache file paths from GlobalData when
+## it is imported, so every measurement runs in a worker process started with
+## its own XDG_CACHE_HOME. This also keeps the peak memory usage of each
+## measurement separate, and makes sure no probe results are remembered
+## from a previous measurement.
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from browser_choice import GlobalData
+
+BENCHMARK_PLUGIN_COUNT_LIST: list[int] = [10, 50, 200]
+BENCHMARK_REPO_COUNT_LIST: list[int] = [1, 4]
+## How long each stub probe script takes, in seconds.
+BENCHMARK_PROBE_LATENCY: float = 0.02
+## Number of times each measurement is repeated. The median is recorded.
+BENCHMARK_REPEAT_COUNT: int = 3
+## Relative increase of a metric that is reported as a regression.
+BENCHMARK_REGRESSION_THRESHOLD: float = 0.1
+## Number of categories generated plugins are spread over.
+BENCHMARK_CATEGORY_COUNT: int = 3
+
+## Stub used as the install-status, capability and unprivileged-check-script
+## of every generated repo. Its arguments are the time to wait and the exit
+## code. The plugin and repo are passed as well so that every probe command
+## is distinct, since the probe memo only runs each distinct command once.
+PROBE_STUB_SCRIPT: str = """#!/bin/sh
+[ "$1" = "0" ] || sleep "$1"
+exit "$2"
+"""
+
+BENCHMARK_LOGO_SVG: str = """<svg xmlns="http://www.w3.org/2000/svg" \
+width="16" height="16"><rect width="16" height="16" fill="#888"/></svg>
+"""
+
+## Metrics recorded for each case, all of which are better when lower.
+BENCHMARK_METRIC_LIST: list[str] = [
+    "import-s",
+    "cold-parse-s",
+    "cold-probe-s",
+    "cold-total-s",
+    "cold-probe-script-count",
+    "warm-parse-s",
+    "warm-probe-s",
+    "warm-total-s",
+    "warm-probe-script-count",
+    "peak-rss-kib",
+    "alloc-peak-kib",
+    "alloc-retained-kib",
+]
+
+
+def write_plugin_catalog(
+    catalog_dir: Path,
+    plugin_count: int,
+    repo_count: int,
+    probe_latency: float,
+) -> None:
+    """
+    Generates a plugin directory with plugin_count plugins of repo_count repos
+    each, along with a probe stub and a logo in catalog_dir. The plugins are
+    written to the 'plugins' subdirectory. Installation scripts are never
+    run, so they are left as harmless placeholders.
+    """
+
+    plugin_dir: Path = catalog_dir.joinpath("plugins")
+    plugin_dir.mkdir(parents=True, exist_ok=True)
+    stub_path: Path = catalog_dir.joinpath("probe-stub")
+    stub_path.write_text(PROBE_STUB_SCRIPT, encoding="utf-8")
+    stub_path.chmod(0o755)
+    logo_path: Path = catalog_dir.joinpath("logo.svg")
+    logo_path.write_text(BENCHMARK_LOGO_SVG, encoding="utf-8")
+
+    for plugin_idx in range(plugin_count):
+        plugin_name: str = f"plugin-{plugin_idx:04}"
+        line_list: list[str] = [
+            "[product]",
+            f"product-name=Benchmark App {plugin_idx:04}",
+            "product-category=Category "
+            + f"{plugin_idx % BENCHMARK_CATEGORY_COUNT}",
+            "product-website=https://example.com/product",
+            f"product-logo={logo_path}",
+            "vendor-name=Benchmark Vendor",
+            "vendor-website=https://example.com/vendor",
+            f"vendor-logo={logo_path}",
+            "wiki=https://example.com/wiki",
+            "official-plugin=yes",
+        ]
+        for repo_idx in range(repo_count):
+            repo_name: str = f"repo-{repo_idx}"
+            probe_args: str = f"{plugin_name} {repo_name}"
+            line_list.extend(
+                [
+                    "",
+                    f"[repo:{repo_name}]",
+                    f"method-name=Benchmark App from {repo_name}",
+                    f"method-name-short=Repo ({repo_idx})",
+                    f"method-subtext=Benchmark App from {repo_name}.",
+                    f"method-logo={logo_path}",
+                    "method-type=apt-thirdparty",
+                    "install-warn-text=",
+                    f"unprivileged-check-script={stub_path} "
+                    + f"{probe_latency:g} 1 {probe_args}",
+                    "update-and-install-script=",
+                    "install-script=true",
+                    "uninstall-script=true",
+                    "purge-script=",
+                    "update-and-install-script-unprivileged=",
+                    "install-script-unprivileged=true",
+                    "uninstall-script-unprivileged=true",
+                    "purge-script-unprivileged=",
+                    "launch-script=true",
+                    f"install-status={stub_path} "
+                    + f"{probe_latency:g} 1 {probe_args}",
+                    f"capability={stub_path} "
+                    + f"{probe_latency:g} 0 {probe_args}",
+                ]
+            )
+        plugin_dir.joinpath(f"{plugin_name}.txt").write_text(
+            "\n".join(line_list) + "\n", encoding="utf-8"
+        )
+
+
+# pylint: disable=too-many-locals
+def measure_plugin_loading(
+    plugin_dir: Path, trace_allocations: bool
+) -> dict[str, Any]:
+    """
+    Loads and probes all plugins in plugin_dir through parse_config_dir,
+    measuring how long each step takes. If trace_allocations is True, memory
+    allocated while doing so is traced, which makes it much slower. Runs in
+    a worker process.
+    """
+
+    import_start: float = time.perf_counter()
+    # pylint: disable=import-outside-toplevel
+    from browser_choice.browser_choice_core import (
+        ChoicePluginCategory,
+        parse_config_dir,
+        repo_probe_cache,
+        repo_probe_memo,
+    )
+
+    parse_start: float = time.perf_counter()
+    if trace_allocations:
+        tracemalloc.start()
+    plugin_data: list[ChoicePluginCategory] = parse_config_dir(
+        plugin_dir, lazy_probing=True
+    )
+    probe_start: float = time.perf_counter()
+    for plugin_category in plugin_data:
+        for plugin in plugin_category.plugin_list:
+            for repo in plugin.repo_list:
+                repo.wait_for_probes()
+    probe_end: float = time.perf_counter()
+    ## Normally saved once the probe engine is idle, which may be after
+    ## this process would have exited.
+    repo_probe_cache.save()
+
+    result_dict: dict[str, Any] = {
+        "import-s": parse_start - import_start,
+        "parse-s": probe_start - parse_start,
+        "probe-s": probe_end - probe_start,
+        "total-s": probe_end - parse_start,
+        "probe-script-count": repo_probe_memo.counters()["misses"],
+        "peak-rss-kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+    if trace_allocations:
+        alloc_retained: int
+        alloc_peak: int
+        alloc_retained, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result_dict["alloc-peak-kib"] = alloc_peak // 1024
+        result_dict["alloc-retained-kib"] = alloc_retained // 1024
+    return result_dict
+
+
+def run_worker(
+    plugin_dir: Path, cache_dir: Path, trace_allocations: bool
+) -> dict[str, Any]:
+    """
+    Runs measure_plugin_loading in a worker process using the specified cache
+    directory, and returns its result. The worker imports browser_choice from
+    the same place as this module.
+    """
+
+    env_dict: dict[str, str] = dict(os.environ)
+    env_dict["XDG_CACHE_HOME"] = str(cache_dir)
+    env_dict["PYTHONPATH"] = str(Path(__file__).resolve().parent.parent)
+    env_dict.pop("BROWSER_CHOICE_TRACE", None)
+    worker_arg_list: list[str] = [
+        sys.executable,
+        "-m",
+        "browser_choice.browser_choice_benchmark",
+        "--worker",
+        str(plugin_dir),
+    ]
+    if trace_allocations:
+        worker_arg_list.append("--trace-allocations")
+    worker_process: subprocess.CompletedProcess[str] = subprocess.run(
+        worker_arg_list,
+        env=env_dict,
+        check=False,
+        capture_output=True,
+        encoding="utf-8",
+    )
+    if worker_process.returncode != 0:
+        raise RuntimeError(
+            "Benchmark worker failed:\n" + worker_process.stderr.strip()
+        )
+    result_dict: dict[str, Any] = json.loads(worker_process.stdout)
+    return result_dict
+
+
+def run_case(
+    plugin_count: int,
+    repo_count: int,
+    probe_latency: float,
+    repeat_count: int,
+) -> dict[str, Any]:
+    """
+    Measures loading a generated plugin catalog repeat_count times. Each
+    repetition loads the catalog once with empty caches (cold) and once more
+    with the caches the first load left behind (warm), like the first and
+    later starts of browser-choice. Allocations are traced in a separate,
+    cold load. Returns the median of each metric.
+    """
+
+    with tempfile.TemporaryDirectory(
+        prefix="browser-choice-benchmark."
+    ) as temp_dir_str:
+        temp_dir: Path = Path(temp_dir_str)
+        write_plugin_catalog(temp_dir, plugin_count, repo_count, probe_latency)
+        plugin_dir: Path = temp_dir.joinpath("plugins")
+
+        sample_dict: dict[str, list[float]] = {}
+        for repeat_idx in range(repeat_count):
+            cache_dir: Path = temp_dir.joinpath(f"cache-{repeat_idx}")
+            for run_name in ("cold", "warm"):
+                result_dict: dict[str, Any] = run_worker(
+                    plugin_dir, cache_dir, False
+                )
+                for key in (
+                    "parse-s",
+                    "probe-s",
+                    "total-s",
+                    "probe-script-count",
+                ):
+                    sample_dict.setdefault(f"{run_name}-{key}", []).append(
+                        result_dict[key]
+                    )
+                for key in ("import-s", "peak-rss-kib"):
+                    sample_dict.setdefault(key, []).append(result_dict[key])
+
+        alloc_dict: dict[str, Any] = run_worker(
+            plugin_dir, temp_dir.joinpath("cache-alloc"), True
+        )
+
+    metric_dict: dict[str, float] = {
+        key: statistics.median(value_list)
+        for key, value_list in sample_dict.items()
+    }
+    metric_dict["alloc-peak-kib"] = alloc_dict["alloc-peak-kib"]
+    metric_dict["alloc-retained-kib"] = alloc_dict["alloc-retained-kib"]
+    return {
+        "case": {
+            "plugins": plugin_count,
+            "repos": repo_count,
+            "probe-latency": probe_latency,
+        },
+        "metrics": {
+            key: metric_dict[key]
+            for key in BENCHMARK_METRIC_LIST
+            if key in metric_dict
+        },
+    }
+
+
+def get_default_label() -> str:
+    """
+    Returns a label identifying the version of browser-choice being
+    measured, from git if this module is in a git checkout.
+    """
+
+    try:
+        describe_process: subprocess.CompletedProcess[str] = subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=Path(__file__).resolve().parent,
+            check=False,
+            capture_output=True,
+            encoding="utf-8",
+        )
+    except OSError:
+        return "unknown"
+    if describe_process.returncode != 0:
+        return "unknown"
+    return describe_process.stdout.strip()
+
+
+def load_result_list(results_path: Path) -> list[dict[str, Any]]:
+    """
+    Loads stored benchmark results, oldest first. Lines that can't be parsed
+    are skipped. Returns an empty list if there are no stored results.
+    """
+
+    try:
+        results_text: str = results_path.read_text(encoding="utf-8")
+    except OSError:
+        return []
+    result_list: list[dict[str, Any]] = []
+    for results_line in results_text.splitlines():
+        try:
+            result_dict: Any = json.loads(results_line)
+        except ValueError:
+            continue
+        if (
+            isinstance(result_dict, dict)
+            and isinstance(result_dict.get("case"), dict)
+            and isinstance(result_dict.get("metrics"), dict)
+        ):
+            result_list.append(result_dict)
+    return result_list
+
+
+def find_baseline(
+    result_dict: dict[str, Any],
+    result_list: list[dict[str, Any]],
+    baseline_label: str | None,
+) -> dict[str, Any] | None:
+    """
+    Returns the most recent stored result of the same case to compare a
+    result with. If baseline_label is None, that is the most recent result
+    with a different label, so that a version is compared to the previous
+    one rather than to itself.
+    """
+
+    for stored_idx in range(len(result_list) - 1, -1, -1):
+        stored_dict: dict[str, Any] = result_list[stored_idx]
+        if stored_dict["case"] != result_dict["case"]:
+            continue
+        stored_label: Any = stored_dict.get("label")
+        if (
+            stored_label != result_dict["label"]
+            if baseline_label is None
+            else stored_label == baseline_label
+        ):
+            return stored_dict
+    return None
+
+
+def compare_result(
+    result_dict: dict[str, Any],
+    baseline_dict: dict[str, Any] | None,
+    threshold: float,
+) -> tuple[list[str], bool]:
+    """
+    Describes a result, along with how each metric changed from the baseline
+    if there is one. Returns the lines of the description and whether any
+    metric regressed by more than threshold.
+    """
+
+    case_dict: dict[str, Any] = result_dict["case"]
+    line_list: list[str] = [
+        f"{case_dict['plugins']} plugins x {case_dict['repos']} repos, "
+        + f"{case_dict['probe-latency']} s probe latency"
+        + (
+            f" (compared to {baseline_dict.get('label')})"
+            if baseline_dict is not None
+            else ""
+        )
+    ]
+    has_regression: bool = False
+    for key, value in result_dict["metrics"].items():
+        metric_line: str = f"  {key:<24} {value:12.4f}"
+        baseline_value: Any = (
+            baseline_dict["metrics"].get(key)
+            if baseline_dict is not None
+            else None
+        )
+        if isinstance(baseline_value, (int, float)) and baseline_value > 0:
+            change: float = (value - baseline_value) / baseline_value
+            metric_line += f" {baseline_value:12.4f} {change:+8.1%}"
+            if change > threshold:
+                metric_line += "  REGRESSION"
+                has_regression = True
+        line_list.append(metric_line)
+    return line_list, has_regression
+
+
+def parse_count_list(count_list_str: str) -> list[int]:
+    """
+    Parses a comma-separated list of positive numbers given on the command
+    line.
+    """
+
+    try:
+        count_list: list[int] = [int(x) for x in count_list_str.split(",")]
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(
+            f"'{count_list_str}' is not a comma-separated list of numbers"
+        ) from e
+    if any(x < 1 for x in count_list):
+        raise argparse.ArgumentTypeError("counts must be at least 1")
+    return count_list
+
+
+def main(arg_list: list[str]) -> int:
+    """
+    Main function of the benchmark suite. Returns the exit code.
+    """
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="python3 -m browser_choice.browser_choice_benchmark",
+        description="Measure loading and probing generated plugin catalogs, "
+        + "and compare the results with those of other versions. Exits "
+        + "with status 3 if any metric regressed.",
+    )
+    parser.add_argument(
+        "--plugins",
+        type=parse_count_list,
+        default=BENCHMARK_PLUGIN_COUNT_LIST,
+        metavar="N[,N...]",
+        help="numbers of plugins to generate",
+    )
+    parser.add_argument(
+        "--repos",
+        type=parse_count_list,
+        default=BENCHMARK_REPO_COUNT_LIST,
+        metavar="M[,M...]",
+        help="numbers of repos per plugin to generate",
+    )
+    parser.add_argument(
+        "--probe-latency",
+        type=float,
+        default=BENCHMARK_PROBE_LATENCY,
+        metavar="SECONDS",
+        help="how long each stub probe script takes",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=BENCHMARK_REPEAT_COUNT,
+        metavar="COUNT",
+        help="how often to repeat each measurement",
+    )
+    parser.add_argument(
+        "--label",
+        help="label to store results under, by default the git version",
+    )
+    parser.add_argument(
+        "--baseline",
+        metavar="LABEL",
+        help="label of the stored results to compare with, by default the "
+        + "most recent results with a different label",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=BENCHMARK_REGRESSION_THRESHOLD,
+        help="relative increase of a metric reported as a regression",
+    )
+    parser.add_argument(
+        "--results",
+        type=Path,
+        default=GlobalData.benchmark_results_file_path,
+        metavar="PATH",
+        help="file results are stored in",
+    )
+    parser.add_argument(
+        "--no-store",
+        action="store_true",
+        help="don't store the results",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print results as JSON",
+    )
+    parser.add_argument("--worker", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument(
+        "--trace-allocations", action="store_true", help=argparse.SUPPRESS
+    )
+    args: argparse.Namespace = parser.parse_args(arg_list)
+
+    if args.worker is not None:
+        print(
+            json.dumps(
+                measure_plugin_loading(args.worker, args.trace_allocations)
+            )
+        )
+        return 0
+
+    if args.probe_latency < 0:
+        parser.error("--probe-latency must not be negative")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    label: str = args.label if args.label is not None else get_default_label()
+    stored_result_list: list[dict[str, Any]] = load_result_list(args.results)
+    new_result_list: list[dict[str, Any]] = []
+    has_regression: bool = False
+    for plugin_count in args.plugins:
+        for repo_count in args.repos:
+            try:
+                result_dict: dict[str, Any] = run_case(
+                    plugin_count, repo_count, args.probe_latency, args.repeat
+                )
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+                return 1
+            result_dict = {
+                "label": label,
+                "timestamp": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "cpus": os.cpu_count(),
+                **result_dict,
+            }
+            new_result_list.append(result_dict)
+            baseline_dict: dict[str, Any] | None = find_baseline(
+                result_dict, stored_result_list, args.baseline
+            )
+            line_list: list[str]
+            case_regressed: bool
+            line_list, case_regressed = compare_result(
+                result_dict, baseline_dict, args.threshold
+            )
+            has_regression = has_regression or case_regressed
+            if not args.json:
+                print("\n".join(line_list), flush=True)
+
+    if args.json:
+        print(json.dumps({"results": new_result_list}, indent=2))
+
+    if not args.no_store:
+        try:
+            args.results.parent.mkdir(parents=True, exist_ok=True)
+            with open(args.results, mode="a", encoding="utf-8") as results_file:
+                for result_dict in new_result_list:
+                    results_file.write(json.dumps(result_dict) + "\n")
+        except OSError as e:
+            print(f"WARNING: Could not store results: {e}", file=sys.stderr)
+
+    return 3 if has_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,224 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+# pylint: disable=broad-exception-caught
+
+"""
+browser_choice_cli.py - Command line interface of browser-choice, for
+querying plugin state and past runs without starting the GUI.
+"""
+
+import sys
+import json
+import argparse
+from typing import Any
+
+from browser_choice import GlobalData
+from browser_choice.browser_choice_core import (
+    ChoicePlugin,
+    ChoicePluginCategory,
+    parse_config_dir,
+)
+from browser_choice.runhistory import load_run_list, read_run_output
+
+## Options that select the command line interface. Any other arguments are
+## passed to the launch script of the application the user chooses in the
+## GUI, so only these options may be taken over here.
+CLI_OPTION_LIST: list[str] = [
+    "--list",
+    "--history",
+    "--show-run",
+    "--json",
+]
+
+
+def is_cli_invocation(arg_list: list[str]) -> bool:
+    """
+    Returns True if browser-choice was started with command line interface
+    options, in any order, rather than to start the GUI.
+    """
+
+    return any(
+        arg.split("=", maxsplit=1)[0] in CLI_OPTION_LIST for arg in arg_list
+    )
+
+
+def get_plugin_state(plugin: ChoicePlugin) -> dict[str, Any]:
+    """
+    Returns a JSON-serializable description of a plugin and the state of each
+    of its repos.
+    """
+
+    return {
+        "product-name": plugin.product_name,
+        "product-category": plugin.product_category,
+        "product-website": plugin.product_website,
+        "vendor-name": plugin.vendor_name,
+        "vendor-website": plugin.vendor_website,
+        "wiki": plugin.wiki_link,
+        "official-plugin": plugin.is_official_plugin,
+        "repos": [
+            {
+                "id": repo.internal_id,
+                "method-name": repo.method_name,
+                "method-name-short": repo.method_name_short,
+                "method-type": repo.method_type,
+                "installed": repo.is_installed,
+                "available": repo.capability_info == "",
+                "capability-info": repo.capability_info,
+                "privilege-mode": (
+                    "privileged"
+                    if repo.mod_requires_privileges
+                    else "unprivileged"
+                ),
+            }
+            for repo in plugin.repo_list
+        ],
+    }
+
+
+def print_plugin_list(
+    plugin_data: list[ChoicePluginCategory], as_json: bool
+) -> None:
+    """
+    Prints all plugins and the state of their repos, either as JSON or in a
+    human-readable format.
+    """
+
+    plugin_state_list: list[dict[str, Any]] = [
+        get_plugin_state(plugin)
+        for plugin_category in plugin_data
+        for plugin in plugin_category.plugin_list
+    ]
+
+    if as_json:
+        print(json.dumps({"plugins": plugin_state_list}, indent=2))
+        return
+
+    for plugin_state in plugin_state_list:
+        print(
+            f"{plugin_state['product-name']} "
+            f"({plugin_state['product-category']})"
+        )
+        for repo_state in plugin_state["repos"]:
+            status_list: list[str] = [
+                "installed" if repo_state["installed"] else "not installed",
+                repo_state["privilege-mode"],
+            ]
+            if not repo_state["available"]:
+                status_list.append(repo_state["capability-info"])
+            print(
+                f"  {repo_state['id']}: {repo_state['method-name-short']} - "
+                + ", ".join(status_list)
+            )
+
+
+def print_run_history(as_json: bool) -> None:
+    """
+    Prints the runs recorded in the log file's run index, either as JSON or
+    in a human-readable format. Runs are numbered from oldest to newest.
+    """
+
+    run_list: list[dict[str, Any]] = load_run_list(
+        GlobalData.log_index_file_path
+    )
+
+    if as_json:
+        print(json.dumps({"runs": run_list}, indent=2))
+        return
+
+    for run_idx, run_dict in enumerate(run_list):
+        print(f"{run_idx + 1}: {run_dict.get('timestamp')}")
+        for operation_dict in run_dict.get("operations", []):
+            match operation_dict.get("successful"):
+                case None:
+                    status_str: str = "unfinished"
+                case True:
+                    status_str = "successful"
+                case _:
+                    status_str = "failed"
+            if operation_dict.get("exit-status") is not None:
+                status_str += f" (exit status {operation_dict['exit-status']})"
+            print(
+                f"  {operation_dict.get('plugin')} "
+                f"({operation_dict.get('repo')}): "
+                f"{operation_dict.get('mode')} - {status_str}"
+            )
+
+
+def print_run_output(run_number: int) -> int:
+    """
+    Prints the log file output of a run, as numbered by print_run_history.
+    Returns the exit code.
+    """
+
+    run_list: list[dict[str, Any]] = load_run_list(
+        GlobalData.log_index_file_path
+    )
+    if not 1 <= run_number <= len(run_list):
+        print(f"ERROR: No run number {run_number}!", file=sys.stderr)
+        return 1
+    for chunk in read_run_output(
+        GlobalData.log_file_path, run_list, run_number - 1
+    ):
+        sys.stdout.buffer.write(chunk)
+    sys.stdout.buffer.flush()
+    return 0
+
+
+def main(arg_list: list[str]) -> int:
+    """
+    Main function of the command line interface. Returns the exit code.
+    """
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        prog="browser-choice",
+        description="Query browser-choice plugin state and past runs "
+        + "without the GUI.",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="list all plugins with the installed state, availability and "
+        + "privilege mode of each repo",
+    )
+    parser.add_argument(
+        "--history",
+        action="store_true",
+        help="list past runs and the software changes made during each",
+    )
+    parser.add_argument(
+        "--show-run",
+        type=int,
+        metavar="NUMBER",
+        help="print the log output of a past run, numbered as in --history",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print output as JSON",
+    )
+    args: argparse.Namespace = parser.parse_args(arg_list)
+
+    if args.list:
+        try:
+            plugin_data: list[ChoicePluginCategory] = parse_config_dir(
+                GlobalData.plugin_dir
+            )
+        except Exception as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            return 1
+        print_plugin_list(plugin_data, args.json)
+        return 0
+
+    if args.history:
+        print_run_history(args.json)
+        return 0
+
+    if args.show_run is not None:
+        return print_run_output(args.show_run)
+
+    parser.print_usage(file=sys.stderr)
+    return 2
@@ -3,6 +3,8 @@
 # Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
 # See the file COPYING for copying conditions.
 
+# pylint: disable=broad-exception-caught
+
 """
 browser_choice_core.py - Non-graphical routines for browser-choice.
 """
@@ -10,26 +12,75 @@ browser_choice_core.py - Non-graphical routines for browser-choice.
 ## NOTE: This file must not be named 'browser_choice.py', it confuses mypy.
 ## See https://github.com/python/mypy/issues/19410
 
-import subprocess
+## NOTE: This module must not import Qt, so that plugin state can be queried
+## without a display, and without paying for Qt's startup cost. Images are
+## decoded by an image cache provided by the GUI layer, and scripts are run
+## by the GUI layer. The same applies to the command line interface, the
+## benchmark suite, and every module they or the package itself import.
+
 import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
-
-from PyQt5.QtCore import (
-    QObject,
-    QProcess,
+from typing import TYPE_CHECKING, Any, Callable
+
+from browser_choice import GlobalData
+from browser_choice.probecache import ProbeCache
+from browser_choice.pluginindex import PluginIndex, get_file_signature
+from browser_choice.installedstate import (
+    DEB_NAME_REGEX,
+    FLATPAK_ID_REGEX,
+    InstalledStateResolver,
+    make_install_status_script,
+    parse_install_status,
 )
-
-from PyQt5.QtGui import (
-    QImage,
-    QPixmap,
+from browser_choice.probeengine import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_VISIBLE,
+    ProbeEngine,
+    ProbeMemo,
+    usable_cpu_count,
 )
+from browser_choice.tracer import trace_function, trace_span
+
+if TYPE_CHECKING:
+    from browser_choice.imagecache import ImageCache
 
 
-## Caches the commands used for checking whether a package can be installed
-## without privileges or not, so that duplicate commands aren't run
+## Caches the results of all probe commands (install-status, capability and
+## unprivileged-check-script), so that duplicate commands aren't run
 ## unnecessarily.
-unprivileged_check_cache: dict[str, bool] = {}
+repo_probe_memo: ProbeMemo = ProbeMemo()
+
+## Runs the install-status, capability, and unprivileged-check probes of all
+## repos in the background.
+repo_probe_engine: ProbeEngine = ProbeEngine()
+
+## Keeps install-status and capability results across runs, until the
+## installed packages change.
+repo_probe_cache: ProbeCache = ProbeCache(GlobalData.probe_cache_file_path)
+
+
+def save_probe_cache_when_idle(owner: Any) -> None:
+    """
+    Probe engine callback. Writes new probe results to the probe cache once
+    all queued probes are done.
+    """
+
+    if repo_probe_engine.all_done():
+        repo_probe_cache.save()
+
+
+repo_probe_engine.add_done_callback(save_probe_cache_when_idle)
+
+
+## The native architecture is only looked up once per process, see
+## get_native_architecture().
+native_architecture_lock: threading.Lock = threading.Lock()
+native_architecture_list: list[str | None] = []
+
+ARCH_NAME_REGEX: re.Pattern[str] = re.compile(r"[a-z0-9][a-z0-9-]*\Z")
 
 
 def str_or_none(data: str) -> str | None:
@@ -42,8 +93,74 @@ def str_or_none(data: str) -> str | None:
     return data
 
 
+def get_native_architecture() -> str | None:
+    """
+    Returns the system's native Debian architecture as reported by
+    'dpkg --print-architecture', or None if it can't be determined. dpkg is
+    only run the first time this is called.
+    """
+
+    with native_architecture_lock:
+        if len(native_architecture_list) == 0:
+            native_architecture: str | None = None
+            try:
+                arch_process = subprocess.run(
+                    ["/usr/bin/dpkg", "--print-architecture"],
+                    check=False,
+                    capture_output=True,
+                    encoding="utf-8",
+                )
+                if arch_process.returncode == 0:
+                    native_architecture = str_or_none(
+                        arch_process.stdout.strip()
+                    )
+            except OSError:
+                pass
+            native_architecture_list.append(native_architecture)
+        return native_architecture_list[0]
+
+
+def parse_word_list(
+    config_file: Path,
+    repo_id: str | None,
+    key: str,
+    value: str | None,
+    word_regex: re.Pattern[str],
+) -> list[str]:
+    """
+    Splits a whitespace-separated plugin value into a list, making sure each
+    item matches the specified regex.
+    """
+
+    if value is None:
+        return []
+    word_list: list[str] = value.split()
+    for word in word_list:
+        if not word_regex.match(word):
+            throw_config_error(
+                config_file,
+                f"invalid item '{word}' in '{key}' of repo '{repo_id}'",
+            )
+    return word_list
+
+
+def get_method_backend(method_type: str) -> str:
+    """
+    Returns the package manager backend used by repos of the specified
+    method type. Flatpak keeps its own lock, so Flatpak operations can run at
+    the same time as apt operations. Plugin scripts of any other method type
+    may use apt or dpkg, so they are assumed to use the apt backend.
+    """
+
+    if method_type in ("flathub", "flatpak") or method_type.startswith(
+        "flatpak-"
+    ):
+        return "flatpak"
+    return "apt"
+
+
 # pylint: disable=too-many-instance-attributes
-class ChoicePluginRepo(QObject):
+class ChoicePluginRepo:
     """
     Represents a repo defined in a browser-choice plugin. You can install,
     remove, or purge an application from a particular repo.
@@ -58,7 +175,7 @@ class ChoicePluginRepo(QObject):
         method_name_short: str | None,
         method_subtext: str | None,
         method_type: str | None,
-        method_logo: QPixmap | None,
+        method_logo: Path | None,
         install_warn_text: str | None,
         unprivileged_check_script: str | None,
         update_and_install_script: str | None,
@@ -71,10 +188,48 @@ class ChoicePluginRepo(QObject):
         purge_script_unprivileged: str | None,
         launch_script: str | None,
         install_status: str | None,
+        install_status_deb: str | None,
+        install_status_flatpak: str | None,
         capability: str | None,
-        parent: QObject | None = None,
+        capability_arch: str | None,
     ):
-        super().__init__(parent)
+        ## The declarative install-status-* and capability-arch keys are
+        ## evaluated in-process. They are also turned into the equivalent
+        ## scripts, which are used as a fallback if in-process evaluation
+        ## isn't possible, unless the plugin provides scripts of its own.
+        install_status_deb_list: list[str] = parse_word_list(
+            config_file,
+            internal_id,
+            "install-status-deb",
+            install_status_deb,
+            DEB_NAME_REGEX,
+        )
+        install_status_flatpak_list: list[str] = parse_word_list(
+            config_file,
+            internal_id,
+            "install-status-flatpak",
+            install_status_flatpak,
+            FLATPAK_ID_REGEX,
+        )
+        capability_arch_list: list[str] = parse_word_list(
+            config_file,
+            internal_id,
+            "capability-arch",
+            capability_arch,
+            ARCH_NAME_REGEX,
+        )
+        if install_status is None and (
+            len(install_status_deb_list) != 0
+            or len(install_status_flatpak_list) != 0
+        ):
+            install_status = make_install_status_script(
+                install_status_deb_list, install_status_flatpak_list
+            )
+        if capability is None and len(capability_arch_list) != 0:
+            capability = (
+                "/usr/libexec/browser-choice/architecture-support-check "
+                + " ".join(capability_arch_list)
+            )
 
         none_check_dict: dict[str, Any] = {
             "internal_id": internal_id,
@@ -124,7 +279,7 @@ class ChoicePluginRepo(QObject):
         self.method_name: str = method_name
         self.method_name_short: str = method_name_short
         self.method_subtext: str = method_subtext
-        self.method_logo: QPixmap = method_logo
+        self.method_logo_path: Path = method_logo
         self.method_type: str = method_type
         self.install_warn_text: str | None = install_warn_text
         self.unprivileged_check_script: str | None = unprivileged_check_script
@@ -142,147 +297,265 @@ class ChoicePluginRepo(QObject):
             uninstall_script_unprivileged
         )
         self.purge_script_unprivileged: str | None = purge_script_unprivileged
+        self.config_file: Path = config_file
         self.launch_script: str = launch_script
         self.install_status: str = install_status
+        self.install_status_deb_list: list[str] = install_status_deb_list
+        self.install_status_flatpak_list: list[str] = (
+            install_status_flatpak_list
+        )
         self.capability: str = capability
-        self.is_installed: bool = self.check_installed()
-        self.capability_info: str = self.check_capability()
+        self.capability_arch_list: list[str] = capability_arch_list
+
+        ## These are filled in by the probe jobs returned by probe_jobs(), and
+        ## read through the properties below, which wait for the probes.
+        self.__is_installed: bool = False
+        self.__capability_info: str = ""
+        self.__mod_requires_privileges: bool = True
+        self.__probes_started: bool = False
+        ## Set by parse_config_dir, so that the install-status probes of all
+        ## loaded repos can be answered together.
+        self.installed_state_resolver: InstalledStateResolver | None = None
+
+    @property
+    def is_installed(self) -> bool:
+        """
+        Whether the application is installed from this repo. Waits for the
+        repo's probes to finish if necessary.
+        """
 
-        self.mod_requires_privileges: bool = True
-        if self.unprivileged_check_script is not None:
-            self.mod_requires_privileges = self.check_mod_unprivileged()
+        self.wait_for_probes()
+        return self.__is_installed
 
-    def __run_script(
-        self, script: str, set_x: bool = False, detach: bool = False
-    ) -> QProcess:
+    @property
+    def capability_info(self) -> str:
         """
-        Runs the provided script asynchronously with QProcess. Used internally
-        to run plugin-defined scripts.
+        An empty string if the application can be installed from this repo,
+        otherwise an explanation of why it can't be. Waits for the repo's
+        probes to finish if necessary.
         """
 
-        if set_x:
-            script = "set -x; " + script
+        self.wait_for_probes()
+        return self.__capability_info
 
-        output_process: QProcess = QProcess(self)
-        output_process.setProgram("/usr/bin/bash")
-        output_process.setProcessChannelMode(QProcess.MergedChannels)
-        output_process.setArguments(
-            [
-                "-c",
-                "--",
-                script,
-            ]
-        )
-        if detach:
-            output_process.startDetached()
-        else:
-            output_process.start()
-            if not output_process.waitForStarted():
-                raise OSError("Failed to start script!")
-        return output_process
+    @property
+    def mod_requires_privileges(self) -> bool:
+        """
+        Whether modifying the application requires administrative privileges.
+        Waits for the repo's probes to finish if necessary.
+        """
 
-    def run_update_and_install(self) -> QProcess | None:
+        self.wait_for_probes()
+        return self.__mod_requires_privileges
+
+    def start_probes(self, priority: int = PRIORITY_BACKGROUND) -> None:
         """
-        Run a plugin's 'update-and-install-script' asynchronously.
+        Queues this repo's probes in the background if they haven't been
+        queued already.
         """
 
-        if self.update_and_install_script is None:
-            return None
-        return self.__run_script(self.update_and_install_script, set_x=True)
+        if self.__probes_started:
+            return
+        self.__probes_started = True
+        repo_probe_engine.submit(self, self.probe_jobs(), priority)
 
-    def run_install(self) -> QProcess | None:
+    def forget_probes(self) -> None:
         """
-        Run a plugin's 'install-script' asynchronously.
+        Forgets this repo's probe results, waiting for probes still running
+        first, so that start_probes() probes the repo again.
         """
 
-        if self.install_script is None:
-            return None
-        return self.__run_script(self.install_script, set_x=True)
+        if not self.__probes_started:
+            return
+        repo_probe_engine.forget(self)
+        self.__probes_started = False
 
-    def run_uninstall(self) -> QProcess | None:
+    def probe_scripts(self) -> list[str]:
         """
-        Run a plugin's 'uninstall-script' asynchronously.
+        Returns the probe scripts this repo's probes may run.
         """
 
-        if self.uninstall_script is None:
-            return None
-        return self.__run_script(self.uninstall_script, set_x=True)
+        script_list: list[str] = [self.install_status, self.capability]
+        if self.unprivileged_check_script is not None:
+            script_list.append(self.unprivileged_check_script)
+        return script_list
+
+    def probes_done(self) -> bool:
+        """
+        Returns True if this repo's probes have finished, meaning its state
+        can be read without waiting.
+        """
+
+        return repo_probe_engine.is_done(self)
+
+    def wait_for_probes(self) -> None:
+        """
+        Waits for this repo's probes to finish, queueing them ahead of all
+        other probes first.
+        """
+
+        self.start_probes()
+        repo_probe_engine.wait(self)
+
+    def probe_jobs(self) -> list[Callable[[], None]]:
+        """
+        Returns the probes needed to determine this repo's installation
+        status, capability info, and privilege requirements. Each probe is a
+        callable that stores its result in this object, and the probes may be
+        run concurrently. Results available from the probe cache are applied
+        immediately, and the corresponding probes are left out.
+        """
+
+        job_list: list[Callable[[], None]] = []
+
+        cached_installed: Any = repo_probe_cache.lookup(
+            self.config_file,
+            self.internal_id,
+            "install-status",
+            self.install_status,
+        )
+        if isinstance(cached_installed, bool):
+            self.__is_installed = cached_installed
+        else:
+            job_list.append(self.__probe_installed)
+
+        ## Declarative capability checks are cheap enough that caching them
+        ## isn't worth it.
+        cached_capability: Any = None
+        if len(self.capability_arch_list) == 0:
+            cached_capability = repo_probe_cache.lookup(
+                self.config_file,
+                self.internal_id,
+                "capability",
+                self.capability,
+            )
+        if isinstance(cached_capability, str):
+            self.__capability_info = cached_capability
+        else:
+            job_list.append(self.__probe_capability)
+
+        if self.unprivileged_check_script is not None:
+            job_list.append(self.__probe_mod_unprivileged)
+        return job_list
 
-    def run_purge(self) -> QProcess | None:
+    def __probe_installed(self) -> None:
         """
-        Run a plugin's 'purge-script' asynchronously.
+        Probe job that records the result of check_installed. Uses the
+        installed state resolver instead if the repo's install status can be
+        checked in-process.
         """
 
-        if self.purge_script is None:
-            return None
-        return self.__run_script(self.purge_script, set_x=True)
+        cache_generation: int = repo_probe_cache.current_generation()
+        resolved_installed: bool | None = None
+        install_status_checks: tuple[list[str], list[str]] | None = (
+            self.install_status_checks()
+        )
+        if (
+            self.installed_state_resolver is not None
+            and install_status_checks is not None
+        ):
+            resolved_installed = self.installed_state_resolver.resolve(
+                *install_status_checks
+            )
+        if resolved_installed is None:
+            self.__is_installed = self.check_installed()
+        else:
+            self.__is_installed = resolved_installed
+        repo_probe_cache.store(
+            self.config_file,
+            self.internal_id,
+            "install-status",
+            self.install_status,
+            self.__is_installed,
+            cache_generation,
+        )
 
-    def run_update_and_install_unprivileged(self) -> QProcess | None:
+    def __probe_capability(self) -> None:
         """
-        Run a plugin's 'update-and-install-script-unprivileged'
-        asynchronously.
+        Probe job that records the result of check_capability, or of the
+        in-process architecture check if the repo uses 'capability-arch'.
         """
 
-        if self.update_and_install_script_unprivileged is None:
-            return None
-        return self.__run_script(
-            self.update_and_install_script_unprivileged, set_x=True
+        cache_generation: int = repo_probe_cache.current_generation()
+        if len(self.capability_arch_list) != 0:
+            native_architecture: str | None = get_native_architecture()
+            if native_architecture is not None:
+                if native_architecture in self.capability_arch_list:
+                    self.__capability_info = ""
+                else:
+                    self.__capability_info = (
+                        f"Unavailable on {native_architecture}."
+                    )
+                return
+
+        self.__capability_info = self.check_capability()
+        repo_probe_cache.store(
+            self.config_file,
+            self.internal_id,
+            "capability",
+            self.capability,
+            self.__capability_info,
+            cache_generation,
         )
 
-    def run_install_unprivileged(self) -> QProcess | None:
+    def __probe_mod_unprivileged(self) -> None:
         """
-        Run a plugin's 'install-script-unprivileged' asynchronously.
+        Probe job that records the result of check_mod_unprivileged.
         """
 
-        if self.install_script_unprivileged is None:
-            return None
-        return self.__run_script(self.install_script_unprivileged, set_x=True)
+        self.__mod_requires_privileges = self.check_mod_unprivileged()
 
-    def run_uninstall_unprivileged(self) -> QProcess | None:
+    @property
+    def backend(self) -> str:
         """
-        Run a plugin's 'uninstall-script-unprivileged' asynchronously.
+        The package manager backend this repo's scripts use. Operations on
+        repos with the same backend must not run at the same time.
         """
 
-        if self.uninstall_script_unprivileged is None:
-            return None
-        return self.__run_script(self.uninstall_script_unprivileged, set_x=True)
+        return get_method_backend(self.method_type)
 
-    def run_purge_unprivileged(self) -> QProcess | None:
+    def install_status_checks(self) -> tuple[list[str], list[str]] | None:
         """
-        Run a plugin's 'purge-script-unprivileged' asynchronously.
+        Returns the Debian packages and Flatpak applications that must be
+        installed for this repo to count as installed, or None if that is
+        decided by an install-status script that can't be evaluated
+        in-process.
         """
 
-        if self.purge_script_unprivileged is None:
-            return None
-        return self.__run_script(self.purge_script_unprivileged, set_x=True)
+        if (
+            len(self.install_status_deb_list) != 0
+            or len(self.install_status_flatpak_list) != 0
+        ):
+            return (
+                self.install_status_deb_list,
+                self.install_status_flatpak_list,
+            )
+        return parse_install_status(self.install_status)
 
-    def run_launch(self, extra_args: str | None = None) -> QProcess | None:
+    def __run_probe_script(
+        self, probe_name: str, script: str
+    ) -> subprocess.CompletedProcess[bytes]:
         """
-        Run a plugin's 'launch-script' asynchronously, detached from the
-        parent so the parent can terminate without terminating the child.
+        Runs a probe script synchronously through the probe memo, recording a
+        trace span for it.
         """
 
-        if extra_args is None:
-            return self.__run_script(self.launch_script, detach=True)
-        return self.__run_script(
-            self.launch_script + " " + extra_args, detach=True
-        )
+        with trace_span(
+            f"probe {probe_name}",
+            plugin=str(self.config_file),
+            repo=self.internal_id,
+            command=script,
+        ):
+            return repo_probe_memo.run(script)
 
     def check_installed(self) -> bool:
         """
         Check if the defined package is installed by running the
-        'install-status' script synchronously with subprocess.run.
-        """
-
-        check_process = subprocess.run(
-            [
-                "/usr/bin/bash",
-                "-c",
-                "--",
-                self.install_status,
-            ],
-            check=False,
-            capture_output=True,
+        'install-status' script synchronously through the probe memo.
+        """
+
+        check_process = self.__run_probe_script(
+            "install-status", self.install_status
         )
         if check_process.returncode == 0:
             return True
@@ -291,18 +564,11 @@ class ChoicePluginRepo(QObject):
     def check_capability(self) -> str:
         """
         Check if a package can be installed on the current machine by running
-        the 'capability' script synchronously with subprocess.run.
+        the 'capability' script synchronously through the probe memo.
         """
 
-        capability_process = subprocess.run(
-            [
-                "/usr/bin/bash",
-                "-c",
-                "--",
-                self.capability,
-            ],
-            check=False,
-            capture_output=True,
+        capability_process = self.__run_probe_script(
+            "capability", self.capability
         )
         if capability_process.returncode == 0:
             return ""
@@ -316,34 +582,22 @@ class ChoicePluginRepo(QObject):
     def check_mod_unprivileged(self) -> bool:
         """
         Check if a package can be modified without administrative privileges
-        by running the 'unprivileged-check-cmd' script synchronously with
-        subprocess.run. Caches command results to improve performance.
+        by running the 'unprivileged-check-cmd' script synchronously through
+        the probe memo.
         """
 
         assert self.unprivileged_check_script is not None
 
-        if self.unprivileged_check_script in unprivileged_check_cache:
-            return unprivileged_check_cache[self.unprivileged_check_script]
-
-        unprivileged_check_process = subprocess.run(
-            [
-                "/usr/bin/bash",
-                "-c",
-                "--",
-                self.unprivileged_check_script,
-            ],
-            check=False,
-            capture_output=True,
+        unprivileged_check_process = self.__run_probe_script(
+            "unprivileged-check-script", self.unprivileged_check_script
         )
-
         if unprivileged_check_process.returncode == 0:
-            unprivileged_check_cache[self.unprivileged_check_script] = False
             return False
-        unprivileged_check_cache[self.unprivileged_check_script] = True
         return True
 
 
-class ChoicePlugin(QObject):
+# pylint: disable=too-few-public-methods
+class ChoicePlugin:
     """
     Represents a browser-choice plugin.
     """
@@ -354,37 +608,34 @@ class ChoicePlugin(QObject):
         product_name: str,
         product_category: str,
         product_website: str,
-        product_logo: QPixmap,
+        product_logo: Path,
         vendor_name: str,
         vendor_website: str,
-        vendor_logo: QPixmap,
+        vendor_logo: Path,
         wiki_link: str,
         is_official_plugin: bool,
         repo_list: list[ChoicePluginRepo],
-        parent: QObject | None = None,
     ):
-        super(QObject, self).__init__(parent)
         self.product_name: str = product_name
         self.product_category: str = product_category
         self.product_website: str = product_website
-        self.product_logo: QPixmap = product_logo
+        self.product_logo_path: Path = product_logo
         self.vendor_name: str = vendor_name
         self.vendor_website: str = vendor_website
-        self.vendor_logo: QPixmap = vendor_logo
+        self.vendor_logo_path: Path = vendor_logo
         self.wiki_link: str = wiki_link
         self.is_official_plugin: bool = is_official_plugin
         self.repo_list: list[ChoicePluginRepo] = repo_list
 
 
-class ChoicePluginCategory(QObject):
+# pylint: disable=too-few-public-methods
+class ChoicePluginCategory:
     """
     Represents a group of plugins that fall into the same category. These
     categories are defined by the 'product-category' key in plugins.
     """
 
-    def __init__(self, category_name: str, parent: QObject | None = None):
-        super(QObject, self).__init__(parent)
-
+    def __init__(self, category_name: str):
         self.category_name = category_name
         self.plugin_list: list[ChoicePlugin] = []
 
@@ -412,64 +663,105 @@ def throw_config_error(config_file: Path, error_reason: str) -> None:
 
 
 def load_image(
-    image_path_str: str, config_file: Path, image_type: str
-) -> QPixmap:
+    image_path_str: str,
+    config_file: Path,
+    image_type: str,
+    logo_key: str,
+    image_cache: "ImageCache | None",
+) -> Path:
     """
-    Loads an image from the specified path. Throws an exception specifying the
-    problematic config file and image type if something goes wrong.
+    Checks that an image exists at the specified path, and returns the path.
+    If an image cache is specified, also loads the image into it as the
+    specified kind of logo. Throws an exception specifying the problematic
+    config file and image type if something goes wrong.
     """
 
-    logo_file: Path = Path(image_path_str)
-    if not logo_file.is_file():
-        throw_config_error(config_file, f"{image_type} does not exist")
-    logo_image: QImage = QImage(image_path_str)
-    if logo_image.isNull():
-        throw_config_error(config_file, f"{image_type} could not be loaded")
-    logo_pixmap: QPixmap = QPixmap.fromImage(logo_image)
-    return logo_pixmap
+    with trace_span("load_image", image=image_path_str, image_type=image_type):
+        logo_file: Path = Path(image_path_str)
+        if not logo_file.is_file():
+            throw_config_error(config_file, f"{image_type} does not exist")
+        if image_cache is not None and not image_cache.logo_is_valid(
+            logo_file, logo_key
+        ):
+            throw_config_error(config_file, f"{image_type} could not be loaded")
+        return logo_file
+
+
+def prefetch_plugin_images(
+    plugin_record: dict[str, Any], image_cache: "ImageCache"
+) -> None:
+    """
+    Starts decoding all images referenced by a plugin record in the
+    background, so that load_image doesn't have to decode them one by one.
+    """
+
+    image_list: list[tuple[str | None, str]] = [
+        (plugin_record["product"].get("product-logo"), "product-logo"),
+        (plugin_record["product"].get("vendor-logo"), "vendor-logo"),
+    ]
+    for _, repo_dict in plugin_record["repos"]:
+        image_list.append((repo_dict.get("method-logo"), "method-logo"))
+    for image_path_str, logo_key in image_list:
+        if image_path_str is not None:
+            image_cache.prefetch_logo(Path(image_path_str), logo_key)
+
+
+## Keys that can be set in the product section and in repo sections of a
+## plugin. Anything else is ignored.
+PRODUCT_KEY_LIST: list[str] = [
+    "product-name",
+    "product-category",
+    "product-website",
+    "product-logo",
+    "vendor-name",
+    "vendor-website",
+    "vendor-logo",
+    "wiki",
+    "official-plugin",
+]
+REPO_KEY_LIST: list[str] = [
+    "method-name",
+    "method-name-short",
+    "method-subtext",
+    "method-logo",
+    "method-type",
+    "install-warn-text",
+    "unprivileged-check-script",
+    "update-and-install-script",
+    "install-script",
+    "uninstall-script",
+    "purge-script",
+    "update-and-install-script-unprivileged",
+    "install-script-unprivileged",
+    "uninstall-script-unprivileged",
+    "purge-script-unprivileged",
+    "launch-script",
+    "install-status",
+    "install-status-deb",
+    "install-status-flatpak",
+    "capability",
+    "capability-arch",
+]
 
 
 # pylint: disable=too-many-locals,too-many-branches,too-many-statements
-def parse_config_file(config_file: Path) -> ChoicePlugin:
+def parse_config_file_record(config_file: Path) -> dict[str, Any]:
     """
-    Parses a single plugin config file and returns the plugin it defines.
+    Parses a single plugin config file into a plugin record, a JSON-
+    serializable dict holding the plugin's product values and the values of
+    each of its repos. Empty values are stored as None. Checks that the file
+    is structurally valid and that all mandatory product values are present.
     """
 
     detect_comment_regex: re.Pattern[str] = re.compile(r"\s*#")
     detect_header_regex: re.Pattern[str] = re.compile(r"\[.*]\Z")
     hit_product_header: bool = False
     hit_repo_header: bool = False
-    current_repo_name: str | None = None
-
-    product_name: str | None = None
-    product_category: str | None = None
-    product_website: str | None = None
-    product_logo: QPixmap | None = None
-    vendor_name: str | None = None
-    vendor_website: str | None = None
-    vendor_logo: QPixmap | None = None
-    wiki_link: str | None = None
-    is_official_plugin: bool | None = None
-    repo_list: list[ChoicePluginRepo] = []
 
-    repo_method_name: str | None = None
-    repo_method_name_short: str | None = None
-    repo_method_subtext: str | None = None
-    repo_method_logo: QPixmap | None = None
-    repo_method_type: str | None = None
-    repo_install_warn_text: str | None = None
-    repo_unprivileged_check_script: str | None = None
-    repo_update_and_install_script: str | None = None
-    repo_install_script: str | None = None
-    repo_uninstall_script: str | None = None
-    repo_purge_script: str | None = None
-    repo_update_and_install_script_unprivileged: str | None = None
-    repo_install_script_unprivileged: str | None = None
-    repo_uninstall_script_unprivileged: str | None = None
-    repo_purge_script_unprivileged: str | None = None
-    repo_launch_script: str | None = None
-    repo_install_status: str | None = None
-    repo_capability: str | None = None
+    product_dict: dict[str, str | None] = {}
+    ## A list of [repo ID, repo value dict] pairs, in file order.
+    repo_record_list: list[list[Any]] = []
+    current_repo_dict: dict[str, str | None] = {}
 
     with open(config_file, "r", encoding="utf-8") as conf_stream:
         for line in conf_stream:
@@ -497,49 +789,14 @@ def parse_config_file(config_file: Path) -> ChoicePlugin:
                             "repo headers found before product header",
                         )
 
-                    if hit_repo_header:
-                        assert current_repo_name is not None
-                        new_repo: ChoicePluginRepo = ChoicePluginRepo(
-                            config_file=config_file,
-                            internal_id=current_repo_name,
-                            method_name=repo_method_name,
-                            method_name_short=repo_method_name_short,
-                            method_type=repo_method_type,
-                            method_subtext=repo_method_subtext,
-                            method_logo=repo_method_logo,
-                            install_warn_text=repo_install_warn_text,
-                            unprivileged_check_script=(
-                                repo_unprivileged_check_script
-                            ),
-                            update_and_install_script=(
-                                repo_update_and_install_script
-                            ),
-                            install_script=repo_install_script,
-                            uninstall_script=repo_uninstall_script,
-                            purge_script=repo_purge_script,
-                            update_and_install_script_unprivileged=(
-                                repo_update_and_install_script_unprivileged
-                            ),
-                            install_script_unprivileged=(
-                                repo_install_script_unprivileged
-                            ),
-                            uninstall_script_unprivileged=(
-                                repo_uninstall_script_unprivileged
-                            ),
-                            purge_script_unprivileged=(
-                                repo_purge_script_unprivileged
-                            ),
-                            launch_script=repo_launch_script,
-                            install_status=repo_install_status,
-                            capability=repo_capability,
-                        )
-                        repo_list.append(new_repo)
-
                     hit_repo_header = True
-                    current_repo_name = current_header_name.split(
-                        ":",
-                        maxsplit=1,
-                    )[1]
+                    current_repo_dict = {}
+                    repo_record_list.append(
+                        [
+                            current_header_name.split(":", maxsplit=1)[1],
+                            current_repo_dict,
+                        ]
+                    )
                     continue
                 throw_config_error(
                     config_file,
@@ -555,84 +812,18 @@ def parse_config_file(config_file: Path) -> ChoicePlugin:
             if not hit_product_header:
                 throw_config_error(config_file, "config lines before headers")
             elif hit_product_header and not hit_repo_header:
-                match line_key:
-                    case "product-name":
-                        product_name = str_or_none(line_val)
-                    case "product-category":
-                        product_category = str_or_none(line_val)
-                    case "product-website":
-                        product_website = str_or_none(line_val)
-                    case "product-logo":
-                        product_logo = load_image(
-                            line_val, config_file, "product logo"
-                        )
-                    case "vendor-name":
-                        vendor_name = str_or_none(line_val)
-                    case "vendor-website":
-                        vendor_website = str_or_none(line_val)
-                    case "vendor-logo":
-                        vendor_logo = load_image(
-                            line_val, config_file, "vendor logo"
-                        )
-                    case "wiki":
-                        wiki_link = str_or_none(line_val)
-                    case "official-plugin":
-                        if line_val.lower() == "yes":
-                            is_official_plugin = True
-                        elif line_val.lower() == "no":
-                            is_official_plugin = False
-                        else:
-                            throw_config_error(
-                                config_file,
-                                "'official-plugin' boolean not set to 'yes' "
-                                "or 'no'",
-                            )
-            else:
-                match line_key:
-                    case "method-name":
-                        repo_method_name = str_or_none(line_val)
-                    case "method-name-short":
-                        repo_method_name_short = str_or_none(line_val)
-                    case "method-subtext":
-                        repo_method_subtext = str_or_none(line_val)
-                    case "method-logo":
-                        repo_method_logo = load_image(
-                            line_val,
-                            config_file,
-                            f"method logo for '{current_repo_name}'",
-                        )
-                    case "method-type":
-                        repo_method_type = str_or_none(line_val)
-                    case "install-warn-text":
-                        repo_install_warn_text = str_or_none(line_val)
-                    case "unprivileged-check-script":
-                        repo_unprivileged_check_script = str_or_none(line_val)
-                    case "update-and-install-script":
-                        repo_update_and_install_script = str_or_none(line_val)
-                    case "install-script":
-                        repo_install_script = str_or_none(line_val)
-                    case "uninstall-script":
-                        repo_uninstall_script = str_or_none(line_val)
-                    case "purge-script":
-                        repo_purge_script = str_or_none(line_val)
-                    case "update-and-install-script-unprivileged":
-                        repo_update_and_install_script_unprivileged = (
-                            str_or_none(line_val)
-                        )
-                    case "install-script-unprivileged":
-                        repo_install_script_unprivileged = str_or_none(line_val)
-                    case "uninstall-script-unprivileged":
-                        repo_uninstall_script_unprivileged = str_or_none(
-                            line_val
-                        )
-                    case "purge-script-unprivileged":
-                        repo_purge_script_unprivileged = str_or_none(line_val)
-                    case "launch-script":
-                        repo_launch_script = str_or_none(line_val)
-                    case "install-status":
-                        repo_install_status = str_or_none(line_val)
-                    case "capability":
-                        repo_capability = str_or_none(line_val)
+                if line_key == "official-plugin" and line_val.lower() not in (
+                    "yes",
+                    "no",
+                ):
+                    throw_config_error(
+                        config_file,
+                        "'official-plugin' boolean not set to 'yes' or 'no'",
+                    )
+                if line_key in PRODUCT_KEY_LIST:
+                    product_dict[line_key] = str_or_none(line_val)
+            elif line_key in REPO_KEY_LIST:
+                current_repo_dict[line_key] = str_or_none(line_val)
 
     if not hit_product_header and not hit_repo_header:
         throw_config_error(config_file, "no headers found")
@@ -641,79 +832,216 @@ def parse_config_file(config_file: Path) -> ChoicePlugin:
             config_file, "product header found but no repo headers"
         )
 
-    new_repo = ChoicePluginRepo(
-        config_file=config_file,
-        internal_id=current_repo_name,
-        method_name=repo_method_name,
-        method_name_short=repo_method_name_short,
-        method_subtext=repo_method_subtext,
-        method_logo=repo_method_logo,
-        method_type=repo_method_type,
-        install_warn_text=repo_install_warn_text,
-        unprivileged_check_script=repo_unprivileged_check_script,
-        update_and_install_script=repo_update_and_install_script,
-        install_script=repo_install_script,
-        uninstall_script=repo_uninstall_script,
-        purge_script=repo_purge_script,
-        update_and_install_script_unprivileged=(
-            repo_update_and_install_script_unprivileged
-        ),
-        install_script_unprivileged=repo_install_script_unprivileged,
-        uninstall_script_unprivileged=repo_uninstall_script_unprivileged,
-        purge_script_unprivileged=repo_purge_script_unprivileged,
-        launch_script=repo_launch_script,
-        install_status=repo_install_status,
-        capability=repo_capability,
-    )
-    repo_list.append(new_repo)
-
-    if product_name is None:
-        throw_config_error(config_file, "no product name")
-    elif product_category is None:
-        throw_config_error(config_file, "no product category")
-    elif product_website is None:
-        throw_config_error(config_file, "no product website")
-    elif product_logo is None:
-        throw_config_error(config_file, "no product logo")
-    elif vendor_name is None:
-        throw_config_error(config_file, "no vendor name")
-    elif vendor_website is None:
-        throw_config_error(config_file, "no vendor website")
-    elif vendor_logo is None:
-        throw_config_error(config_file, "no vendor logo")
-    elif wiki_link is None:
-        throw_config_error(config_file, "no wiki link")
-    elif is_official_plugin is None:
-        throw_config_error(config_file, "no official plugin indicator")
+    required_product_key_dict: dict[str, str] = {
+        "product-name": "no product name",
+        "product-category": "no product category",
+        "product-website": "no product website",
+        "product-logo": "no product logo",
+        "vendor-name": "no vendor name",
+        "vendor-website": "no vendor website",
+        "vendor-logo": "no vendor logo",
+        "wiki": "no wiki link",
+        "official-plugin": "no official plugin indicator",
+    }
+    for product_key, error_reason in required_product_key_dict.items():
+        if product_dict.get(product_key) is None:
+            throw_config_error(config_file, error_reason)
+
+    return {
+        "product": product_dict,
+        "repos": repo_record_list,
+    }
+
+
+# pylint: disable=too-many-locals
+def build_plugin(
+    config_file: Path,
+    plugin_record: dict[str, Any],
+    image_cache: "ImageCache | None" = None,
+) -> ChoicePlugin:
+    """
+    Creates the plugin described by a plugin record, as returned by
+    parse_config_file_record. Checks that the plugin's images exist, loading
+    them into the image cache if one is specified, and checks the values of
+    each repo.
+    """
+
+    product_dict: dict[str, str | None] = plugin_record["product"]
+
+    repo_list: list[ChoicePluginRepo] = []
+    for repo_id, repo_dict in plugin_record["repos"]:
+        method_logo_path: str | None = repo_dict.get("method-logo")
+        repo_list.append(
+            ChoicePluginRepo(
+                config_file=config_file,
+                internal_id=repo_id,
+                method_name=repo_dict.get("method-name"),
+                method_name_short=repo_dict.get("method-name-short"),
+                method_subtext=repo_dict.get("method-subtext"),
+                method_logo=(
+                    None
+                    if method_logo_path is None
+                    else load_image(
+                        method_logo_path,
+                        config_file,
+                        f"method logo for '{repo_id}'",
+                        "method-logo",
+                        image_cache,
+                    )
+                ),
+                method_type=repo_dict.get("method-type"),
+                install_warn_text=repo_dict.get("install-warn-text"),
+                unprivileged_check_script=repo_dict.get(
+                    "unprivileged-check-script"
+                ),
+                update_and_install_script=repo_dict.get(
+                    "update-and-install-script"
+                ),
+                install_script=repo_dict.get("install-script"),
+                uninstall_script=repo_dict.get("uninstall-script"),
+                purge_script=repo_dict.get("purge-script"),
+                update_and_install_script_unprivileged=repo_dict.get(
+                    "update-and-install-script-unprivileged"
+                ),
+                install_script_unprivileged=repo_dict.get(
+                    "install-script-unprivileged"
+                ),
+                uninstall_script_unprivileged=repo_dict.get(
+                    "uninstall-script-unprivileged"
+                ),
+                purge_script_unprivileged=repo_dict.get(
+                    "purge-script-unprivileged"
+                ),
+                launch_script=repo_dict.get("launch-script"),
+                install_status=repo_dict.get("install-status"),
+                install_status_deb=repo_dict.get("install-status-deb"),
+                install_status_flatpak=repo_dict.get("install-status-flatpak"),
+                capability=repo_dict.get("capability"),
+                capability_arch=repo_dict.get("capability-arch"),
+            )
+        )
+
+    product_name: str | None = product_dict["product-name"]
+    product_category: str | None = product_dict["product-category"]
+    product_website: str | None = product_dict["product-website"]
+    product_logo_path: str | None = product_dict["product-logo"]
+    vendor_name: str | None = product_dict["vendor-name"]
+    vendor_website: str | None = product_dict["vendor-website"]
+    vendor_logo_path: str | None = product_dict["vendor-logo"]
+    wiki_link: str | None = product_dict["wiki"]
+    official_plugin: str | None = product_dict["official-plugin"]
 
     assert product_name is not None
     assert product_category is not None
     assert product_website is not None
-    assert product_logo is not None
+    assert product_logo_path is not None
     assert vendor_name is not None
     assert vendor_website is not None
-    assert vendor_logo is not None
+    assert vendor_logo_path is not None
     assert wiki_link is not None
-    assert is_official_plugin is not None
+    assert official_plugin is not None
 
     output_plugin: ChoicePlugin = ChoicePlugin(
         product_name=product_name,
         product_category=product_category,
         product_website=product_website,
-        product_logo=product_logo,
+        product_logo=load_image(
+            product_logo_path,
+            config_file,
+            "product logo",
+            "product-logo",
+            image_cache,
+        ),
         vendor_name=vendor_name,
         vendor_website=vendor_website,
-        vendor_logo=vendor_logo,
+        vendor_logo=load_image(
+            vendor_logo_path,
+            config_file,
+            "vendor logo",
+            "vendor-logo",
+            image_cache,
+        ),
         wiki_link=wiki_link,
-        is_official_plugin=is_official_plugin,
+        is_official_plugin=official_plugin.lower() == "yes",
         repo_list=repo_list,
     )
     return output_plugin
 
 
-def parse_config_dir(config_dir: Path) -> list[ChoicePluginCategory]:
+def parse_config_file(
+    config_file: Path, image_cache: "ImageCache | None" = None
+) -> ChoicePlugin:
     """
-    Parses all plugin config files from the specified directory.
+    Parses a single plugin config file and returns the plugin it defines.
+    """
+
+    with trace_span("parse_config_file", plugin=str(config_file)):
+        return build_plugin(
+            config_file, parse_config_file_record(config_file), image_cache
+        )
+
+
+def prioritize_repo_probes(
+    repo_list: list[ChoicePluginRepo], priority: int = PRIORITY_VISIBLE
+) -> None:
+    """
+    Moves the probes of the specified repos ahead of other queued probes.
+    Used to resolve the state of whatever the user is currently looking at
+    first.
+    """
+
+    for repo in repo_list:
+        repo.start_probes(priority)
+    repo_probe_engine.prioritize(list(repo_list), priority)
+
+
+def refresh_repo_probes(
+    repo_list: list[ChoicePluginRepo], priority: int = PRIORITY_VISIBLE
+) -> None:
+    """
+    Discards the probe results of the specified repos after software changes
+    were applied to them, and probes them again in the background. Their
+    scripts are run again, the dpkg database and Flatpak installations are
+    read again, and the whole probe cache is invalidated, so that only results
+    probed from now on are stored in it.
+    """
+
+    for repo in repo_list:
+        repo.forget_probes()
+    for installed_state_resolver in {
+        repo.installed_state_resolver
+        for repo in repo_list
+        if repo.installed_state_resolver is not None
+    }:
+        installed_state_resolver.invalidate()
+    repo_probe_memo.forget(
+        [script for repo in repo_list for script in repo.probe_scripts()]
+    )
+    repo_probe_cache.invalidate()
+    prioritize_repo_probes(repo_list, priority)
+
+
+@trace_function
+def parse_config_dir(
+    config_dir: Path,
+    lazy_probing: bool = False,
+    plugin_loaded_callback: Callable[[ChoicePlugin], None] | None = None,
+    image_cache: "ImageCache | None" = None,
+) -> list[ChoicePluginCategory]:
+    """
+    Parses all plugin config files from the specified directory. If
+    lazy_probing is True, repo probes are only queued and this returns
+    without waiting for them. Probe-dependent repo state is then resolved on
+    demand when it is first read.
+
+    If plugin_loaded_callback is specified, it is called with each plugin as
+    soon as it has been loaded and its probes have been started, in sorted
+    file order, so that callers can use plugins before all of them are
+    loaded. It is called in the thread that called this function.
+
+    If image_cache is specified, all plugin images are loaded into it, and
+    images that can't be decoded are reported as errors. Otherwise, images
+    are only checked for existence.
     """
 
     config_file_list: list[Path] = []
@@ -723,9 +1051,82 @@ def parse_config_dir(config_dir: Path) -> list[ChoicePluginCategory]:
         config_file_list.append(config_file)
     config_file_list.sort()
 
+    ## Tokenizing and validating plugin files is skipped for files that
+    ## haven't changed since the last run. Images are always loaded from
+    ## their files, and repo values are always checked.
+    plugin_index: PluginIndex = PluginIndex(GlobalData.plugin_index_file_path)
+
+    def load_plugin_record(
+        config_file: Path,
+    ) -> tuple[list[int], dict[str, Any], bool]:
+        """
+        Returns the signature and record of a plugin file, and whether the
+        file had to be parsed because the index had no valid record for it.
+        """
+
+        signature: list[int] = get_file_signature(config_file)
+        plugin_record: dict[str, Any] | None = plugin_index.lookup(
+            config_file, signature
+        )
+        was_parsed: bool = plugin_record is None
+        if plugin_record is None:
+            with trace_span("parse_config_file", plugin=str(config_file)):
+                plugin_record = parse_config_file_record(config_file)
+        if image_cache is not None:
+            prefetch_plugin_images(plugin_record, image_cache)
+        return signature, plugin_record, was_parsed
+
+    ## The install-status probes of all repos are batched through a shared
+    ## resolver. Probes are started as soon as each plugin is built, so that
+    ## they run while the remaining plugins are still being loaded.
+    installed_state_resolver: InstalledStateResolver = InstalledStateResolver()
+
+    ## Plugin files are read and parsed on a pool of threads. Results are
+    ## collected in sorted file order, so plugin and category order doesn't
+    ## depend on which file finishes first, and if several files are
+    ## invalid, the error for the first of them in sorted order is raised.
     plugin_list: list[ChoicePlugin] = []
-    for config_file in config_file_list:
-        plugin_list.append(parse_config_file(config_file))
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(len(config_file_list), usable_cpu_count())),
+        thread_name_prefix="browser-choice-parse",
+    ) as parse_executor:
+        for config_file, (signature, plugin_record, was_parsed) in zip(
+            config_file_list,
+            parse_executor.map(load_plugin_record, config_file_list),
+        ):
+            with trace_span("build_plugin", plugin=str(config_file)):
+                try:
+                    plugin: ChoicePlugin = build_plugin(
+                        config_file, plugin_record, image_cache
+                    )
+                except Exception:
+                    ## A damaged or hand-edited plugin index may hold
+                    ## records that can't be built. Those files are parsed
+                    ## again, so only errors in the files themselves are
+                    ## reported.
+                    if was_parsed:
+                        raise
+                    plugin_record = parse_config_file_record(config_file)
+                    was_parsed = True
+                    plugin = build_plugin(
+                        config_file, plugin_record, image_cache
+                    )
+            if was_parsed:
+                plugin_index.store(config_file, signature, plugin_record)
+            for repo in plugin.repo_list:
+                repo.installed_state_resolver = installed_state_resolver
+                repo.start_probes()
+            plugin_list.append(plugin)
+            if plugin_loaded_callback is not None:
+                plugin_loaded_callback(plugin)
+    plugin_index.retain(config_file_list)
+    plugin_index.save()
+
+    if not lazy_probing:
+        for plugin in plugin_list:
+            for repo in plugin.repo_list:
+                repo.wait_for_probes()
+        repo_probe_cache.save()
 
     category_dict: dict[str, ChoicePluginCategory] = {}
     for plugin in plugin_list:
@@ -13,17 +13,20 @@ browser_choice_present.py - GUI layer of browser-choice.
 ## See https://github.com/python/mypy/issues/19410
 
 import sys
+import os
+import atexit
 import traceback
-import subprocess
 import functools
 import signal
 import datetime
+import queue
 from typing import (
-    Tuple,
+    Callable,
     NoReturn,
     Any,
 )
-from types import FrameType
+from types import FrameType, TracebackType
+from pathlib import Path
 
 from PyQt5.QtCore import (
     pyqtSignal,
@@ -51,7 +54,27 @@ from browser_choice.browser_choice_core import (
     ChoicePluginCategory,
     ChoicePluginRepo,
     parse_config_dir,
+    prioritize_repo_probes,
+    refresh_repo_probes,
+    repo_probe_engine,
 )
+from browser_choice.aptlists import (
+    apt_lists_are_fresh,
+    get_apt_lists_age,
+    get_update_maybe_helper_sources,
+)
+from browser_choice.environmentprobe import EnvironmentProbe
+from browser_choice.imagecache import plugin_image_cache
+from browser_choice.logwriter import LogWriter
+from browser_choice.runhistory import RunIndex
+from browser_choice.tracer import trace_function, trace_span, tracer
+from browser_choice.scriptprocess import run_launch
+from browser_choice.operationqueue import OperationQueue, QueuedOperation
+from browser_choice.packageprefetch import (
+    PackagePrefetcher,
+    speculative_download_enabled,
+)
+from browser_choice.probeengine import PRIORITY_SELECTED
 
 from browser_choice import GlobalData
 from browser_choice import get_usersession_warn_label
@@ -67,66 +90,46 @@ from browser_choice.applyingchangespage import ApplyingChangesPage
 from browser_choice.changescompletepage import ChangesCompletePage
 
 
-## This has to be a global so that it can be passed between threads. Trying to
-## send a Python list over a pyqtSignal results in a segfault.
-app_plugin_data: list[ChoicePluginCategory] = []
-
+def get_installed_method_list(plugin: ChoicePlugin) -> list[str] | None:
+    """
+    Returns the short names of all repos the plugin's application is
+    installed from, or None if there are none. Also returns None if the
+    plugin's repos haven't finished probing yet, rather than waiting for them.
+    """
 
-def convert_plugins_to_browser_cards(
-    plugin_data: list[ChoicePluginCategory],
-) -> Tuple[list[str], list[list[BrowserCard]]]:
-    """
-    Takes a list of plugins, and returns a list of BrowserCards corresponding
-    to those plugins.
-    """
-
-    app_type_list: list[str] = []
-    card_group_list: list[list[BrowserCard]] = []
-
-    for plugin_category in plugin_data:
-        app_type_list.append(plugin_category.category_name)
-        card_group: list[BrowserCard] = []
-
-        for plugin in plugin_category.plugin_list:
-            app_installed_method_list: list[str] | None = []
-            assert app_installed_method_list is not None
-            for repo in plugin.repo_list:
-                if repo.is_installed:
-                    app_installed_method_list.append(repo.method_name_short)
-
-            if len(app_installed_method_list) == 0:
-                app_installed_method_list = None
-
-            new_card = BrowserCard(
-                plugin.product_name,
-                plugin.vendor_name,
-                plugin.product_website,
-                plugin.wiki_link,
-                plugin.vendor_website,
-                plugin.product_logo,
-                plugin.vendor_logo,
-                [x.method_name_short for x in plugin.repo_list],
-                app_installed_method_list,
-            )
-            card_group.append(new_card)
+    for repo in plugin.repo_list:
+        if not repo.probes_done():
+            return None
 
-        card_group_list.append(card_group)
+    app_installed_method_list: list[str] = []
+    for repo in plugin.repo_list:
+        if repo.is_installed:
+            app_installed_method_list.append(repo.method_name_short)
 
-    return app_type_list, card_group_list
+    if len(app_installed_method_list) == 0:
+        return None
+    return app_installed_method_list
 
 
-def check_package_installed(package_name: str) -> bool:
+def make_browser_card(plugin: ChoicePlugin) -> BrowserCard:
     """
-    Checks if the specified package is installed.
+    Creates the BrowserCard for a plugin. Installed state is left out if the
+    plugin is still being probed.
     """
 
-    check_process = subprocess.run(
-        ["/usr/bin/package-installed-check", package_name],
-        check=False,
+    return BrowserCard(
+        plugin.product_name,
+        plugin.vendor_name,
+        plugin.product_website,
+        plugin.wiki_link,
+        plugin.vendor_website,
+        plugin_image_cache.logo_pixmap(
+            plugin.product_logo_path, "product-logo"
+        ),
+        plugin_image_cache.logo_pixmap(plugin.vendor_logo_path, "vendor-logo"),
+        [x.method_name_short for x in plugin.repo_list],
+        get_installed_method_list(plugin),
     )
-    if check_process.returncode == 0:
-        return True
-    return False
 
 
 def are_unofficial_plugins_present(
@@ -144,13 +147,91 @@ def are_unofficial_plugins_present(
     return False
 
 
+def get_update_skip_str() -> str:
+    """
+    Returns a note telling the user that refreshing the package lists is
+    skipped, since they were refreshed recently.
+    """
+
+    lists_age: int | None = get_apt_lists_age()
+    assert lists_age is not None
+    return (
+        "NOTE: The package lists were refreshed "
+        f"{max(lists_age // 60, 1)} minute(s) ago, so they will not be "
+        "refreshed again before installing."
+    )
+
+
 def write_to_log(line: str) -> None:
     """
-    Writes a line of text to browser-choice's log file, if it exists.
+    Writes a line of text to browser-choice's log file, if it exists. The
+    line is written in the background.
+    """
+
+    if GlobalData.log_writer is not None:
+        GlobalData.log_writer.write_line(line)
+
+
+def update_run_index(update_func: Callable[[RunIndex, int], None]) -> None:
+    """
+    Updates the run index of browser-choice's log file, if it exists. The
+    update happens in the log writer thread, in order with the lines written
+    to the log file, and is passed the offset of the next line.
     """
 
-    if GlobalData.log_file is not None:
-        print(line, file=GlobalData.log_file)
+    if GlobalData.log_writer is None or GlobalData.run_index is None:
+        return
+    GlobalData.log_writer.call_in_order(
+        functools.partial(update_func, GlobalData.run_index)
+    )
+
+
+def close_log() -> None:
+    """
+    Writes all lines still waiting to be written to browser-choice's log
+    file, and closes it.
+    """
+
+    if GlobalData.log_writer is not None:
+        GlobalData.log_writer.close()
+
+
+class RepoProbeNotifier(QObject):
+    """
+    Relays the completion of repo probes, which happens in probe worker
+    threads, to the GUI thread.
+    """
+
+    repoProbed: pyqtSignal = pyqtSignal()
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        ## Repos are handed over through a queue, see the comment in
+        ## PluginDataLoader.
+        self.probed_repo_queue: queue.SimpleQueue[ChoicePluginRepo] = (
+            queue.SimpleQueue()
+        )
+        repo_probe_engine.add_done_callback(self.repo_probe_done)
+
+    def repo_probe_done(self, repo: Any) -> None:
+        """
+        Probe engine callback. Runs in a probe worker thread.
+        """
+
+        self.probed_repo_queue.put(repo)
+        self.repoProbed.emit()
+
+    def take_probed_repos(self) -> list[ChoicePluginRepo]:
+        """
+        Returns all repos that finished probing since the last call.
+        """
+
+        repo_list: list[ChoicePluginRepo] = []
+        while True:
+            try:
+                repo_list.append(self.probed_repo_queue.get_nowait())
+            except queue.Empty:
+                return repo_list
 
 
 # pylint: disable=too-few-public-methods
@@ -232,37 +313,126 @@ class SplashScreenDialog(QDialog):
         self.root_layout.addWidget(self.progress_bar)
 
 
-# pylint: disable=too-many-instance-attributes
+# pylint: disable=too-many-instance-attributes,too-many-public-methods
 class BrowserChoiceWindow(QDialog):
     """
     Core BrowserChoice window.
     """
 
+    @trace_function
     def __init__(
         self,
         plugin_data: list[ChoicePluginCategory],
+        environment_probe: EnvironmentProbe,
         parent: QWidget | None = None,
     ):
         super(QWidget, self).__init__(parent)
 
         self.setWindowFlags(Qt.Window)
 
-        self.in_sysmaint_session: bool = (
-            subprocess.run(
-                [
-                    "/usr/libexec/helper-scripts/boot-session-detection.bsh",
-                ],
-                check=False,
-                capture_output=True,
-                encoding="utf-8",
-            ).stdout.strip()
-            == "sysmaint_session"
+        ## The environment is probed asynchronously. Until the boot session
+        ## is known, the user can't continue past the first page. Until
+        ## network access is known, actions requiring it are unavailable.
+        self.environment_probe: EnvironmentProbe = environment_probe
+        self.in_sysmaint_session: bool = False
+        self.user_sysmaint_split_installed: bool = False
+        self.is_network_connected: bool = False
+
+        self.setGeometry(QRect(0, 0, 865, 700))
+        self.root_layout = QVBoxLayout(self)
+        self.setWindowTitle("Browser Choice")
+
+        self.plugin_data: list[ChoicePluginCategory] = []
+
+        self.chosen_plugin: ChoicePlugin | None = None
+        self.chosen_repo: ChoicePluginRepo | None = None
+        self.change_str: str | None = None
+        self.command_str: str | None = None
+        self.allow_app_launch: bool = False
+
+        self.current_page: QWidget | None = None
+        self.select_application_page: SelectApplicationPage | None = None
+        self.choose_installation_page: ChooseInstallationPage | None = None
+        self.applying_changes_page: ApplyingChangesPage | None = None
+        self.changes_complete_page: ChangesCompletePage | None = None
+
+        ## Software changes are queued, so that the user can choose more
+        ## changes while earlier ones are still being applied.
+        self.operation_queue: OperationQueue = OperationQueue(self)
+        self.operation_queue.allOperationsFinished.connect(
+            self.all_operations_completed
+        )
+        ## Set if the user asked to exit while software changes were still
+        ## being applied.
+        self.exit_when_idle: bool = False
+
+        ## If enabled, packages are downloaded while the user is still
+        ## choosing where to install an application from.
+        self.package_prefetcher: PackagePrefetcher | None = (
+            PackagePrefetcher(self) if speculative_download_enabled() else None
         )
+        if self.package_prefetcher is not None:
+            self.package_prefetcher.stopped.connect(
+                functools.partial(self.operation_queue.release_backend, "apt")
+            )
 
-        self.user_sysmaint_split_installed: bool = check_package_installed(
-            "user-sysmaint-split"
+        ## Plugin repos may still be probed in the background. BrowserCards
+        ## are updated as the probes of their plugin finish.
+        self.browser_card_dict: dict[
+            ChoicePluginRepo, tuple[BrowserCard, ChoicePlugin]
+        ] = {}
+        self.repo_probe_notifier: RepoProbeNotifier = RepoProbeNotifier(self)
+        self.repo_probe_notifier.repoProbed.connect(
+            self.update_probed_browser_cards
         )
 
+        self.make_select_application_page()
+        assert self.select_application_page is not None
+        for plugin_category in plugin_data:
+            for plugin in plugin_category.plugin_list:
+                self.add_plugin(plugin)
+        self.switch_to_page(self.select_application_page)
+
+        self.environment_probe.sessionProbed.connect(self.session_probed)
+        self.environment_probe.networkProbed.connect(self.network_probed)
+        if self.environment_probe.is_network_connected is not None:
+            self.network_probed()
+        if self.environment_probe.session_probed():
+            self.session_probed()
+
+    def get_restrict_type(self) -> str:
+        """
+        Returns how the environment browser-choice runs in restricts software
+        changes.
+        """
+
+        if GlobalData.qube_type != "none":
+            return GlobalData.qube_type
+        if (
+            self.user_sysmaint_split_installed
+            and not self.in_sysmaint_session
+            and GlobalData.uid != 0
+        ):
+            return "user_session"
+        return "none"
+
+    def session_probed(self) -> None:
+        """
+        Qt signal handler. Triggered when the boot session is known. Updates
+        the restriction notice, warns the user about restrictions if needed,
+        and allows continuing past "Step 1/4: Select Application".
+        """
+
+        assert self.select_application_page is not None
+        assert self.environment_probe.in_sysmaint_session is not None
+        assert self.environment_probe.user_sysmaint_split_installed is not None
+
+        self.in_sysmaint_session = self.environment_probe.in_sysmaint_session
+        self.user_sysmaint_split_installed = (
+            self.environment_probe.user_sysmaint_split_installed
+        )
+        self.select_application_page.setRestrictType(self.get_restrict_type())
+
         init_warn_dialog: InitWarnDialog | None = None
         if GlobalData.qube_type in ("appvm", "dispvm"):
             init_warn_dialog = InitWarnDialog(
@@ -279,52 +449,39 @@ class BrowserChoiceWindow(QDialog):
         if init_warn_dialog is not None:
             init_warn_dialog.deleteLater()
 
-        self.setGeometry(QRect(0, 0, 865, 700))
-        self.root_layout = QVBoxLayout(self)
-        self.setWindowTitle("Browser Choice")
+        self.select_application_page.setContinueAllowed(True)
 
-        self.plugin_data = plugin_data
-
-        if GlobalData.qube_type == "templatevm":
-            self.is_network_connected: bool = True
-            ## The HTTP proxy for Qubes TemplateVMs is configured by
-            ## /usr/libexec/browser-choice/qubes-proxy-maybe.
-        else:
-            self.is_network_connected = (
-                subprocess.run(
-                    ["/usr/libexec/helper-scripts/check-network-access"],
-                    check=False,
-                ).returncode
-                == 0
-            )
-
-        self.chosen_plugin: ChoicePlugin | None = None
-        self.chosen_repo: ChoicePluginRepo | None = None
-        self.change_str: str | None = None
-        self.allow_app_launch: bool = False
-
-        self.current_page: QWidget | None = None
-        self.select_application_page: SelectApplicationPage | None = None
-        self.choose_installation_page: ChooseInstallationPage | None = None
-        self.applying_changes_page: ApplyingChangesPage | None = None
-        self.changes_complete_page: ChangesCompletePage | None = None
-
-        self.execute_process: QProcess | None = None
-        self.execute_process_successful: bool = False
-        self.stdout_buffer: bytes = b""
+    def network_probed(self) -> None:
+        """
+        Qt signal handler. Triggered when network access is known, and
+        whenever it changes afterwards. Updates the network warning and the
+        actions available on "Step 2/4: Choose Installation Options".
+        """
 
-        self.make_select_application_page()
         assert self.select_application_page is not None
-        self.switch_to_page(self.select_application_page)
+        assert self.environment_probe.is_network_connected is not None
+
+        self.is_network_connected = self.environment_probe.is_network_connected
+        self.select_application_page.setNetworkConnected(
+            self.is_network_connected
+        )
+        if self.choose_installation_page is not None:
+            self.choose_installation_page.setNetworkConnected(
+                self.is_network_connected
+            )
 
     ## Overrides QMainWindow.closeEvent
     # pylint: disable=unused-argument,invalid-name
     def closeEvent(self, e: Any) -> None:
         """
-        Terminates the application when the main window is closed.
+        Terminates the application when the main window is closed, or once
+        queued software changes have been applied if they are still running.
         """
 
-        sys.exit(0)
+        if self.operation_queue.is_idle():
+            sys.exit(0)
+        e.ignore()
+        self.exit_when_operations_finished()
 
     def switch_to_page(self, page: QWidget) -> None:
         """
@@ -344,42 +501,115 @@ class BrowserChoiceWindow(QDialog):
         """
 
         ## This will only ever be called once when first instantiating the
-        ## page, so we don't need to have any teardown code here.
-        app_type_list: list[str]
-        card_group_list: list[list[BrowserCard]]
-        app_type_list, card_group_list = convert_plugins_to_browser_cards(
-            self.plugin_data
-        )
-
+        ## page, so we don't need to have any teardown code here. The page
+        ## starts out empty, plugins are added as they are loaded.
         select_application_page: SelectApplicationPage = SelectApplicationPage(
-            app_type_list=app_type_list,
-            card_group_list=card_group_list,
-            restrict_type=(
-                GlobalData.qube_type
-                if GlobalData.qube_type != "none"
-                else (
-                    "user_session"
-                    if (
-                        self.user_sysmaint_split_installed
-                        and not self.in_sysmaint_session
-                        and GlobalData.uid != 0
-                    )
-                    else "none"
-                )
+            app_type_list=[],
+            card_group_list=[],
+            restrict_type=self.get_restrict_type(),
+            show_unofficial_warning=False,
+            ## Don't warn about missing network access before it is known.
+            is_network_connected=(
+                self.environment_probe.is_network_connected is not False
             ),
-            show_unofficial_warning=(
-                are_unofficial_plugins_present(self.plugin_data)
-            ),
-            is_network_connected=self.is_network_connected,
             parent=self,
         )
-        select_application_page.cancelClicked.connect(self.exit_app)
+        select_application_page.setContinueAllowed(
+            self.environment_probe.session_probed()
+        )
+        select_application_page.cancelClicked.connect(
+            self.cancel_select_application
+        )
         select_application_page.continueClicked.connect(
             self.make_and_switch_to_choose_installation_page
         )
+        select_application_page.currentTabChanged.connect(
+            self.prioritize_category_probes
+        )
 
         self.select_application_page = select_application_page
 
+    @trace_function
+    def add_plugin(self, plugin: ChoicePlugin) -> None:
+        """
+        Adds a newly loaded plugin to the "Select Application" page, creating
+        its category tab if needed.
+        """
+
+        assert self.select_application_page is not None
+
+        category_idx: int | None = None
+        for idx, plugin_category in enumerate(self.plugin_data):
+            if plugin_category.category_name == plugin.product_category:
+                category_idx = idx
+                break
+        if category_idx is None:
+            self.plugin_data.append(
+                ChoicePluginCategory(plugin.product_category)
+            )
+            category_idx = self.select_application_page.addCategory(
+                plugin.product_category
+            )
+        self.plugin_data[category_idx].add_plugin(plugin)
+
+        browser_card: BrowserCard = make_browser_card(plugin)
+        self.select_application_page.addCard(category_idx, browser_card)
+        browser_card.toggled.connect(
+            functools.partial(
+                self.prioritize_plugin_probes, browser_card, plugin
+            )
+        )
+        for repo in plugin.repo_list:
+            self.browser_card_dict[repo] = (browser_card, plugin)
+
+        self.select_application_page.setShowUnofficialWarning(
+            are_unofficial_plugins_present(self.plugin_data)
+        )
+        if category_idx == self.select_application_page.tabIndex():
+            prioritize_repo_probes(plugin.repo_list)
+
+    def prioritize_category_probes(self, category_idx: int) -> None:
+        """
+        Qt signal handler. Moves the probes of all plugins in the currently
+        visible category ahead of the others.
+        """
+
+        if category_idx < 0 or category_idx >= len(self.plugin_data):
+            return
+        prioritize_repo_probes(
+            [
+                repo
+                for plugin in self.plugin_data[category_idx].plugin_list
+                for repo in plugin.repo_list
+            ]
+        )
+
+    def prioritize_plugin_probes(
+        self, browser_card: BrowserCard, plugin: ChoicePlugin
+    ) -> None:
+        """
+        Qt signal handler. Moves the probes of the plugin the user just
+        selected to the front of the queue, since its state is needed as soon
+        as the user continues.
+        """
+
+        if browser_card.isChecked():
+            prioritize_repo_probes(plugin.repo_list, PRIORITY_SELECTED)
+
+    def update_probed_browser_cards(self) -> None:
+        """
+        Qt signal handler. Updates the installed state shown on BrowserCards
+        whose plugins have finished probing.
+        """
+
+        for repo in self.repo_probe_notifier.take_probed_repos():
+            if repo not in self.browser_card_dict:
+                continue
+            browser_card, plugin = self.browser_card_dict[repo]
+            browser_card.setInstalledMethodList(
+                get_installed_method_list(plugin)
+            )
+
     @staticmethod
     def arg_filter_switch(arg1: Any, arg2: Any, which_arg: bool) -> Any:
         """
@@ -421,7 +651,9 @@ class BrowserChoiceWindow(QDialog):
                 repo_id=plugin_repo.internal_id,
                 package_short_description=plugin_repo.method_name,
                 package_long_description=plugin_repo.method_subtext,
-                package_icon=plugin_repo.method_logo,
+                package_icon=plugin_image_cache.logo_pixmap(
+                    plugin_repo.method_logo_path, "method-logo"
+                ),
                 supports_install=self.arg_filter_switch(
                     plugin_repo.install_script,
                     plugin_repo.install_script_unprivileged,
@@ -461,13 +693,49 @@ class BrowserChoiceWindow(QDialog):
             parent=self,
         )
         choose_installation_page.backClicked.connect(
-            functools.partial(self.switch_to_page, self.select_application_page)
+            self.leave_choose_installation_page
+        )
+        choose_installation_page.currentCardChanged.connect(
+            self.prefetch_chosen_repo
         )
         choose_installation_page.continueClicked.connect(
             self.confirm_installation_choice
         )
         self.choose_installation_page = choose_installation_page
 
+    def prefetch_chosen_repo(self, repo_idx: int, can_install: bool) -> None:
+        """
+        Qt signal handler. Starts downloading the packages of the repo the
+        user selected on "Step 2/4: Choose Installation Options", if enabled
+        and the application can be installed from it. Cancels any download
+        for a previously selected repo.
+        """
+
+        if self.package_prefetcher is None:
+            return
+        assert self.chosen_plugin is not None
+
+        if (
+            not can_install
+            or not self.is_network_connected
+            or self.operation_queue.backend_is_busy("apt")
+        ):
+            self.package_prefetcher.cancel()
+            return
+        self.package_prefetcher.prefetch(self.chosen_plugin.repo_list[repo_idx])
+
+    def leave_choose_installation_page(self) -> None:
+        """
+        Qt signal handler. Cancels downloading packages, and returns to "Step
+        1/4: Select Application".
+        """
+
+        assert self.select_application_page is not None
+
+        if self.package_prefetcher is not None:
+            self.package_prefetcher.cancel()
+        self.switch_to_page(self.select_application_page)
+
     def make_and_switch_to_choose_installation_page(self) -> None:
         """
         Qt signal handler. Creates the page for "Step 2/4: Choose Installation
@@ -498,6 +766,8 @@ class BrowserChoiceWindow(QDialog):
         assert self.chosen_repo is not None
 
         command_str: str | None = None
+        update_skip_str: str | None = None
+        self.allow_app_launch = False
 
         match self.choose_installation_page.manageMode():
             case ManageMode.UpdateAndInstall:
@@ -516,6 +786,16 @@ class BrowserChoiceWindow(QDialog):
                     self.chosen_repo.update_and_install_script_unprivileged,
                     self.chosen_repo.mod_requires_privileges,
                 )
+                ## Installing without refreshing the package lists first is
+                ## enough if they were refreshed recently.
+                install_str: str | None = self.arg_filter_switch(
+                    self.chosen_repo.install_script,
+                    self.chosen_repo.install_script_unprivileged,
+                    self.chosen_repo.mod_requires_privileges,
+                )
+                if install_str is not None and apt_lists_are_fresh():
+                    command_str = install_str
+                    update_skip_str = get_update_skip_str()
             case ManageMode.Install:
                 self.change_str = "installed"
                 if (
@@ -532,6 +812,14 @@ class BrowserChoiceWindow(QDialog):
                     self.chosen_repo.install_script_unprivileged,
                     self.chosen_repo.mod_requires_privileges,
                 )
+                if command_str is not None:
+                    helper_source_list: list[Path] | None = (
+                        get_update_maybe_helper_sources(command_str)
+                    )
+                    if helper_source_list is not None and apt_lists_are_fresh(
+                        helper_source_list
+                    ):
+                        update_skip_str = get_update_skip_str()
             case ManageMode.Remove:
                 self.change_str = "removed"
                 command_str = self.arg_filter_switch(
@@ -565,13 +853,15 @@ class BrowserChoiceWindow(QDialog):
                 and not GlobalData.uid == 0
             )
             if len(sys.argv) == 2:
-                self.chosen_repo.run_launch(sys.argv[1])
+                run_launch(self.chosen_repo, sys.argv[1])
             else:
-                self.chosen_repo.run_launch()
-            sys.exit(0)
+                run_launch(self.chosen_repo)
+            self.exit_when_operations_finished()
+            return
 
         assert self.change_str is not None
         assert command_str is not None
+        self.command_str = command_str
 
         confirm_installation_dialog = ConfirmInstallationDialog(
             app_name=self.chosen_plugin.product_name,
@@ -582,6 +872,7 @@ class BrowserChoiceWindow(QDialog):
             is_apt_third_party_repo=(
                 self.chosen_repo.method_type == "apt-thirdparty"
             ),
+            update_skip_str=update_skip_str,
             parent=self,
         )
         confirm_installation_dialog.exec()
@@ -591,175 +882,239 @@ class BrowserChoiceWindow(QDialog):
 
     def apply_software_changes(self) -> None:
         """
-        Applies the user's chosen software modifications to the system. This
-        involves creating and switching to "Step 3/4: Applying Software
-        Changes".
+        Queues the user's chosen software modifications to be applied to the
+        system. This involves creating "Step 3/4: Applying Software Changes"
+        if needed and switching to it.
         """
 
-        assert self.choose_installation_page is not None
+        assert self.chosen_plugin is not None
         assert self.chosen_repo is not None
+        assert self.change_str is not None
+        assert self.command_str is not None
+        assert self.choose_installation_page is not None
 
-        self.applying_changes_page = ApplyingChangesPage()
-        self.applying_changes_page.continueClicked.connect(
-            self.show_software_changes_complete
-        )
+        ## The installation resumes any download that was still running. It
+        ## can only start once the download has exited, since the download
+        ## holds the APT cache lock until then.
+        if self.package_prefetcher is not None:
+            self.package_prefetcher.cancel()
+            if self.package_prefetcher.is_running():
+                self.operation_queue.hold_backend("apt")
+
+        if self.applying_changes_page is None:
+            self.applying_changes_page = ApplyingChangesPage()
+            self.applying_changes_page.continueClicked.connect(
+                self.show_software_changes_complete
+            )
+            self.applying_changes_page.queueMoreClicked.connect(
+                self.queue_more_software_changes
+            )
+            timestamp_str: str = datetime.datetime.now().strftime(
+                "%Y-%m-%d %H:%M:%S"
+            )
+            update_run_index(
+                lambda run_index, offset: run_index.start_run(
+                    offset, timestamp_str
+                )
+            )
+            write_to_log(f"----- browser-choice run on {timestamp_str} -----")
+        self.applying_changes_page.setContinueEnabled(False)
         self.switch_to_page(self.applying_changes_page)
 
-        write_to_log(
-            "----- browser-choice run on "
-            f"{datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')} "
-            "-----"
+        operation: QueuedOperation = QueuedOperation(
+            plugin=self.chosen_plugin,
+            repo=self.chosen_repo,
+            change_str=self.change_str,
+            script=self.command_str,
+            allow_launch=self.allow_app_launch,
+            parent=self,
+        )
+        operation_idx: int = self.applying_changes_page.addOperation(
+            operation.title
+        )
+        operation.outputLine.connect(
+            functools.partial(
+                self.operation_output_received, operation_idx, operation
+            )
+        )
+        operation.progressChanged.connect(
+            functools.partial(
+                self.operation_progress_changed, operation_idx, operation
+            )
+        )
+        operation.finished.connect(
+            functools.partial(
+                self.operation_completed, operation_idx, operation
+            )
         )
 
-        match self.choose_installation_page.manageMode():
-            case ManageMode.UpdateAndInstall:
-                write_to_log(
-                    "Executing command: "
-                    f"{self.chosen_repo.update_and_install_script}"
-                )
-                if self.chosen_repo.mod_requires_privileges:
-                    self.execute_process = (
-                        self.chosen_repo.run_update_and_install()
-                    )
-                else:
-                    self.execute_process = (
-                        self.chosen_repo.run_update_and_install_unprivileged()
-                    )
-            case ManageMode.Install:
-                write_to_log(
-                    f"Executing command: {self.chosen_repo.install_script}"
-                )
-                if self.chosen_repo.mod_requires_privileges:
-                    self.execute_process = self.chosen_repo.run_install()
-                else:
-                    self.execute_process = (
-                        self.chosen_repo.run_install_unprivileged()
-                    )
-            case ManageMode.Remove:
-                write_to_log(
-                    f"Executing command: {self.chosen_repo.uninstall_script}"
-                )
-                if self.chosen_repo.mod_requires_privileges:
-                    self.execute_process = self.chosen_repo.run_uninstall()
-                else:
-                    self.execute_process = (
-                        self.chosen_repo.run_uninstall_unprivileged()
-                    )
-            case ManageMode.Purge:
-                write_to_log(
-                    f"Executing command: {self.chosen_repo.purge_script}"
-                )
-                if self.chosen_repo.mod_requires_privileges:
-                    self.execute_process = self.chosen_repo.run_purge()
-                else:
-                    self.execute_process = (
-                        self.chosen_repo.run_purge_unprivileged()
-                    )
-            case _:
-                error_dialog = ErrorDialog(
-                    "<p>Unreachable code hit in <code>apply_software_changes</code>."
-                )
-                error_dialog.exec()
-                sys.exit(1)
+        mode_str: str = self.choose_installation_page.manageMode().name
+        update_run_index(
+            lambda run_index, offset: run_index.add_operation(
+                offset,
+                operation.plugin.product_name,
+                operation.repo.internal_id,
+                mode_str,
+            )
+        )
+        write_to_log(f"[{operation.title}] Queued command: {operation.script}")
+        self.operation_queue.enqueue(operation)
 
-        assert self.execute_process is not None
+    def operation_output_received(
+        self, operation_idx: int, operation: QueuedOperation, line_text: str
+    ) -> None:
+        """
+        Qt signal handler. Triggered when the script of a queued operation
+        outputs a line. Prints the line to the operation's log view on "Step
+        3/4: Applying Software Changes", and to the log file.
+        """
 
-        self.execute_process.finished.connect(self.execute_process_completed)
-        self.execute_process.readyReadStandardOutput.connect(
-            self.execute_process_output_received
-        )
+        assert self.applying_changes_page is not None
 
-    # pylint: disable=unused-argument
-    def execute_process_completed(
-        self, exit_code: int, exit_status: QProcess.ExitStatus
+        self.applying_changes_page.logLine(line_text, operation_idx)
+        write_to_log(f"[{operation.title}] {line_text}")
+
+    def operation_progress_changed(
+        self, operation_idx: int, operation: QueuedOperation
     ) -> None:
         """
-        Qt signal handler. Triggered when the script that applies software
-        modifications finishes running. Finishes with log cleanup, records
-        internally whether the script was successful or not, and enables
-        the continue button on "Step 3/4: Applying Software Changes".
+        Qt signal handler. Triggered when the progress of a queued operation
+        changes. Shows it above the operation's log view on "Step 3/4:
+        Applying Software Changes".
         """
 
-        assert self.execute_process is not None
         assert self.applying_changes_page is not None
 
-        self.stdout_buffer += (
-            self.execute_process.readAllStandardOutput().data()  # type: ignore
+        self.applying_changes_page.setOperationProgress(
+            operation_idx,
+            operation.progress.describe(),
+            operation.progress.percent,
         )
-        stdout_text: str = self.stdout_buffer.decode(encoding="utf-8")
-        self.applying_changes_page.logLine(stdout_text)
-        write_to_log(stdout_text)
 
-        if exit_code == 0:
-            self.execute_process_successful = True
-            self.applying_changes_page.logLine(
-                "Done, operation was successful."
-            )
-            write_to_log("Done, operation was successful.")
-            subprocess.run(
-                [
-                    "/usr/bin/notify-send",
-                    "--app-name=Browser Choice",
-                    "Done",
-                    f"Browser was successfully {self.change_str}.",
-                ],
-                check=False,
+    def operation_completed(
+        self, operation_idx: int, operation: QueuedOperation, successful: bool
+    ) -> None:
+        """
+        Qt signal handler. Triggered when the script of a queued operation
+        finishes running. Logs and announces whether it was successful, and
+        probes the plugin's repos again, since their state has changed.
+        """
+
+        assert self.applying_changes_page is not None
+
+        ## Even a failed operation may have changed something. BrowserCards
+        ## are updated once the new probes finish.
+        refresh_repo_probes(operation.plugin.repo_list)
+
+        if successful:
+            result_str: str = "Done, operation was successful."
+            notify_title_str: str = "Done"
+            notify_str: str = (
+                f"{operation.plugin.product_name} was successfully "
+                f"{operation.change_str}."
             )
         else:
-            self.execute_process_successful = False
-            self.applying_changes_page.logLine("Done, but operation failed!")
-            write_to_log("Done, but operation failed!")
-            subprocess.run(
-                [
-                    "/usr/bin/notify-send",
-                    "--app-name=Browser Choice",
-                    "Failed",
-                    f"Browser could not be {self.change_str}!",
-                ],
-                check=False,
+            result_str = "Done, but operation failed!"
+            notify_title_str = "Failed"
+            notify_str = (
+                f"{operation.plugin.product_name} could not be "
+                f"{operation.change_str}!"
             )
-        self.applying_changes_page.setContinueEnabled(True)
+        self.applying_changes_page.logLine(result_str, operation_idx)
+        write_to_log(f"[{operation.title}] {result_str}")
+        self.applying_changes_page.setOperationProgress(
+            operation_idx,
+            result_str,
+            100.0 if successful else None,
+            is_done=True,
+        )
+        update_run_index(
+            lambda run_index, _: run_index.finish_operation(
+                operation_idx, operation.exit_code
+            )
+        )
+        ## Sending a notification may take a while, don't wait for it.
+        QProcess.startDetached(
+            "/usr/bin/notify-send",
+            [
+                "--app-name=Browser Choice",
+                notify_title_str,
+                notify_str,
+            ],
+        )
 
-    def execute_process_output_received(self) -> None:
+    def all_operations_completed(self) -> None:
         """
-        Qt signal handler. Triggered when the script that applies software
-        modifications generates output. Grabs any available output, and prints
-        any lines received from the script to the log view of "Step 3/4:
-        Applying Software Changes".
+        Qt signal handler. Triggered when all queued operations have finished.
+        Enables the continue button on "Step 3/4: Applying Software Changes".
         """
 
-        assert self.execute_process is not None
         assert self.applying_changes_page is not None
 
-        self.stdout_buffer += (
-            self.execute_process.readAllStandardOutput().data()  # type: ignore
-        )
-        while b"\n" in self.stdout_buffer:
-            cutoff_idx: int = self.stdout_buffer.index(b"\n")
-            buffer_line: bytes = self.stdout_buffer[:cutoff_idx]
-            self.stdout_buffer = self.stdout_buffer[cutoff_idx + 1 :]
-            line_text: str = buffer_line.decode(encoding="utf-8")
-            self.applying_changes_page.logLine(line_text)
-            write_to_log(line_text)
+        if self.exit_when_idle:
+            sys.exit(0)
+        self.applying_changes_page.setContinueEnabled(True)
+
+    def queue_more_software_changes(self) -> None:
+        """
+        Qt signal handler. Returns to "Step 1/4: Select Application" so the
+        user can choose another software change, while the queued changes
+        keep being applied.
+        """
+
+        assert self.select_application_page is not None
+
+        self.switch_to_page(self.select_application_page)
+
+    def cancel_select_application(self) -> None:
+        """
+        Qt signal handler. Exits the wizard, unless software changes have
+        already been queued, in which case this returns to "Step 3/4:
+        Applying Software Changes".
+        """
+
+        if self.applying_changes_page is None:
+            self.exit_app()
+            return
+        self.switch_to_page(self.applying_changes_page)
 
     def show_software_changes_complete(self) -> None:
         """
-        Creates and displays "Step 4/4: Software Changes Complete".
+        Creates and displays "Step 4/4: Software Changes Complete". The page
+        describes the last queued operation, and summarizes the others.
         """
 
-        assert self.chosen_plugin is not None
-        assert self.chosen_repo is not None
-        assert self.change_str is not None
+        assert len(self.operation_queue.operation_list) != 0
+
+        operation_list: list[QueuedOperation] = (
+            self.operation_queue.operation_list
+        )
+        last_operation: QueuedOperation = operation_list[-1]
+        other_change_list: list[str] = []
+        for operation in operation_list[:-1]:
+            if operation.successful:
+                other_change_list.append(
+                    f"'{operation.plugin.product_name}' from "
+                    f"'{operation.repo.method_name_short}' has been "
+                    f"{operation.change_str}."
+                )
+            else:
+                other_change_list.append(
+                    f"'{operation.plugin.product_name}' from "
+                    f"'{operation.repo.method_name_short}' could not be "
+                    f"{operation.change_str}."
+                )
 
         self.changes_complete_page = ChangesCompletePage(
-            app_name=self.chosen_plugin.product_name,
-            repository_name=self.chosen_repo.method_name_short,
-            app_script=self.chosen_repo.launch_script,
-            change_str=self.change_str,
-            did_succeed=self.execute_process_successful,
-            allow_launch=self.allow_app_launch,
+            app_name=last_operation.plugin.product_name,
+            repository_name=last_operation.repo.method_name_short,
+            app_script=last_operation.repo.launch_script,
+            change_str=last_operation.change_str,
+            did_succeed=last_operation.successful,
+            allow_launch=last_operation.allow_launch,
             in_sysmaint_session=self.in_sysmaint_session,
             user_sysmaint_split_installed=self.user_sysmaint_split_installed,
+            other_change_list=other_change_list,
         )
         self.changes_complete_page.doneClicked.connect(self.finish_wizard)
         self.switch_to_page(self.changes_complete_page)
@@ -771,15 +1126,44 @@ class BrowserChoiceWindow(QDialog):
         """
 
         assert self.changes_complete_page is not None
-        assert self.chosen_repo is not None
+        assert len(self.operation_queue.operation_list) != 0
 
         if self.changes_complete_page.launchAppChecked():
+            launch_repo: ChoicePluginRepo = self.operation_queue.operation_list[
+                -1
+            ].repo
             if len(sys.argv) == 2:
-                self.chosen_repo.run_launch(sys.argv[1])
+                run_launch(launch_repo, sys.argv[1])
             else:
-                self.chosen_repo.run_launch()
+                run_launch(launch_repo)
         sys.exit(0)
 
+    def exit_when_operations_finished(self) -> None:
+        """
+        Exits the wizard. If queued software changes are still being applied,
+        switches to "Step 3/4: Applying Software Changes" instead, and exits
+        once they are done, since exiting would interrupt apt or dpkg in the
+        middle of a transaction.
+        """
+
+        if self.operation_queue.is_idle():
+            sys.exit(0)
+        assert self.applying_changes_page is not None
+
+        if not self.exit_when_idle:
+            self.exit_when_idle = True
+            ## Operation indexes are assigned in queue order.
+            for operation_idx, operation in enumerate(
+                self.operation_queue.operation_list
+            ):
+                if not operation.is_done:
+                    self.applying_changes_page.logLine(
+                        "Browser Choice will exit once all queued changes "
+                        "have been applied.",
+                        operation_idx,
+                    )
+        self.switch_to_page(self.applying_changes_page)
+
     @staticmethod
     def exit_app() -> None:
         """
@@ -792,19 +1176,53 @@ class BrowserChoiceWindow(QDialog):
 class PluginDataLoader(QObject):
     """
     Loads plugin data from the disk. Intended to run in a secondary thread.
+    Plugins are handed over one at a time as they are loaded.
     """
 
+    pluginLoaded = pyqtSignal()
     pluginDataLoaded = pyqtSignal()
     pluginDataLoadError = pyqtSignal(str)
 
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        ## Plugins are passed to the GUI thread through a queue. Trying to
+        ## send Python objects over a pyqtSignal results in a segfault.
+        self.loaded_plugin_queue: queue.SimpleQueue[ChoicePlugin] = (
+            queue.SimpleQueue()
+        )
+
+    def plugin_loaded(self, plugin: ChoicePlugin) -> None:
+        """
+        parse_config_dir callback. Runs in the loader thread.
+        """
+
+        self.loaded_plugin_queue.put(plugin)
+        self.pluginLoaded.emit()
+
+    def take_loaded_plugins(self) -> list[ChoicePlugin]:
+        """
+        Returns all plugins that were loaded since the last call.
+        """
+
+        plugin_list: list[ChoicePlugin] = []
+        while True:
+            try:
+                plugin_list.append(self.loaded_plugin_queue.get_nowait())
+            except queue.Empty:
+                return plugin_list
+
     def run(self) -> None:
         """
         Core function, launched by thread.
         """
-        # pylint: disable=global-statement
-        global app_plugin_data
+
         try:
-            app_plugin_data = parse_config_dir(GlobalData.plugin_dir)
+            parse_config_dir(
+                GlobalData.plugin_dir,
+                lazy_probing=True,
+                plugin_loaded_callback=self.plugin_loaded,
+                image_cache=plugin_image_cache,
+            )
             self.pluginDataLoaded.emit()
         except Exception:
             self.pluginDataLoadError.emit(traceback.format_exc())
@@ -812,11 +1230,13 @@ class PluginDataLoader(QObject):
 
 class AppInitManager(QObject):
     """
-    Displays the splash screen, loads plugin data, hides the splash screen
-    once plugin data is loaded, then displays either the main UI or an error
-    screen depending on whether plugin data loaded successfully.
+    Displays the splash screen and loads plugin data. Replaces the splash
+    screen with the main UI as soon as the first plugin is loaded, and adds
+    the remaining plugins to it as they are loaded. Displays an error screen
+    instead if plugin data can't be loaded.
     """
 
+    @trace_function
     def __init__(self, parent: QObject | None = None) -> None:
         """
         Init function.
@@ -825,14 +1245,25 @@ class AppInitManager(QObject):
         super().__init__(parent)
 
         self.main_window: BrowserChoiceWindow | None = None
+        self.main_ui_starting: bool = False
 
-        self.splash_window: SplashScreenDialog = SplashScreenDialog()
+        ## Probe the environment while plugins are loading.
+        self.environment_probe: EnvironmentProbe = EnvironmentProbe(self)
+        self.environment_probe.start()
+
+        self.splash_window: SplashScreenDialog | None = SplashScreenDialog()
         self.splash_window.show()
+        plugin_image_cache.set_device_pixel_ratio(
+            self.splash_window.devicePixelRatioF()
+        )
 
         self.plugin_data_loader: PluginDataLoader = PluginDataLoader()
         self.loader_thread: QThread = QThread()
 
-        self.plugin_data_loader.pluginDataLoaded.connect(self.start_main_ui)
+        self.plugin_data_loader.pluginLoaded.connect(self.add_loaded_plugins)
+        self.plugin_data_loader.pluginDataLoaded.connect(
+            self.add_loaded_plugins
+        )
         self.plugin_data_loader.pluginDataLoadError.connect(
             self.show_load_error
         )
@@ -840,23 +1271,51 @@ class AppInitManager(QObject):
         self.loader_thread.started.connect(self.plugin_data_loader.run)
         self.loader_thread.start()
 
+    def close_splash_window(self) -> None:
+        """
+        Closes the splash screen if it is still open.
+        """
+
+        if self.splash_window is not None:
+            self.splash_window.close()
+            self.splash_window = None
+
+    @trace_function
     def start_main_ui(self) -> None:
         """
-        Create and display the main UI.
+        Create and display the main UI, unless it is already being created.
         """
 
-        self.splash_window.close()
-        del self.splash_window
-        self.main_window = BrowserChoiceWindow(app_plugin_data)
+        if self.main_window is not None or self.main_ui_starting:
+            return
+        ## Creating the main window may show a modal dialog, which processes
+        ## events while it is open. Plugins loaded meanwhile stay queued.
+        self.main_ui_starting = True
+        self.close_splash_window()
+        self.main_window = BrowserChoiceWindow([], self.environment_probe)
         self.main_window.show()
+        self.add_loaded_plugins()
+
+    def add_loaded_plugins(self) -> None:
+        """
+        Qt signal handler. Starts the main UI if needed, and adds all plugins
+        loaded so far to it.
+        """
+
+        self.start_main_ui()
+        if self.main_window is None:
+            return
+        for plugin in self.plugin_data_loader.take_loaded_plugins():
+            self.main_window.add_plugin(plugin)
 
     def show_load_error(self, error_str: str) -> None:
         """
         Create and display an error dialog, then exit non-zero.
         """
 
-        self.splash_window.close()
-        del self.splash_window
+        self.close_splash_window()
+        if self.main_window is not None:
+            self.main_window.hide()
         error_dialog = ErrorDialog(
             "<p>Error: Could not parse a plugin! Details:</p>"
             + f"<p><pre>{error_str}</pre></p>"
@@ -865,6 +1324,27 @@ class AppInitManager(QObject):
         sys.exit(1)
 
 
+def excepthook(
+    exc_type: type[BaseException],
+    exc_value: BaseException,
+    exc_traceback: TracebackType | None,
+) -> None:
+    """
+    Handles unhandled exceptions. Makes sure the exception and everything
+    logged before it reach the log file, then aborts like PyQt does by
+    default.
+    """
+
+    write_to_log(
+        "".join(
+            traceback.format_exception(exc_type, exc_value, exc_traceback)
+        ).rstrip("\n")
+    )
+    close_log()
+    sys.__excepthook__(exc_type, exc_value, exc_traceback)
+    os.abort()
+
+
 # pylint: disable=unused-argument
 def signal_handler(sig: int, frame: FrameType | None) -> None:
     """
@@ -889,14 +1369,21 @@ def main() -> NoReturn:
 
     if GlobalData.log_dir_path.is_dir():
         try:
-            # pylint: disable=consider-using-with
-            GlobalData.log_file = open(
-                GlobalData.log_file_path, mode="a", encoding="utf-8"
+            GlobalData.run_index = RunIndex(GlobalData.log_index_file_path)
+            GlobalData.log_writer = LogWriter(
+                GlobalData.log_file_path,
+                rotated_callback=GlobalData.run_index.log_rotated,
             )
-        except PermissionError:
-            GlobalData.log_file = None
-
-    app = QApplication(sys.argv)
+        except OSError:
+            GlobalData.log_writer = None
+            GlobalData.run_index = None
+    atexit.register(close_log)
+    sys.excepthook = excepthook
+
+    if tracer.enabled:
+        atexit.register(tracer.write)
+    with trace_span("QApplication init"):
+        app = QApplication(sys.argv)
     app.setQuitOnLastWindowClosed(False)
 
     signal.signal(signal.SIGINT, signal_handler)
@@ -62,6 +62,16 @@ class BrowserCard(QWidget):
             inst_method_text += f"<li>{installation_method}</li>"
         inst_method_text += "</ul>"
         self.ui.availableInstallListLabel.setText(inst_method_text)
+        self.setInstalledMethodList(installed_method_list)
+
+    def setInstalledMethodList(
+        self, installed_method_list: list[str] | None
+    ) -> None:
+        """
+        Updates the list of installation methods the application is
+        currently installed from. None hides the list.
+        """
+
         if installed_method_list is None:
             self.ui.installedHeaderLabel.setVisible(False)
             self.ui.installedLabel.setVisible(False)
@@ -72,6 +82,8 @@ class BrowserCard(QWidget):
             )
             installed_method_text += "</ul>"
             self.ui.installedLabel.setText(installed_method_text)
+            self.ui.installedHeaderLabel.setVisible(True)
+            self.ui.installedLabel.setVisible(True)
 
     def isChecked(self) -> bool:
         """
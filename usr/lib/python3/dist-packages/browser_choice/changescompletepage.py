@@ -36,6 +36,7 @@ class ChangesCompletePage(QWidget):
         allow_launch: bool,
         in_sysmaint_session: bool,
         user_sysmaint_split_installed: bool,
+        other_change_list: list[str] | None = None,
         parent: QWidget | None = None,
     ):
         super().__init__(parent)
@@ -52,6 +53,15 @@ Maintenance Panel."
         else:
             exit_wizard_str += "opening 'Browser Choice' from the Start Menu."
 
+        ## Summaries of changes made by other operations in the same run.
+        other_changes_str: str = ""
+        if other_change_list:
+            other_changes_str = (
+                "<p>Other changes:</p><ul>"
+                + "".join(f"<li>{x}</li>" for x in other_change_list)
+                + "</ul>"
+            )
+
         if did_succeed:
             if change_str == "installed":
                 self.ui.actionCompleteLabel.setText(
@@ -60,12 +70,14 @@ Maintenance Panel."
                     "launch the browser from the Start Menu in a user "
                     f"session, or by running <code>{app_script}</code> in a "
                     "terminal.</p>"
+                    f"{other_changes_str}"
                     f"<p>{exit_wizard_str}</p>"
                 )
             else:
                 self.ui.actionCompleteLabel.setText(
                     f"<p>The application '{app_name}' from "
                     f"'{repository_name}' has been {change_str}.</p>"
+                    f"{other_changes_str}"
                     f"<p>{exit_wizard_str}</p>"
                 )
             if allow_launch:
@@ -76,6 +88,7 @@ Maintenance Panel."
             self.ui.actionCompleteLabel.setText(
                 f"<p>The application '{app_name}' from '{repository_name} "
                 f"could not be {change_str}.</p>"
+                f"{other_changes_str}"
                 f"<p>{exit_wizard_str}</p>"
             )
             self.ui.launchAppCheckbox.setVisible(False)
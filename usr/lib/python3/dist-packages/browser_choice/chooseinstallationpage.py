@@ -42,6 +42,7 @@ class ManageMode(Enum):
     Run = 5
 
 
+# pylint: disable=too-many-instance-attributes
 class ChooseInstallationPage(QWidget):
     """
     A wizard screen widget allowing the user to choose what repository to
@@ -50,6 +51,9 @@ class ChooseInstallationPage(QWidget):
 
     backClicked: pyqtSignal = pyqtSignal()
     continueClicked: pyqtSignal = pyqtSignal()
+    ## Emitted with the index of the newly selected card, and whether the
+    ## application can be installed from it.
+    currentCardChanged: pyqtSignal = pyqtSignal(int, bool)
 
     # pylint: disable=too-many-arguments
     def __init__(
@@ -90,6 +94,7 @@ class ChooseInstallationPage(QWidget):
             self.ui.packageChooserWidget
         )
         self.card_view: CardView = CardView("PackageCard", self)
+        self.package_card_list: list[PackageCard] = card_list
         for card in card_list:
             self.card_view.add_card(card)
             card.toggled.connect(
@@ -165,6 +170,16 @@ class ChooseInstallationPage(QWidget):
             self.ui.noUpdateCheckbox.setChecked(False)
             self.ui.noUpdateCheckbox.setEnabled(False)
 
+    def setNetworkConnected(self, is_network_connected: bool) -> None:
+        """
+        Updates whether the network is accessible, and with it the actions
+        available for the currently selected card.
+        """
+
+        self.is_network_connected = is_network_connected
+        if self.current_card is not None:
+            self.update_current_card(self.current_card)
+
     def update_current_card(
         self,
         source_card: PackageCard,
@@ -259,6 +274,10 @@ class ChooseInstallationPage(QWidget):
                 self.disable_radio_button(self.ui.runRadioButton)
 
             self.update_available_actions()
+            self.currentCardChanged.emit(
+                self.package_card_list.index(self.current_card),
+                self.ui.installRadioButton.isEnabled(),
+            )
 
     # pylint: disable=too-many-return-statements
     def manageMode(self) -> ManageMode:
@@ -36,6 +36,7 @@ class ConfirmInstallationDialog(QDialog):
         change_str: str,
         command_str: str,
         is_apt_third_party_repo: bool,
+        update_skip_str: str | None = None,
         parent: QWidget | None = None,
     ):
         super().__init__(parent)
@@ -49,6 +50,8 @@ class ConfirmInstallationDialog(QDialog):
             f"<p>The application '{app_name}' from source '{repository_name}' "
             f"will be {change_str}. The following command will be executed:</p>"
         )
+        if update_skip_str is not None:
+            action_info_text = f"<p>{update_skip_str}</p>{action_info_text}"
         if install_warn_str is not None and change_str == "installed":
             action_info_text = (
                 f'<p><font color="orange">WARNING:</font> {install_warn_str}'
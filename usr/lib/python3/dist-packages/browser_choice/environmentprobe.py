@@ -0,0 +1,194 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+environmentprobe.py - Detects the boot session, whether user-sysmaint-split
+is installed, and network access, asynchronously and concurrently, so that
+the GUI doesn't wait for the helper programs doing so. Network access keeps
+being monitored afterwards.
+"""
+
+import functools
+import shlex
+from pathlib import Path
+from typing import Callable
+
+from PyQt5.QtCore import (
+    pyqtSignal,
+    QObject,
+    QProcess,
+)
+
+from browser_choice import GlobalData
+from browser_choice.networkmonitor import NetworkMonitor
+from browser_choice.tracer import (
+    TraceSpan,
+    finish_async_span,
+    start_async_span,
+)
+
+
+# pylint: disable=too-few-public-methods
+class EnvironmentProbe(QObject):
+    """
+    Runs the environment detection helper programs at the same time. Each
+    result is None until the helper producing it has finished. networkProbed
+    is emitted again whenever network access changes.
+    """
+
+    sessionProbed: pyqtSignal = pyqtSignal()
+    networkProbed: pyqtSignal = pyqtSignal()
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.in_sysmaint_session: bool | None = None
+        self.user_sysmaint_split_installed: bool | None = None
+        self.is_network_connected: bool | None = None
+        self.network_monitor: NetworkMonitor | None = None
+
+    def start(self) -> None:
+        """
+        Starts all helper programs.
+        """
+
+        self.__run(
+            ["/usr/libexec/helper-scripts/boot-session-detection.bsh"],
+            self.__boot_session_detected,
+            capture_output=True,
+        )
+        self.__run(
+            ["/usr/bin/package-installed-check", "user-sysmaint-split"],
+            self.__user_sysmaint_split_checked,
+        )
+        if GlobalData.qube_type == "templatevm":
+            ## The HTTP proxy for Qubes TemplateVMs is configured by
+            ## /usr/libexec/browser-choice/qubes-proxy-maybe.
+            self.is_network_connected = True
+            self.networkProbed.emit()
+        else:
+            self.network_monitor = NetworkMonitor(self)
+            self.network_monitor.networkChecked.connect(
+                self.__network_access_checked
+            )
+            self.network_monitor.start()
+
+    def session_probed(self) -> bool:
+        """
+        Returns True once everything about the boot session is known.
+        """
+
+        return (
+            self.in_sysmaint_session is not None
+            and self.user_sysmaint_split_installed is not None
+        )
+
+    def __run(
+        self,
+        arg_list: list[str],
+        callback: Callable[[int, str], None],
+        capture_output: bool = False,
+    ) -> None:
+        """
+        Starts a helper program. The callback is passed its exit code and
+        output when it finishes. A program that can't be started counts as
+        having failed.
+        """
+
+        trace_span: TraceSpan | None = start_async_span(
+            Path(arg_list[0]).name, command=shlex.join(arg_list)
+        )
+        process: QProcess = QProcess(self)
+        process.setProgram(arg_list[0])
+        process.setArguments(arg_list[1:])
+        process.setProcessChannelMode(
+            QProcess.ForwardedErrorChannel
+            if capture_output
+            else QProcess.ForwardedChannels
+        )
+        process.finished.connect(
+            functools.partial(
+                self.__process_finished, process, trace_span, callback
+            )
+        )
+        process.errorOccurred.connect(
+            functools.partial(
+                self.__process_error, process, trace_span, callback
+            )
+        )
+        process.start()
+
+    @staticmethod
+    def __process_finished(
+        process: QProcess,
+        trace_span: TraceSpan | None,
+        callback: Callable[[int, str], None],
+        exit_code: int,
+        exit_status: QProcess.ExitStatus,
+    ) -> None:
+        """
+        Qt signal handler. Passes the result of a helper program on.
+        """
+
+        output_str: str = (
+            process.readAllStandardOutput()
+            .data()
+            .decode(encoding="utf-8", errors="replace")
+        )
+        process.deleteLater()
+        finish_async_span(trace_span)
+        if exit_status != QProcess.NormalExit:
+            exit_code = 1
+        callback(exit_code, output_str)
+
+    @staticmethod
+    def __process_error(
+        process: QProcess,
+        trace_span: TraceSpan | None,
+        callback: Callable[[int, str], None],
+        error: QProcess.ProcessError,
+    ) -> None:
+        """
+        Qt signal handler. Reports a helper program that couldn't be started
+        as failed. Other errors are followed by the finished signal.
+        """
+
+        if error != QProcess.FailedToStart:
+            return
+        process.deleteLater()
+        finish_async_span(trace_span)
+        callback(1, "")
+
+    # pylint: disable=unused-argument
+    def __boot_session_detected(self, exit_code: int, output_str: str) -> None:
+        """
+        Records the boot session.
+        """
+
+        self.in_sysmaint_session = output_str.strip() == "sysmaint_session"
+        if self.session_probed():
+            self.sessionProbed.emit()
+
+    # pylint: disable=unused-argument
+    def __user_sysmaint_split_checked(
+        self, exit_code: int, output_str: str
+    ) -> None:
+        """
+        Records whether user-sysmaint-split is installed.
+        """
+
+        self.user_sysmaint_split_installed = exit_code == 0
+        if self.session_probed():
+            self.sessionProbed.emit()
+
+    def __network_access_checked(self, is_network_connected: bool) -> None:
+        """
+        Qt signal handler. Records whether the network is accessible, if that
+        changed.
+        """
+
+        if is_network_connected == self.is_network_connected:
+            return
+        self.is_network_connected = is_network_connected
+        self.networkProbed.emit()
@@ -0,0 +1,219 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+# pylint: disable=broad-exception-caught
+
+"""
+imagecache.py - Renders plugin images once each, in parallel, off the GUI
+thread, and keeps the rendered images on disk across runs.
+"""
+
+import os
+import math
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+
+from PyQt5.QtCore import QSize
+from PyQt5.QtGui import (
+    QImage,
+    QImageReader,
+    QPixmap,
+)
+
+from browser_choice import GlobalData
+from browser_choice.probeengine import usable_cpu_count
+from browser_choice.tracer import trace_span
+
+## The sizes plugin images are displayed at, in device-independent pixels.
+## These match the maximum sizes of the icon labels in browsercard.ui and
+## packagecard.ui, which scale their contents to fit.
+ICON_SIZE_LARGE: int = 48
+ICON_SIZE_SMALL: int = 20
+
+## The display size of each kind of plugin logo, by plugin key.
+LOGO_SIZE_DICT: dict[str, int] = {
+    "product-logo": ICON_SIZE_LARGE,
+    "vendor-logo": ICON_SIZE_SMALL,
+    "method-logo": ICON_SIZE_LARGE,
+}
+
+
+def render_image(image_path: Path, pixel_size: int) -> QImage:
+    """
+    Decodes an image file, rendering it at the specified size in pixels.
+    Vector images are rendered directly at that size rather than being
+    scaled afterwards. Returns a null image if the file couldn't be decoded.
+    """
+
+    with trace_span("render_image", image=str(image_path), size=pixel_size):
+        image_reader: QImageReader = QImageReader(str(image_path))
+        image_reader.setScaledSize(QSize(pixel_size, pixel_size))
+        return image_reader.read()
+
+
+def write_image_file(image_file_path: Path, image: QImage) -> None:
+    """
+    Atomically writes an image to a PNG file. Failing to write the file is
+    not an error, the image will just be rendered again next time.
+    """
+
+    temp_file_name: str | None = None
+    try:
+        image_file_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_fd, temp_file_name = tempfile.mkstemp(
+            dir=image_file_path.parent,
+            prefix=f".{image_file_path.name}.",
+        )
+        os.close(temp_fd)
+        if not image.save(temp_file_name, "PNG"):
+            raise OSError(f"Could not write '{temp_file_name}'")
+        os.replace(temp_file_name, image_file_path)
+    except Exception:
+        if temp_file_name is not None:
+            Path(temp_file_name).unlink(missing_ok=True)
+
+
+class ImageCache:
+    """
+    Caches rendered images by path and display size. Many plugins and repos
+    share the same logos, so each file is only rendered once per size.
+    Images are rendered as QImages on a pool of worker threads, since
+    QPixmaps may only be created on the GUI thread. The QPixmap for an image
+    is created on first use, which must happen on the GUI thread.
+
+    Rendered images are also stored as PNG files, named after the hash of
+    the source file and the rendered size, so that later runs only need to
+    load a small PNG instead of rendering the source file again.
+    """
+
+    def __init__(self, icon_cache_dir: Path | None = None) -> None:
+        self.icon_cache_dir: Path | None = icon_cache_dir
+        self.lock: threading.Lock = threading.Lock()
+        self.executor: ThreadPoolExecutor | None = None
+        self.device_pixel_ratio: float = 1.0
+        self.image_dict: dict[tuple[Path, int], Future[QImage]] = {}
+        ## Only accessed from the GUI thread.
+        self.pixmap_dict: dict[tuple[Path, int], QPixmap] = {}
+
+    def set_device_pixel_ratio(self, device_pixel_ratio: float) -> None:
+        """
+        Sets the device pixel ratio of the screen images will be displayed
+        on. Images are rendered at their display size multiplied by this
+        ratio. Must be called before any image is requested.
+        """
+
+        with self.lock:
+            self.device_pixel_ratio = device_pixel_ratio
+
+    def __render_cached(self, image_path: Path, pixel_size: int) -> QImage:
+        """
+        Returns an image rendered at the specified size, from the icon cache
+        if possible. Runs in a worker thread.
+        """
+
+        if self.icon_cache_dir is None:
+            return render_image(image_path, pixel_size)
+
+        try:
+            source_hash: str = hashlib.sha256(
+                image_path.read_bytes()
+            ).hexdigest()
+        except OSError:
+            return QImage()
+        cached_file_path: Path = self.icon_cache_dir.joinpath(
+            f"{source_hash}-{pixel_size}.png"
+        )
+        if cached_file_path.is_file():
+            cached_image: QImage = QImage(str(cached_file_path))
+            if not cached_image.isNull():
+                return cached_image
+
+        rendered_image: QImage = render_image(image_path, pixel_size)
+        if not rendered_image.isNull():
+            write_image_file(cached_file_path, rendered_image)
+        return rendered_image
+
+    def prefetch(self, image_path: Path, logical_size: int) -> Future[QImage]:
+        """
+        Starts rendering an image at the specified display size in the
+        background if it isn't rendered or being rendered yet. Returns a
+        future for the rendered image.
+        """
+
+        with self.lock:
+            image_future: Future[QImage] | None = self.image_dict.get(
+                (image_path, logical_size)
+            )
+            if image_future is None:
+                if self.executor is None:
+                    self.executor = ThreadPoolExecutor(
+                        max_workers=usable_cpu_count(),
+                        thread_name_prefix="browser-choice-image",
+                    )
+                image_future = self.executor.submit(
+                    self.__render_cached,
+                    image_path,
+                    math.ceil(logical_size * self.device_pixel_ratio),
+                )
+                self.image_dict[(image_path, logical_size)] = image_future
+            return image_future
+
+    def image(self, image_path: Path, logical_size: int) -> QImage:
+        """
+        Returns an image rendered at the specified display size, rendering
+        it first if needed. Safe to call from any thread.
+        """
+
+        return self.prefetch(image_path, logical_size).result()
+
+    def pixmap(self, image_path: Path, logical_size: int) -> QPixmap:
+        """
+        Returns a pixmap of an image rendered at the specified display size,
+        converting the rendered image the first time. Must only be called
+        from the GUI thread.
+        """
+
+        image_pixmap: QPixmap | None = self.pixmap_dict.get(
+            (image_path, logical_size)
+        )
+        if image_pixmap is None:
+            image_pixmap = QPixmap.fromImage(
+                self.image(image_path, logical_size)
+            )
+            image_pixmap.setDevicePixelRatio(self.device_pixel_ratio)
+            self.pixmap_dict[(image_path, logical_size)] = image_pixmap
+        return image_pixmap
+
+    def prefetch_logo(self, image_path: Path, logo_key: str) -> Future[QImage]:
+        """
+        Starts rendering a plugin logo at the size the specified kind of logo
+        is displayed at.
+        """
+
+        return self.prefetch(image_path, LOGO_SIZE_DICT[logo_key])
+
+    def logo_is_valid(self, image_path: Path, logo_key: str) -> bool:
+        """
+        Renders a plugin logo if needed, and returns whether it could be
+        rendered. Safe to call from any thread.
+        """
+
+        return not self.image(image_path, LOGO_SIZE_DICT[logo_key]).isNull()
+
+    def logo_pixmap(self, image_path: Path, logo_key: str) -> QPixmap:
+        """
+        Returns a pixmap of a plugin logo at the size the specified kind of
+        logo is displayed at. Must only be called from the GUI thread.
+        """
+
+        return self.pixmap(image_path, LOGO_SIZE_DICT[logo_key])
+
+
+## Logos are shared between many plugins and repos, so they are rendered
+## through a shared cache.
+plugin_image_cache: ImageCache = ImageCache(GlobalData.icon_cache_dir_path)
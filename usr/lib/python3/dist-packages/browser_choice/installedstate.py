@@ -0,0 +1,215 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+# pylint: disable=broad-exception-caught
+
+"""
+installedstate.py - Answers the install-status probes of many repos at once
+by reading the dpkg database and the list of installed Flatpaks only once.
+"""
+
+import re
+import subprocess
+import threading
+from pathlib import Path
+
+DPKG_STATUS_PATH: Path = Path("/var/lib/dpkg/status")
+
+DEB_NAME_PATTERN: str = r"[a-z0-9][a-z0-9+.-]*"
+FLATPAK_ID_PATTERN: str = r"[A-Za-z0-9_][A-Za-z0-9_.-]*"
+DEB_NAME_REGEX: re.Pattern[str] = re.compile(DEB_NAME_PATTERN + r"\Z")
+FLATPAK_ID_REGEX: re.Pattern[str] = re.compile(FLATPAK_ID_PATTERN + r"\Z")
+
+## The install-status scripts this module understands. Anything else is left
+## to the plugin's own script.
+DEB_CHECK_REGEX: re.Pattern[str] = re.compile(
+    rf"/usr/bin/package-installed-check ({DEB_NAME_PATTERN})\Z"
+)
+FLATPAK_CHECK_REGEX: re.Pattern[str] = re.compile(
+    rf"flatpak info ({FLATPAK_ID_PATTERN})\Z"
+)
+
+
+def parse_install_status(
+    install_status: str,
+) -> tuple[list[str], list[str]] | None:
+    """
+    Splits an install-status script into the Debian packages and Flatpak
+    applications it checks for. The script may check for several of them
+    joined with '&&'. Returns None if the script does anything else.
+    """
+
+    deb_list: list[str] = []
+    flatpak_list: list[str] = []
+    for check_str in install_status.split("&&"):
+        check_str = check_str.strip()
+        deb_match: re.Match[str] | None = DEB_CHECK_REGEX.match(check_str)
+        if deb_match is not None:
+            deb_list.append(deb_match.group(1))
+            continue
+        flatpak_match: re.Match[str] | None = FLATPAK_CHECK_REGEX.match(
+            check_str
+        )
+        if flatpak_match is not None:
+            flatpak_list.append(flatpak_match.group(1))
+            continue
+        return None
+    return deb_list, flatpak_list
+
+
+def make_install_status_script(
+    deb_list: list[str], flatpak_list: list[str]
+) -> str:
+    """
+    Builds an install-status script equivalent to checking for the specified
+    Debian packages and Flatpak applications. This is the reverse of
+    parse_install_status.
+    """
+
+    return " && ".join(
+        [f"/usr/bin/package-installed-check {x}" for x in deb_list]
+        + [f"flatpak info {x}" for x in flatpak_list]
+    )
+
+
+def read_installed_deb_packages(
+    package_set: set[str] | None = None, status_path: Path = DPKG_STATUS_PATH
+) -> set[str]:
+    """
+    Reads the dpkg status database once, and returns which of the specified
+    packages are installed. If no packages are specified, returns all
+    installed packages.
+    """
+
+    installed_set: set[str] = set()
+    package_name: str | None = None
+    with open(status_path, "r", encoding="utf-8", errors="replace") as status:
+        for line in status:
+            if line.startswith("Package:"):
+                package_name = line[len("Package:") :].strip()
+            elif line.startswith("Status:"):
+                ## Status is "<want> <flag> <status>". A package is installed
+                ## no matter what the user wants done with it next.
+                status_word_list: list[str] = line[len("Status:") :].split()
+                if (
+                    package_name is not None
+                    and (package_set is None or package_name in package_set)
+                    and len(status_word_list) == 3
+                    and status_word_list[2] == "installed"
+                ):
+                    installed_set.add(package_name)
+            elif line.strip() == "":
+                package_name = None
+    return installed_set
+
+
+def list_installed_flatpaks() -> set[str] | None:
+    """
+    Lists the IDs of all installed Flatpak applications and runtimes, both
+    system-wide and per-user. Returns None if Flatpak could not be queried.
+    """
+
+    try:
+        list_process: subprocess.CompletedProcess[str] = subprocess.run(
+            ["flatpak", "list", "--columns=application"],
+            check=False,
+            capture_output=True,
+            encoding="utf-8",
+        )
+    except FileNotFoundError:
+        ## Without Flatpak, 'flatpak info' can't succeed either.
+        return set()
+    if list_process.returncode != 0:
+        return None
+    return {
+        line.strip()
+        for line in list_process.stdout.splitlines()
+        if line.strip() != ""
+    }
+
+
+class InstalledStateResolver:
+    """
+    Resolves the install-status of many repos together. All installed
+    Debian packages and Flatpak IDs are read with a single read of the dpkg
+    database and a single Flatpak enumeration, done on first use, so repos
+    can be added while others are already being resolved.
+    """
+
+    def __init__(self) -> None:
+        ## Separate locks, so that repos that only need the dpkg database
+        ## don't wait for Flatpak and vice versa.
+        self.deb_lock: threading.Lock = threading.Lock()
+        self.flatpak_lock: threading.Lock = threading.Lock()
+        self.deb_loaded: bool = False
+        self.installed_deb_set: set[str] | None = None
+        self.flatpak_loaded: bool = False
+        self.installed_flatpak_set: set[str] | None = None
+
+    def __get_installed_debs(self) -> set[str] | None:
+        """
+        Returns all installed Debian packages, reading the dpkg database the
+        first time.
+        """
+
+        with self.deb_lock:
+            if not self.deb_loaded:
+                self.deb_loaded = True
+                try:
+                    self.installed_deb_set = read_installed_deb_packages()
+                except Exception:
+                    self.installed_deb_set = None
+            return self.installed_deb_set
+
+    def __get_installed_flatpaks(self) -> set[str] | None:
+        """
+        Returns all installed Flatpak IDs, enumerating them the first time.
+        """
+
+        with self.flatpak_lock:
+            if not self.flatpak_loaded:
+                self.flatpak_loaded = True
+                self.installed_flatpak_set = list_installed_flatpaks()
+            return self.installed_flatpak_set
+
+    def invalidate(self) -> None:
+        """
+        Forgets the installed Debian packages and Flatpak IDs read so far, so
+        that they are read again on next use. Used after software changes
+        were applied.
+        """
+
+        with self.deb_lock:
+            self.deb_loaded = False
+            self.installed_deb_set = None
+        with self.flatpak_lock:
+            self.flatpak_loaded = False
+            self.installed_flatpak_set = None
+
+    def resolve(
+        self, deb_list: list[str], flatpak_list: list[str]
+    ) -> bool | None:
+        """
+        Returns whether all of the specified Debian packages and Flatpak
+        applications are installed, or None if the needed package database
+        couldn't be read. Callers should run the repo's install-status script
+        themselves in that case.
+        """
+
+        if len(deb_list) != 0:
+            installed_deb_set: set[str] | None = self.__get_installed_debs()
+            if installed_deb_set is None:
+                return None
+            if not set(deb_list) <= installed_deb_set:
+                return False
+        if len(flatpak_list) != 0:
+            installed_flatpak_set: set[str] | None = (
+                self.__get_installed_flatpaks()
+            )
+            if installed_flatpak_set is None:
+                return None
+            if not set(flatpak_list) <= installed_flatpak_set:
+                return False
+        return True
@@ -0,0 +1,73 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+linesplitter.py - Splits output that arrives in arbitrary chunks into lines
+of text.
+"""
+
+import codecs
+
+
+class LineSplitter:
+    """
+    Decodes UTF-8 output incrementally and splits it into lines. Multibyte
+    sequences split across chunks are decoded once complete, and invalid
+    bytes are replaced rather than raising an error. Each chunk is processed
+    in time linear in its size, no matter how much output came before it.
+    """
+
+    def __init__(self) -> None:
+        self.decoder: codecs.IncrementalDecoder = codecs.getincrementaldecoder(
+            "utf-8"
+        )(errors="replace")
+        ## Pieces of the current, not yet terminated line. They are only
+        ## joined once the line is complete, so that a long line arriving
+        ## in many chunks isn't copied once per chunk.
+        self.partial_line_list: list[str] = []
+
+    def feed(self, data: bytes) -> list[str]:
+        """
+        Processes a chunk of output. Returns the lines it completed, without
+        their line terminators.
+        """
+
+        text: str = self.decoder.decode(data)
+        if "\n" not in text:
+            if text != "":
+                self.partial_line_list.append(text)
+            return []
+
+        line_list: list[str] = text.split("\n")
+        self.partial_line_list.append(line_list[0])
+        line_list[0] = "".join(self.partial_line_list)
+        last_line: str = line_list.pop()
+        self.partial_line_list = [last_line] if last_line != "" else []
+        return line_list
+
+    def partial_line(self) -> str:
+        """
+        Returns the part of the current, not yet terminated line received in
+        the last chunk that added to it.
+        """
+
+        if len(self.partial_line_list) == 0:
+            return ""
+        return self.partial_line_list[-1]
+
+    def finish(self) -> str | None:
+        """
+        Processes the end of the output. Returns the last line if the output
+        didn't end with a line terminator, None otherwise.
+        """
+
+        text: str = self.decoder.decode(b"", final=True)
+        if text != "":
+            self.partial_line_list.append(text)
+        if len(self.partial_line_list) == 0:
+            return None
+        last_line: str = "".join(self.partial_line_list)
+        self.partial_line_list = []
+        return last_line
@@ -0,0 +1,258 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+# pylint: disable=broad-exception-caught
+
+"""
+logwriter.py - Writes browser-choice's log file in a background thread, and
+rotates it once it grows too large.
+"""
+
+import gzip
+import os
+import queue
+import shutil
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable
+
+## How long written lines may stay in the write buffer before being flushed
+## to the log file, in seconds.
+LOG_FLUSH_INTERVAL: float = 0.25
+## Size at which the log file is rotated, in bytes.
+LOG_FILE_MAX_SIZE: int = 4 * 1024 * 1024
+## Number of compressed old log files to keep.
+LOG_FILE_KEEP_COUNT: int = 4
+
+
+def get_old_log_path(path: Path, old_idx: int) -> Path:
+    """
+    Returns the path of a compressed old log file. Old log file 0 is the log
+    file itself.
+    """
+
+    if old_idx == 0:
+        return path
+    return path.with_name(f"{path.name}.{old_idx}.gz")
+
+
+class LogWriter:
+    """
+    Appends lines to a log file from a background thread, so that writing
+    doesn't block the GUI. Lines queued in the meantime are written in one
+    go. Buffered lines are flushed to the log file at least every
+    LOG_FLUSH_INTERVAL seconds, so a crash loses at most the lines logged
+    just before it. Once the log file exceeds LOG_FILE_MAX_SIZE, it is
+    compressed into log.txt.1.gz, shifting older files to log.txt.2.gz and
+    so on, and started anew. rotated_callback is called in the log writer
+    thread after each rotation.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        rotated_callback: Callable[[], None] | None = None,
+    ):
+        self.path: Path = path
+        self.rotated_callback: Callable[[], None] | None = rotated_callback
+        # pylint: disable=consider-using-with
+        self.file = open(path, mode="ab")
+        self.size: int = os.fstat(self.file.fileno()).st_size
+        ## Holds lines to write, callbacks to call once everything before
+        ## them has been written, and None to stop.
+        self.line_queue: queue.SimpleQueue[
+            str | Callable[[int], None] | None
+        ] = queue.SimpleQueue()
+        self.closed: bool = False
+        self.thread: threading.Thread = threading.Thread(
+            target=self.__run,
+            name="browser-choice-log-writer",
+            daemon=True,
+        )
+        self.thread.start()
+
+    def write_line(self, line: str) -> None:
+        """
+        Queues a line to be written to the log file.
+        """
+
+        if not self.closed:
+            self.line_queue.put(line)
+
+    def call_in_order(self, callback: Callable[[int], None]) -> None:
+        """
+        Queues a callback to be called in the log writer thread once all lines
+        queued before it have been written. It is passed the size of the log
+        file at that point, which is where the next line will be written.
+        """
+
+        if not self.closed:
+            self.line_queue.put(callback)
+
+    def close(self) -> None:
+        """
+        Writes all queued lines, syncs the log file to disk and closes it.
+        """
+
+        if self.closed:
+            return
+        self.closed = True
+        self.line_queue.put(None)
+        self.thread.join()
+
+    def __run(self) -> None:
+        """
+        Writes queued lines until closed. Runs in the log writer thread.
+        """
+
+        is_dirty: bool = False
+        last_flush_time: float = time.monotonic()
+        while True:
+            try:
+                item: str | Callable[[int], None] | None = self.line_queue.get(
+                    timeout=LOG_FLUSH_INTERVAL if is_dirty else None
+                )
+            except queue.Empty:
+                self.__flush()
+                is_dirty = False
+                last_flush_time = time.monotonic()
+                continue
+
+            write_list: list[str | Callable[[int], None]]
+            should_stop: bool
+            write_list, should_stop = self.__take_queued(item)
+            if self.__write_batch(write_list):
+                is_dirty = True
+            if is_dirty and (
+                should_stop
+                or time.monotonic() - last_flush_time >= LOG_FLUSH_INTERVAL
+            ):
+                self.__flush()
+                is_dirty = False
+                last_flush_time = time.monotonic()
+            if self.size > LOG_FILE_MAX_SIZE:
+                self.__rotate()
+            if should_stop:
+                try:
+                    os.fsync(self.file.fileno())
+                except OSError:
+                    pass
+                self.file.close()
+                return
+
+    def __take_queued(
+        self, item: str | Callable[[int], None] | None
+    ) -> tuple[list[str | Callable[[int], None]], bool]:
+        """
+        Sorts an item taken from the queue along with all other items queued
+        after it into lines and callbacks in queue order, and whether to
+        stop.
+        """
+
+        write_list: list[str | Callable[[int], None]] = []
+        should_stop: bool = False
+        while True:
+            if item is None:
+                should_stop = True
+            else:
+                write_list.append(item)
+            try:
+                item = self.line_queue.get_nowait()
+            except queue.Empty:
+                return write_list, should_stop
+
+    def __write_batch(
+        self, write_list: list[str | Callable[[int], None]]
+    ) -> bool:
+        """
+        Writes lines to the log file, as few times as possible, and calls
+        callbacks in between. Returns True if any lines were written.
+        """
+
+        line_list: list[str] = []
+        for item in write_list:
+            if isinstance(item, str):
+                line_list.append(item)
+                continue
+            self.__write_lines(line_list)
+            line_list = []
+            self.__call(item, self.size)
+        self.__write_lines(line_list)
+        return any(isinstance(x, str) for x in write_list)
+
+    def __write_lines(self, line_list: list[str]) -> None:
+        """
+        Writes lines to the log file in one go. Failing to do so is ignored,
+        since browser-choice can survive without being able to write logs.
+        """
+
+        if len(line_list) == 0:
+            return
+        data: bytes = ("\n".join(line_list) + "\n").encode(
+            encoding="utf-8", errors="replace"
+        )
+        try:
+            self.file.write(data)
+        except OSError:
+            return
+        self.size += len(data)
+
+    def __flush(self) -> None:
+        """
+        Flushes written lines to the log file.
+        """
+
+        try:
+            self.file.flush()
+        except OSError:
+            pass
+
+    def __rotate(self) -> None:
+        """
+        Compresses the log file into the first old log file, shifting the
+        other old log files back, and truncates it. The log file is only
+        truncated once its compressed copy is complete, so that no lines are
+        lost if browser-choice is interrupted while rotating. If rotating
+        fails, it is retried once the log file has grown by LOG_FILE_MAX_SIZE
+        again.
+        """
+
+        self.__flush()
+        try:
+            for old_idx in range(LOG_FILE_KEEP_COUNT - 1, 0, -1):
+                old_path: Path = get_old_log_path(self.path, old_idx)
+                if old_path.exists():
+                    os.replace(
+                        old_path, get_old_log_path(self.path, old_idx + 1)
+                    )
+            temp_path: Path = self.path.with_name(self.path.name + ".1.gz.tmp")
+            with (
+                open(self.path, mode="rb") as log_file,
+                gzip.open(temp_path, mode="wb") as compressed_file,
+            ):
+                shutil.copyfileobj(log_file, compressed_file)
+            os.replace(temp_path, get_old_log_path(self.path, 1))
+            self.file.truncate(0)
+        except OSError:
+            self.size = 0
+            return
+        self.size = 0
+        if self.rotated_callback is not None:
+            self.__call(self.rotated_callback)
+
+    @staticmethod
+    def __call(callback: Callable[..., None], *args: Any) -> None:
+        """
+        Calls a callback. A failing callback must not stop the log writer
+        thread, since all lines logged afterwards would be lost, so errors
+        are only printed.
+        """
+
+        try:
+            callback(*args)
+        except Exception:
+            traceback.print_exc()
@@ -0,0 +1,195 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+networkmonitor.py - Keeps track of whether the network is accessible while
+browser-choice runs, rechecking when network interfaces, addresses or routes
+change, and periodically in case the network becomes accessible without any
+of them changing, for instance once Tor has bootstrapped.
+"""
+
+import socket
+
+from PyQt5.QtCore import (
+    pyqtSignal,
+    QObject,
+    QProcess,
+    QSocketNotifier,
+    QTimer,
+)
+
+from browser_choice.tracer import (
+    TraceSpan,
+    finish_async_span,
+    start_async_span,
+)
+
+## rtnetlink multicast groups, from linux/rtnetlink.h.
+RTMGRP_LINK: int = 0x1
+RTMGRP_IPV4_IFADDR: int = 0x10
+RTMGRP_IPV4_ROUTE: int = 0x40
+RTMGRP_IPV6_IFADDR: int = 0x100
+RTMGRP_IPV6_ROUTE: int = 0x400
+
+## How long to wait for a burst of network changes to settle before
+## rechecking, in milliseconds.
+NETWORK_CHANGE_SETTLE_DELAY: int = 1000
+## How often to recheck without any network changes, in milliseconds.
+RECHECK_INTERVAL_DISCONNECTED: int = 10000
+RECHECK_INTERVAL_CONNECTED: int = 60000
+
+
+def open_route_socket() -> socket.socket | None:
+    """
+    Opens a non-blocking netlink socket that receives a message whenever a
+    network interface, address or route changes. Returns None if that isn't
+    possible.
+    """
+
+    try:
+        route_socket: socket.socket = socket.socket(
+            socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE
+        )
+    except (AttributeError, OSError):
+        return None
+    try:
+        route_socket.bind(
+            (
+                0,
+                RTMGRP_LINK
+                | RTMGRP_IPV4_IFADDR
+                | RTMGRP_IPV4_ROUTE
+                | RTMGRP_IPV6_IFADDR
+                | RTMGRP_IPV6_ROUTE,
+            )
+        )
+        route_socket.setblocking(False)
+    except OSError:
+        route_socket.close()
+        return None
+    return route_socket
+
+
+# pylint: disable=too-many-instance-attributes
+class NetworkMonitor(QObject):
+    """
+    Runs check-network-access asynchronously at startup, after network
+    changes, and periodically. Only one check runs at a time.
+    """
+
+    networkChecked: pyqtSignal = pyqtSignal(bool)
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.is_network_connected: bool | None = None
+        self.check_process: QProcess | None = None
+        self.check_trace_span: TraceSpan | None = None
+        self.recheck_pending: bool = False
+
+        self.settle_timer: QTimer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.timeout.connect(self.check)
+
+        self.recheck_timer: QTimer = QTimer(self)
+        self.recheck_timer.setSingleShot(True)
+        self.recheck_timer.timeout.connect(self.check)
+
+        self.route_socket: socket.socket | None = None
+        self.route_socket_notifier: QSocketNotifier | None = None
+
+    def start(self) -> None:
+        """
+        Checks network access, and starts watching for network changes.
+        """
+
+        self.route_socket = open_route_socket()
+        if self.route_socket is not None:
+            self.route_socket_notifier = QSocketNotifier(
+                self.route_socket.fileno(),  # type: ignore[arg-type]
+                QSocketNotifier.Read,
+                self,
+            )
+            self.route_socket_notifier.activated.connect(self.network_changed)
+        self.check()
+
+    def check(self) -> None:
+        """
+        Starts checking network access, unless a check is running already, in
+        which case another check is done after it.
+        """
+
+        if self.check_process is not None:
+            self.recheck_pending = True
+            return
+        self.recheck_timer.stop()
+
+        self.check_trace_span = start_async_span("check-network-access")
+        self.check_process = QProcess(self)
+        self.check_process.setProgram(
+            "/usr/libexec/helper-scripts/check-network-access"
+        )
+        self.check_process.setProcessChannelMode(QProcess.ForwardedChannels)
+        self.check_process.finished.connect(self.check_finished)
+        self.check_process.errorOccurred.connect(self.check_error)
+        self.check_process.start()
+
+    # pylint: disable=unused-argument
+    def network_changed(self, socket_fd: int) -> None:
+        """
+        Qt signal handler. Triggered when network interfaces, addresses or
+        routes change. Discards the change messages, and rechecks once the
+        changes have settled.
+        """
+
+        assert self.route_socket is not None
+
+        try:
+            while self.route_socket.recv(65536):
+                pass
+        except OSError:
+            pass
+        self.settle_timer.start(NETWORK_CHANGE_SETTLE_DELAY)
+
+    def check_finished(
+        self, exit_code: int, exit_status: QProcess.ExitStatus
+    ) -> None:
+        """
+        Qt signal handler. Records the result of a check.
+        """
+
+        self.finish_check(exit_status == QProcess.NormalExit and exit_code == 0)
+
+    def check_error(self, error: QProcess.ProcessError) -> None:
+        """
+        Qt signal handler. A check that can't be started counts as failed.
+        Other errors are followed by the finished signal.
+        """
+
+        if error == QProcess.FailedToStart:
+            self.finish_check(False)
+
+    def finish_check(self, is_network_connected: bool) -> None:
+        """
+        Reports the result of a check, and schedules the next one.
+        """
+
+        assert self.check_process is not None
+
+        self.check_process.deleteLater()
+        self.check_process = None
+        finish_async_span(self.check_trace_span)
+        self.check_trace_span = None
+        self.is_network_connected = is_network_connected
+        self.networkChecked.emit(is_network_connected)
+
+        if self.recheck_pending:
+            self.recheck_pending = False
+            self.check()
+            return
+        self.recheck_timer.start(
+            RECHECK_INTERVAL_CONNECTED
+            if is_network_connected
+            else RECHECK_INTERVAL_DISCONNECTED
+        )
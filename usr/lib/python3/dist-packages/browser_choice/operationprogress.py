@@ -0,0 +1,257 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+operationprogress.py - Tracks the progress of software change operations
+from the machine-readable status lines apt prints when asked to, and the
+progress lines flatpak prints.
+"""
+
+import re
+import time
+from collections import deque
+
+## Operation phases.
+PHASE_DOWNLOAD: str = "download"
+PHASE_INSTALL: str = "install"
+
+## How far back download progress is considered when calculating the
+## current throughput, in seconds.
+THROUGHPUT_WINDOW: float = 3.0
+
+SIZE_UNIT_DICT: dict[str, int] = {
+    "B": 1,
+    "kB": 1000,
+    "MB": 1000**2,
+    "GB": 1000**3,
+    "TB": 1000**4,
+}
+SIZE_RE_STR: str = r"[0-9][0-9.,]* ?(?:[kMGT]?B)"
+
+APT_STATUS_LINE_RE: re.Pattern[str] = re.compile(
+    r"(?:dlstatus|pmstatus|pmerror|pmconffile|media-change):.*"
+)
+APT_DOWNLOAD_STATUS_RE: re.Pattern[str] = re.compile(
+    r"dlstatus:[0-9]+:(?P<percent>[0-9.e+-]+):(?P<message>.*)"
+)
+## Package names may contain colons, so the package is matched lazily.
+APT_INSTALL_STATUS_RE: re.Pattern[str] = re.compile(
+    r"pmstatus:.*?:(?P<percent>[0-9.e+-]+):(?P<message>.*)"
+)
+APT_DOWNLOAD_SIZE_RE: re.Pattern[str] = re.compile(
+    rf"Need to get (?P<size>{SIZE_RE_STR})(?:/{SIZE_RE_STR})? of archives\."
+)
+FLATPAK_PROGRESS_RE: re.Pattern[str] = re.compile(
+    r"(?P<message>(?:Installing|Updating|Uninstalling)(?: [0-9]+/[0-9]+)?)"
+    + r"[^%0-9]*(?P<percent>[0-9]{1,3})%"
+    + rf"(?:\s+(?P<throughput>{SIZE_RE_STR})/s)?"
+)
+
+
+def parse_size(size_str: str) -> float | None:
+    """
+    Converts a size as printed by apt or flatpak, such as '68.5 MB', to
+    bytes. Returns None if it can't be parsed.
+    """
+
+    size_match: re.Match[str] | None = re.fullmatch(
+        r"([0-9.]+) ?([kMGT]?B)", size_str.replace(",", "")
+    )
+    if size_match is None:
+        return None
+    try:
+        return float(size_match.group(1)) * SIZE_UNIT_DICT[size_match.group(2)]
+    except ValueError:
+        return None
+
+
+def format_size(size: float) -> str:
+    """
+    Formats a size in bytes like apt and flatpak do.
+    """
+
+    unit_str: str = "B"
+    for unit_str, unit_size in reversed(SIZE_UNIT_DICT.items()):
+        if size >= unit_size:
+            size /= unit_size
+            break
+    if unit_str == "B":
+        return f"{size:.0f} B"
+    return f"{size:.1f} {unit_str}"
+
+
+def is_apt_status_line(line: str) -> bool:
+    """
+    Returns True if a line of output is a machine-readable apt status line,
+    rather than regular output.
+    """
+
+    return APT_STATUS_LINE_RE.fullmatch(line) is not None
+
+
+# pylint: disable=too-many-instance-attributes
+class OperationProgress:
+    """
+    The progress of a software change operation, as far as it can be told
+    from its output. The percentage is None until it is known, and starts
+    over when the operation moves from downloading to installing. The
+    throughput is only known while apt downloads packages, once apt has
+    said how much it needs to download, and while flatpak reports it.
+    """
+
+    def __init__(self) -> None:
+        self.phase: str | None = None
+        self.percent: float | None = None
+        self.throughput: float | None = None
+        self.message: str = ""
+        ## How many bytes apt will download, if known.
+        self.download_size: float | None = None
+        ## Recent times and amounts of downloaded bytes.
+        self.download_sample_list: deque[tuple[float, float]] = deque()
+
+    def parse_line(self, line: str) -> bool:
+        """
+        Updates the progress from a line of output. Returns True if the
+        progress changed.
+        """
+
+        if line.startswith("dlstatus:"):
+            return self.__parse_apt_download_status(line)
+        if line.startswith("pmstatus:"):
+            return self.__parse_apt_install_status(line)
+        size_match: re.Match[str] | None = APT_DOWNLOAD_SIZE_RE.match(line)
+        if size_match is not None:
+            self.download_size = parse_size(size_match.group("size"))
+            self.download_sample_list.clear()
+            return False
+        return self.parse_partial_line(line)
+
+    def parse_partial_line(self, text: str) -> bool:
+        """
+        Updates the progress from output flatpak redraws in place, by
+        printing carriage returns rather than new lines. Only the last
+        complete progress report in the text is used. Returns True if the
+        progress changed.
+        """
+
+        for segment in reversed(text.split("\r")):
+            flatpak_match: re.Match[str] | None = FLATPAK_PROGRESS_RE.search(
+                segment
+            )
+            if flatpak_match is None:
+                continue
+            throughput_str: str | None = flatpak_match.group("throughput")
+            return self.__update(
+                PHASE_INSTALL,
+                float(flatpak_match.group("percent")),
+                flatpak_match.group("message"),
+                (
+                    parse_size(throughput_str)
+                    if throughput_str is not None
+                    else None
+                ),
+            )
+        return False
+
+    def describe(self) -> str:
+        """
+        Returns a human-readable description of the progress.
+        """
+
+        if self.phase is None:
+            return "Please wait."
+        phase_str: str = (
+            "Downloading" if self.phase == PHASE_DOWNLOAD else "Installing"
+        )
+        description_str: str = phase_str
+        if self.percent is not None:
+            description_str += f": {self.percent:.0f}%"
+        if self.throughput is not None:
+            description_str += f" at {format_size(self.throughput)}/s"
+        if self.message != "":
+            description_str += f" - {self.message}"
+        return description_str
+
+    def __parse_apt_download_status(self, line: str) -> bool:
+        """
+        Updates the progress from an apt download status line, calculating
+        the throughput if the download size is known.
+        """
+
+        status_match: re.Match[str] | None = APT_DOWNLOAD_STATUS_RE.fullmatch(
+            line
+        )
+        if status_match is None:
+            return False
+        try:
+            percent: float = float(status_match.group("percent"))
+        except ValueError:
+            return False
+
+        throughput: float | None = None
+        if self.download_size is not None:
+            current_time: float = time.monotonic()
+            self.download_sample_list.append(
+                (current_time, self.download_size * percent / 100)
+            )
+            while (
+                current_time - self.download_sample_list[0][0]
+                > THROUGHPUT_WINDOW
+            ):
+                self.download_sample_list.popleft()
+            first_time, first_size = self.download_sample_list[0]
+            if current_time > first_time:
+                throughput = (
+                    self.download_size * percent / 100 - first_size
+                ) / (current_time - first_time)
+        return self.__update(
+            PHASE_DOWNLOAD, percent, status_match.group("message"), throughput
+        )
+
+    def __parse_apt_install_status(self, line: str) -> bool:
+        """
+        Updates the progress from an apt install status line, which apt
+        prints while dpkg runs.
+        """
+
+        status_match: re.Match[str] | None = APT_INSTALL_STATUS_RE.fullmatch(
+            line
+        )
+        if status_match is None:
+            return False
+        try:
+            percent: float = float(status_match.group("percent"))
+        except ValueError:
+            return False
+        self.download_size = None
+        self.download_sample_list.clear()
+        return self.__update(
+            PHASE_INSTALL, percent, status_match.group("message"), None
+        )
+
+    def __update(
+        self,
+        phase: str,
+        percent: float,
+        message: str,
+        throughput: float | None,
+    ) -> bool:
+        """
+        Sets the progress. Returns True if it changed.
+        """
+
+        percent = min(max(percent, 0.0), 100.0)
+        if (phase, percent, message, throughput) == (
+            self.phase,
+            self.percent,
+            self.message,
+            self.throughput,
+        ):
+            return False
+        self.phase = phase
+        self.percent = percent
+        self.message = message
+        self.throughput = throughput
+        return True
@@ -0,0 +1,327 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+operationqueue.py - Runs software change operations on plugin repos one
+after another per package manager backend, and concurrently across backends.
+Waiting operations that are plain package manager commands are merged into
+one transaction.
+"""
+
+import functools
+from collections import deque
+
+from PyQt5.QtCore import (
+    pyqtSignal,
+    QObject,
+    QProcess,
+)
+
+from browser_choice.browser_choice_core import (
+    ChoicePlugin,
+    ChoicePluginRepo,
+)
+from browser_choice.linesplitter import LineSplitter
+from browser_choice.operationprogress import (
+    OperationProgress,
+    is_apt_status_line,
+)
+from browser_choice.packagetransaction import (
+    PackageTransaction,
+    merge_package_transactions,
+    parse_package_transaction,
+)
+from browser_choice.scriptprocess import run_plugin_script
+
+
+# pylint: disable=too-many-instance-attributes
+class QueuedOperation(QObject):
+    """
+    A single install, update and install, remove, or purge operation on a
+    plugin repo. Streams the output of its script line by line.
+    """
+
+    outputLine: pyqtSignal = pyqtSignal(str)
+    progressChanged: pyqtSignal = pyqtSignal()
+    finished: pyqtSignal = pyqtSignal(bool)
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        plugin: ChoicePlugin,
+        repo: ChoicePluginRepo,
+        change_str: str,
+        script: str,
+        allow_launch: bool,
+        parent: QObject | None = None,
+    ):
+        super().__init__(parent)
+        self.plugin: ChoicePlugin = plugin
+        self.repo: ChoicePluginRepo = repo
+        self.change_str: str = change_str
+        self.script: str = script
+        self.allow_launch: bool = allow_launch
+        self.title: str = f"{plugin.product_name} ({repo.method_name_short})"
+        self.backend: str = repo.backend
+        self.transaction: PackageTransaction | None = parse_package_transaction(
+            script
+        )
+        ## Operations whose transactions were merged into this operation's
+        ## transaction. They share this operation's process and output.
+        self.joined_operation_list: list[QueuedOperation] = []
+
+        self.process: QProcess | None = None
+        self.line_splitter: LineSplitter = LineSplitter()
+        self.progress: OperationProgress = OperationProgress()
+        self.is_running: bool = False
+        self.is_done: bool = False
+        self.successful: bool = False
+        ## None if the script couldn't be started or crashed.
+        self.exit_code: int | None = None
+
+    def can_join(self, operation: "QueuedOperation") -> bool:
+        """
+        Returns True if this operation's transaction can be merged into
+        another operation's transaction.
+        """
+
+        return (
+            self.transaction is not None
+            and operation.transaction is not None
+            and self.transaction.merge_key == operation.transaction.merge_key
+        )
+
+    def start(
+        self, joined_operation_list: list["QueuedOperation"] | None = None
+    ) -> None:
+        """
+        Starts running the operation's script. If other operations are
+        joined to this one, runs a single transaction for all of them
+        instead, and reports its output and result on each of them.
+        """
+
+        ## apt can only be asked to report its progress if the script is a
+        ## plain package manager command.
+        script: str = self.script
+        if self.transaction is not None and self.transaction.backend == "apt":
+            script = self.transaction.script(report_progress=True)
+        if joined_operation_list:
+            self.joined_operation_list = joined_operation_list
+            assert self.transaction is not None
+            script = merge_package_transactions(
+                [self.transaction]
+                + [
+                    x.transaction
+                    for x in joined_operation_list
+                    if x.transaction is not None
+                ]
+            ).script(report_progress=True)
+            title_str: str = ", ".join(
+                x.title for x in [self] + joined_operation_list
+            )
+            for operation in [self] + joined_operation_list:
+                operation.is_running = True
+                operation.progress = self.progress
+                operation.outputLine.emit(
+                    f"Combined into one transaction: {title_str}"
+                )
+
+        ## The script that runs may differ from the one the user confirmed,
+        ## so it is always shown.
+        for operation in [self] + self.joined_operation_list:
+            operation.outputLine.emit(f"Executing command: {script}")
+        self.is_running = True
+        try:
+            self.process = run_plugin_script(script, set_x=True, parent=self)
+        except OSError as e:
+            self.__emit_line(f"{e}")
+            self.__finish(None)
+            return
+        self.process.readyReadStandardOutput.connect(self.__output_received)
+        self.process.finished.connect(self.__process_finished)
+
+    def __output_received(self) -> None:
+        """
+        Qt signal handler. Emits each complete line of output the script
+        produced.
+        """
+
+        assert self.process is not None
+        for line in self.line_splitter.feed(
+            self.process.readAllStandardOutput().data()
+        ):
+            self.__emit_line(line)
+        ## flatpak redraws its progress in place, without ending the line.
+        if self.progress.parse_partial_line(self.line_splitter.partial_line()):
+            self.__emit_progress()
+
+    def __process_finished(
+        self, exit_code: int, exit_status: QProcess.ExitStatus
+    ) -> None:
+        """
+        Qt signal handler. Emits any remaining output, then finishes the
+        operation.
+        """
+
+        self.__output_received()
+        last_line: str | None = self.line_splitter.finish()
+        if last_line is not None:
+            self.__emit_line(last_line)
+        self.__finish(exit_code if exit_status == QProcess.NormalExit else None)
+
+    def __emit_line(self, line: str) -> None:
+        """
+        Emits a line of output on this operation and all joined operations,
+        and updates their progress. apt status lines only update the
+        progress.
+        """
+
+        progress_changed: bool = self.progress.parse_line(line)
+        if not is_apt_status_line(line):
+            for operation in [self] + self.joined_operation_list:
+                operation.outputLine.emit(line)
+        if progress_changed:
+            self.__emit_progress()
+
+    def __emit_progress(self) -> None:
+        """
+        Emits progressChanged on this operation and all joined operations.
+        """
+
+        for operation in [self] + self.joined_operation_list:
+            operation.progressChanged.emit()
+
+    def __finish(self, exit_code: int | None) -> None:
+        """
+        Records the result of the operation and all joined operations, and
+        emits finished on each of them.
+        """
+
+        successful: bool = exit_code == 0
+        for operation in [self] + self.joined_operation_list:
+            operation.is_running = False
+            operation.is_done = True
+            operation.successful = successful
+            operation.exit_code = exit_code
+        ## This operation finishes last, since the queue moves on once it
+        ## has finished.
+        for operation in self.joined_operation_list + [self]:
+            operation.finished.emit(successful)
+
+
+class OperationQueue(QObject):
+    """
+    Runs queued operations. Operations on the same package manager backend
+    run one after another, since apt and dpkg only allow one user at a time.
+    Operations on different backends run at the same time.
+
+    When a backend becomes idle, the next operation waiting on it and the
+    operations queued right after it that can be merged with it are run as
+    a single transaction, so dependency resolution, downloads and dpkg
+    triggers only happen once. Operations running opaque helper scripts are
+    never merged.
+    """
+
+    allOperationsFinished: pyqtSignal = pyqtSignal()
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.operation_list: list[QueuedOperation] = []
+        self.pending_dict: dict[str, deque[QueuedOperation]] = {}
+        self.running_dict: dict[str, QueuedOperation] = {}
+        ## Backends whose operations must not start yet, since something
+        ## else is still using the backend.
+        self.held_backend_set: set[str] = set()
+
+    def enqueue(self, operation: QueuedOperation) -> None:
+        """
+        Queues an operation, starting it right away if no other operation on
+        its backend is running.
+        """
+
+        self.operation_list.append(operation)
+        self.pending_dict.setdefault(operation.backend, deque()).append(
+            operation
+        )
+        operation.finished.connect(
+            functools.partial(self.__operation_finished, operation)
+        )
+        self.__start_next(operation.backend)
+
+    def hold_backend(self, backend: str) -> None:
+        """
+        Keeps operations queued on a backend from starting until the backend
+        is released. Operations that are already running keep running.
+        """
+
+        self.held_backend_set.add(backend)
+
+    def release_backend(self, backend: str) -> None:
+        """
+        Lets operations queued on a held backend start.
+        """
+
+        if backend not in self.held_backend_set:
+            return
+        self.held_backend_set.remove(backend)
+        if backend in self.pending_dict:
+            self.__start_next(backend)
+
+    def backend_is_busy(self, backend: str) -> bool:
+        """
+        Returns True if operations on a backend are running or waiting to
+        run.
+        """
+
+        return backend in self.running_dict or (
+            len(self.pending_dict.get(backend, ())) != 0
+        )
+
+    def is_idle(self) -> bool:
+        """
+        Returns True if no operations are running or waiting to run.
+        """
+
+        return len(self.running_dict) == 0 and all(
+            len(x) == 0 for x in self.pending_dict.values()
+        )
+
+    def __start_next(self, backend: str) -> None:
+        """
+        Starts the next operation queued on a backend, if the backend is
+        idle.
+        """
+
+        if backend in self.running_dict or backend in self.held_backend_set:
+            return
+        pending_queue: deque[QueuedOperation] = self.pending_dict[backend]
+        if len(pending_queue) == 0:
+            return
+        operation: QueuedOperation = pending_queue.popleft()
+        ## Only operations directly following this one are joined, so that
+        ## operations never run before other operations queued earlier.
+        joined_operation_list: list[QueuedOperation] = []
+        while len(pending_queue) != 0 and pending_queue[0].can_join(operation):
+            joined_operation_list.append(pending_queue.popleft())
+        self.running_dict[backend] = operation
+        operation.start(joined_operation_list)
+
+    # pylint: disable=unused-argument
+    def __operation_finished(
+        self, operation: QueuedOperation, successful: bool
+    ) -> None:
+        """
+        Qt signal handler. Starts the next operation on the finished
+        operation's backend.
+        """
+
+        ## Joined operations finish along with the operation they were
+        ## joined to, which is the one recorded as running.
+        if self.running_dict.get(operation.backend) is not operation:
+            return
+        del self.running_dict[operation.backend]
+        self.__start_next(operation.backend)
+        if self.is_idle():
+            self.allOperationsFinished.emit()
@@ -0,0 +1,189 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+packageprefetch.py - Downloads the packages of an APT repo into the APT
+cache in the background while the user is still deciding whether to install
+them, so that the installation itself only needs to unpack them.
+"""
+
+import functools
+import shlex
+
+from PyQt5.QtCore import (
+    pyqtSignal,
+    QObject,
+    QProcess,
+    QTimer,
+)
+
+from browser_choice import GlobalData
+from browser_choice.browser_choice_core import ChoicePluginRepo
+from browser_choice.packagetransaction import (
+    APT_TOOL,
+    PackageTransaction,
+    parse_package_transaction,
+)
+from browser_choice.scriptprocess import run_plugin_script
+
+## How long a cancelled download gets to exit before it is killed, in
+## milliseconds.
+PREFETCH_TERMINATE_TIMEOUT: int = 2000
+
+
+def speculative_download_enabled() -> bool:
+    """
+    Returns True if the administrator opted into downloading packages before
+    the user confirms installing them.
+    """
+
+    return GlobalData.speculative_download_file_path.exists()
+
+
+def get_prefetch_script(repo: ChoicePluginRepo) -> str | None:
+    """
+    Returns a script that downloads the packages a repo's install script
+    would install, without installing them. Returns None if the install
+    script isn't a plain apt install command, in which case the packages
+    can't be known in advance, or if the repo won't be installed with
+    privileges.
+    """
+
+    ## Repos modified without privileges are installed with their
+    ## unprivileged scripts, even as root. Prefetching their packages would
+    ## also need sudo, which the user likely isn't allowed to use, and sudo
+    ## reports every failed attempt.
+    if repo.install_script is None or not repo.mod_requires_privileges:
+        return None
+    transaction: PackageTransaction | None = parse_package_transaction(
+        repo.install_script
+    )
+    if (
+        transaction is None
+        or transaction.backend != "apt"
+        or transaction.action != "install"
+    ):
+        return None
+    command_list: list[str] = [
+        APT_TOOL,
+        *transaction.option_list,
+        "--download-only",
+        "install",
+        *transaction.target_list,
+    ]
+    ## Downloading to the APT cache requires root. Prefetching must not
+    ## prompt for a password, it just fails if sudo would need one.
+    if GlobalData.uid != 0:
+        command_list = ["sudo", "--non-interactive", "--"] + command_list
+    return shlex.join(command_list)
+
+
+class PackagePrefetcher(QObject):
+    """
+    Runs at most one package download at a time. Starting a download for
+    another repo cancels the current one. Cancelled downloads may take a
+    moment to exit, and hold the APT cache lock until they do.
+    """
+
+    ## Emitted once no download processes are running anymore.
+    stopped: pyqtSignal = pyqtSignal()
+
+    def __init__(self, parent: QObject | None = None):
+        super().__init__(parent)
+        self.process: QProcess | None = None
+        self.repo: ChoicePluginRepo | None = None
+        ## Cancelled download processes that haven't exited yet.
+        self.stopping_process_list: list[QProcess] = []
+
+    def is_running(self) -> bool:
+        """
+        Returns True if any download process is still running, including
+        cancelled ones that haven't exited yet.
+        """
+
+        return self.process is not None or len(self.stopping_process_list) != 0
+
+    def prefetch(self, repo: ChoicePluginRepo) -> None:
+        """
+        Starts downloading a repo's packages, if they can be known in
+        advance. Cancels any download for another repo.
+        """
+
+        if repo is self.repo:
+            return
+        self.cancel()
+        prefetch_script: str | None = get_prefetch_script(repo)
+        if prefetch_script is None:
+            return
+        try:
+            self.process = run_plugin_script(prefetch_script, parent=self)
+        except OSError:
+            return
+        self.repo = repo
+        ## Output isn't shown anywhere, but has to be read so it doesn't
+        ## accumulate.
+        self.process.readyReadStandardOutput.connect(
+            self.process.readAllStandardOutput
+        )
+        self.process.finished.connect(self.prefetch_finished)
+
+    def cancel(self) -> None:
+        """
+        Stops the current download, if any, without waiting for it to exit.
+        Partially downloaded packages are kept and resumed by the
+        installation.
+        """
+
+        self.repo = None
+        if self.process is None:
+            return
+        process: QProcess = self.process
+        self.process = None
+        process.finished.disconnect(self.prefetch_finished)
+        if process.state() == QProcess.NotRunning:
+            process.deleteLater()
+            return
+        self.stopping_process_list.append(process)
+        process.finished.connect(
+            functools.partial(self.cancelled_process_finished, process)
+        )
+        ## The timer is owned by the process, so it goes away with it.
+        kill_timer: QTimer = QTimer(process)
+        kill_timer.setSingleShot(True)
+        kill_timer.timeout.connect(process.kill)
+        kill_timer.start(PREFETCH_TERMINATE_TIMEOUT)
+        process.terminate()
+
+    # pylint: disable=unused-argument
+    def prefetch_finished(
+        self, exit_code: int, exit_status: QProcess.ExitStatus
+    ) -> None:
+        """
+        Qt signal handler. Cleans up after a download finishes. The repo is
+        remembered, so that selecting it again doesn't download again.
+        """
+
+        if self.process is None:
+            return
+        self.process.deleteLater()
+        self.process = None
+        if not self.is_running():
+            self.stopped.emit()
+
+    # pylint: disable=unused-argument
+    def cancelled_process_finished(
+        self,
+        process: QProcess,
+        exit_code: int,
+        exit_status: QProcess.ExitStatus,
+    ) -> None:
+        """
+        Qt signal handler. Cleans up after a cancelled download exits.
+        """
+
+        self.stopping_process_list.remove(process)
+        process.deleteLater()
+        if not self.is_running():
+            self.stopped.emit()
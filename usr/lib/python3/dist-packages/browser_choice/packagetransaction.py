@@ -0,0 +1,235 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+packagetransaction.py - Recognizes plugin scripts that are plain apt or
+flatpak commands, so that several of them can be merged into a single
+package manager transaction.
+"""
+
+import re
+import shlex
+
+APT_TOOL: str = "apt-get-noninteractive"
+FLATPAK_TOOL: str = "flatpak"
+
+## Makes apt print machine-readable progress to standard output.
+APT_PROGRESS_OPTION_LIST: list[str] = ["-o", "APT::Status-Fd=1"]
+
+## Commands that may prefix a package manager command without changing what
+## it does.
+WRAPPER_LIST: list[str] = [
+    "/usr/libexec/browser-choice/qubes-proxy-maybe",
+]
+
+APT_ACTION_LIST: list[str] = ["install", "remove", "purge"]
+FLATPAK_ACTION_LIST: list[str] = ["install", "uninstall"]
+
+APT_PACKAGE_NAME_RE: re.Pattern[str] = re.compile(r"[a-z0-9][a-z0-9+.-]+")
+FLATPAK_REF_RE: re.Pattern[str] = re.compile(r"[A-Za-z0-9_][A-Za-z0-9._/-]*")
+
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class PackageTransaction:
+    """
+    A package manager command a plugin script consists of. Transactions with
+    the same merge key only differ in the packages they act on.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        backend: str,
+        action: str,
+        option_list: list[str],
+        target_list: list[str],
+        remote: str | None = None,
+        wrapper_list: list[str] | None = None,
+        refresh_first: bool = False,
+    ):
+        self.backend: str = backend
+        self.action: str = action
+        self.option_list: list[str] = option_list
+        self.target_list: list[str] = target_list
+        self.remote: str | None = remote
+        self.wrapper_list: list[str] = (
+            wrapper_list if wrapper_list is not None else []
+        )
+        self.refresh_first: bool = refresh_first
+        self.merge_key: tuple[object, ...] = (
+            backend,
+            action,
+            tuple(option_list),
+            remote,
+            tuple(self.wrapper_list),
+            refresh_first,
+        )
+
+    def script(self, report_progress: bool = False) -> str:
+        """
+        Returns a privileged script that runs the transaction. If
+        report_progress is True, apt is asked to print machine-readable
+        progress to standard output.
+        """
+
+        apt_option_list: list[str] = (
+            [*APT_PROGRESS_OPTION_LIST] if report_progress else []
+        )
+        ## apt-get takes options before the action, flatpak after it.
+        command_list: list[str] = list(self.wrapper_list)
+        if self.backend == "apt":
+            command_list.extend(
+                [APT_TOOL, *self.option_list, *apt_option_list, self.action]
+            )
+        else:
+            command_list.extend([FLATPAK_TOOL, self.action, *self.option_list])
+        if self.remote is not None:
+            command_list.append(self.remote)
+        command_list.extend(self.target_list)
+        command_str: str = shlex.join(command_list)
+
+        if not self.refresh_first:
+            return f"pkexec {command_str}"
+        return "pkexec bash -c -- " + shlex.quote(
+            f"{shlex.join([APT_TOOL, *apt_option_list, 'update'])} && "
+            + command_str
+        )
+
+
+def parse_apt_command(
+    token_list: list[str], refresh_first: bool
+) -> PackageTransaction | None:
+    """
+    Parses an apt-get-noninteractive install, remove, or purge command.
+    """
+
+    if len(token_list) < 3 or token_list[0] != APT_TOOL:
+        return None
+    action_idx: int = 1
+    while action_idx < len(token_list) and token_list[action_idx].startswith(
+        "-"
+    ):
+        action_idx += 1
+    if action_idx >= len(token_list) - 1:
+        return None
+    if token_list[action_idx] not in APT_ACTION_LIST:
+        return None
+    target_list: list[str] = token_list[action_idx + 1 :]
+    if not all(APT_PACKAGE_NAME_RE.fullmatch(x) for x in target_list):
+        return None
+    return PackageTransaction(
+        backend="apt",
+        action=token_list[action_idx],
+        option_list=token_list[1:action_idx],
+        target_list=target_list,
+        refresh_first=refresh_first,
+    )
+
+
+def parse_flatpak_command(token_list: list[str]) -> PackageTransaction | None:
+    """
+    Parses a flatpak install or uninstall command, optionally prefixed by a
+    wrapper command.
+    """
+
+    wrapper_list: list[str] = []
+    while len(token_list) != 0 and token_list[0] in WRAPPER_LIST:
+        wrapper_list.append(token_list[0])
+        token_list = token_list[1:]
+    if len(token_list) < 3 or token_list[0] != FLATPAK_TOOL:
+        return None
+    if token_list[1] not in FLATPAK_ACTION_LIST:
+        return None
+    action: str = token_list[1]
+    arg_idx: int = 2
+    while arg_idx < len(token_list) and token_list[arg_idx].startswith("-"):
+        arg_idx += 1
+    option_list: list[str] = token_list[2:arg_idx]
+    remote: str | None = None
+    if action == "install":
+        if arg_idx >= len(token_list):
+            return None
+        remote = token_list[arg_idx]
+        arg_idx += 1
+    target_list: list[str] = token_list[arg_idx:]
+    if len(target_list) == 0:
+        return None
+    if not all(FLATPAK_REF_RE.fullmatch(x) for x in target_list):
+        return None
+    return PackageTransaction(
+        backend="flatpak",
+        action=action,
+        option_list=option_list,
+        target_list=target_list,
+        remote=remote,
+        wrapper_list=wrapper_list,
+    )
+
+
+# pylint: disable=too-many-return-statements
+def parse_package_transaction(script: str) -> PackageTransaction | None:
+    """
+    Recognizes a plugin script that is a plain privileged apt or flatpak
+    command, optionally preceded by an apt index refresh. Returns None for
+    anything else, such as helper scripts or commands that also set up
+    repositories, since those must run as they are.
+    """
+
+    try:
+        token_list: list[str] = shlex.split(script)
+    except ValueError:
+        return None
+    if len(token_list) < 2 or token_list[0] != "pkexec":
+        return None
+    token_list = token_list[1:]
+
+    if token_list[:3] != ["bash", "-c", "--"]:
+        transaction: PackageTransaction | None = parse_apt_command(
+            token_list, refresh_first=False
+        )
+        if transaction is None:
+            transaction = parse_flatpak_command(token_list)
+        return transaction
+
+    if len(token_list) != 4:
+        return None
+    try:
+        part_list: list[list[str]] = [
+            shlex.split(x) for x in token_list[3].split("&&")
+        ]
+    except ValueError:
+        return None
+    if len(part_list) != 2 or part_list[0] != [APT_TOOL, "update"]:
+        return None
+    return parse_apt_command(part_list[1], refresh_first=True)
+
+
+def merge_package_transactions(
+    transaction_list: list[PackageTransaction],
+) -> PackageTransaction:
+    """
+    Merges transactions with the same merge key into one transaction that
+    acts on all of their packages.
+    """
+
+    assert len(transaction_list) != 0
+    first_transaction: PackageTransaction = transaction_list[0]
+    assert all(
+        x.merge_key == first_transaction.merge_key for x in transaction_list
+    )
+    target_list: list[str] = []
+    for transaction in transaction_list:
+        for target in transaction.target_list:
+            if target not in target_list:
+                target_list.append(target)
+    return PackageTransaction(
+        backend=first_transaction.backend,
+        action=first_transaction.action,
+        option_list=first_transaction.option_list,
+        target_list=target_list,
+        remote=first_transaction.remote,
+        wrapper_list=first_transaction.wrapper_list,
+        refresh_first=first_transaction.refresh_first,
+    )
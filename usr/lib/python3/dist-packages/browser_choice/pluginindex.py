@@ -0,0 +1,130 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+# pylint: disable=broad-exception-caught
+
+"""
+pluginindex.py - Persistent index of parsed plugin config files.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import Any
+
+from browser_choice import write_cache_file
+
+PLUGIN_INDEX_VERSION: int = 1
+
+
+def get_file_signature(config_file: Path) -> list[int]:
+    """
+    Returns a JSON-serializable value that changes whenever the specified file
+    is replaced or modified.
+    """
+
+    file_stat: os.stat_result = config_file.stat()
+    return [
+        file_stat.st_dev,
+        file_stat.st_ino,
+        file_stat.st_size,
+        file_stat.st_mtime_ns,
+        file_stat.st_ctime_ns,
+    ]
+
+
+class PluginIndex:
+    """
+    Stores the parsed records of plugin config files on disk, so that files
+    that haven't changed since the last run don't need to be parsed again.
+    Entries are keyed by the path of the plugin file, and are only used while
+    the file's device, inode, size and modification and change times stay
+    the same.
+    """
+
+    def __init__(self, index_file_path: Path):
+        self.index_file_path: Path = index_file_path
+        self.dirty: bool = False
+        self.entry_dict: dict[str, Any] = {}
+
+        try:
+            index_data: Any = json.loads(
+                self.index_file_path.read_text(encoding="utf-8")
+            )
+        except Exception:
+            return
+        if (
+            not isinstance(index_data, dict)
+            or index_data.get("version") != PLUGIN_INDEX_VERSION
+            or not isinstance(index_data.get("entries"), dict)
+        ):
+            return
+        self.entry_dict = index_data["entries"]
+
+    def lookup(
+        self, config_file: Path, signature: list[int]
+    ) -> dict[str, Any] | None:
+        """
+        Returns the stored record of a plugin file, or None if there is none
+        or if the file has changed since it was stored.
+        """
+
+        entry: Any = self.entry_dict.get(str(config_file))
+        if (
+            not isinstance(entry, dict)
+            or entry.get("signature") != signature
+            or not isinstance(entry.get("record"), dict)
+        ):
+            return None
+        plugin_record: dict[str, Any] = entry["record"]
+        return plugin_record
+
+    def store(
+        self,
+        config_file: Path,
+        signature: list[int],
+        plugin_record: dict[str, Any],
+    ) -> None:
+        """
+        Records the parsed record of a plugin file. The record must be
+        JSON-serializable.
+        """
+
+        self.entry_dict[str(config_file)] = {
+            "signature": signature,
+            "record": plugin_record,
+        }
+        self.dirty = True
+
+    def retain(self, config_file_list: list[Path]) -> None:
+        """
+        Drops the entries of all plugin files not in the specified list, so
+        that removed plugins don't accumulate in the index.
+        """
+
+        keep_set: set[str] = {str(x) for x in config_file_list}
+        for config_file_str in list(self.entry_dict):
+            if config_file_str not in keep_set:
+                del self.entry_dict[config_file_str]
+                self.dirty = True
+
+    def save(self) -> None:
+        """
+        Writes the index to disk if it has changed. Failing to write the index
+        is not an error, the plugins will just be parsed again next time.
+        """
+
+        if not self.dirty:
+            return
+        self.dirty = False
+        write_cache_file(
+            self.index_file_path,
+            json.dumps(
+                {
+                    "version": PLUGIN_INDEX_VERSION,
+                    "entries": self.entry_dict,
+                }
+            ),
+        )
@@ -0,0 +1,218 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+# pylint: disable=broad-exception-caught
+
+"""
+probecache.py - Persistent cache of plugin repo probe results.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any
+
+from browser_choice import write_cache_file
+
+PROBE_CACHE_VERSION: int = 1
+
+## The results of install-status and capability probes only change when
+## packages are installed or removed, or when the architecture changes. Every
+## package transaction touches at least one of these paths, so the cache is
+## only valid as long as none of them change.
+##
+## dpkg replaces its status file with a new one, and writes journal entries
+## into the 'updates' directory while a transaction is in progress. Flatpak
+## touches the '.changed' file of an installation on every change, and
+## creates or removes directories under 'app' and 'runtime'.
+PACKAGE_STATE_PATH_LIST: list[Path] = [
+    Path("/var/lib/dpkg/status"),
+    Path("/var/lib/dpkg/updates"),
+    Path("/var/lib/dpkg/arch"),
+    Path("/var/lib/flatpak/.changed"),
+    Path("/var/lib/flatpak/app"),
+    Path("/var/lib/flatpak/runtime"),
+    Path.home().joinpath(".local/share/flatpak/.changed"),
+    Path.home().joinpath(".local/share/flatpak/app"),
+    Path.home().joinpath(".local/share/flatpak/runtime"),
+]
+
+
+def get_package_state_fingerprint() -> list[Any]:
+    """
+    Returns a JSON-serializable value that changes whenever the system's
+    installed packages or architecture change.
+    """
+
+    fingerprint: list[Any] = [os.uname().machine]
+    for state_path in PACKAGE_STATE_PATH_LIST:
+        try:
+            state_stat: os.stat_result = state_path.stat()
+        except OSError:
+            fingerprint.append([str(state_path), None])
+            continue
+        fingerprint.append(
+            [
+                str(state_path),
+                state_stat.st_dev,
+                state_stat.st_ino,
+                state_stat.st_size,
+                state_stat.st_mtime_ns,
+                state_stat.st_ctime_ns,
+            ]
+        )
+    return fingerprint
+
+
+class ProbeCache:
+    """
+    Stores probe results on disk so that they can be reused across runs.
+    Entries are keyed by plugin file, repo ID, probe kind and probe script
+    text, and are discarded as a whole as soon as the package state
+    fingerprint changes.
+    """
+
+    def __init__(self, cache_file_path: Path):
+        self.cache_file_path: Path = cache_file_path
+        self.lock: threading.Lock = threading.Lock()
+        self.save_lock: threading.Lock = threading.Lock()
+        self.loaded: bool = False
+        self.dirty: bool = False
+        ## The fingerprint is taken before any probe runs, so that a package
+        ## transaction that happens while probing invalidates the results the
+        ## next time around instead of being baked into the cache.
+        self.fingerprint: list[Any] = []
+        self.entry_dict: dict[str, Any] = {}
+        ## Counts how often the cache was invalidated, so that results of
+        ## probes started before an invalidation are not stored.
+        self.generation: int = 0
+
+    @staticmethod
+    def make_key(
+        config_file: Path, repo_id: str, probe_kind: str, script: str
+    ) -> str:
+        """
+        Returns the cache key for a probe.
+        """
+
+        return hashlib.sha256(
+            json.dumps([str(config_file), repo_id, probe_kind, script]).encode(
+                encoding="utf-8"
+            )
+        ).hexdigest()
+
+    def __load(self) -> None:
+        """
+        Loads the cache file if it hasn't been loaded yet, dropping its
+        contents if the package state has changed since it was written. Must
+        be called with the lock held.
+        """
+
+        if self.loaded:
+            return
+        self.loaded = True
+        self.fingerprint = get_package_state_fingerprint()
+
+        try:
+            cache_data: Any = json.loads(
+                self.cache_file_path.read_text(encoding="utf-8")
+            )
+        except Exception:
+            return
+        if (
+            not isinstance(cache_data, dict)
+            or cache_data.get("version") != PROBE_CACHE_VERSION
+            or cache_data.get("fingerprint") != self.fingerprint
+            or not isinstance(cache_data.get("entries"), dict)
+        ):
+            return
+        self.entry_dict = cache_data["entries"]
+
+    def lookup(
+        self, config_file: Path, repo_id: str, probe_kind: str, script: str
+    ) -> Any | None:
+        """
+        Returns the cached result of a probe, or None if there is none.
+        """
+
+        with self.lock:
+            self.__load()
+            return self.entry_dict.get(
+                self.make_key(config_file, repo_id, probe_kind, script)
+            )
+
+    def current_generation(self) -> int:
+        """
+        Returns the cache's generation. Probes should get it before they
+        start, and pass it to store().
+        """
+
+        with self.lock:
+            return self.generation
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def store(
+        self,
+        config_file: Path,
+        repo_id: str,
+        probe_kind: str,
+        script: str,
+        result: Any,
+        generation: int,
+    ) -> None:
+        """
+        Records the result of a probe. The result must be JSON-serializable
+        and must not be None. The result is dropped if the cache was
+        invalidated since the probe got the generation, since the probe may
+        have seen the package state from before the change.
+        """
+
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.__load()
+            self.entry_dict[
+                self.make_key(config_file, repo_id, probe_kind, script)
+            ] = result
+            self.dirty = True
+
+    def invalidate(self) -> None:
+        """
+        Drops all cached results after software changes were applied, and
+        takes the package state fingerprint anew, so that results stored
+        afterwards are valid on the next run. Results of other repos can't
+        be kept, since the changes or package transactions run outside
+        browser-choice in the meantime may have affected them as well.
+        """
+
+        with self.lock:
+            self.__load()
+            self.fingerprint = get_package_state_fingerprint()
+            self.entry_dict = {}
+            self.generation += 1
+            self.dirty = True
+
+    def save(self) -> None:
+        """
+        Writes the cache to disk if it has changed. Failing to write the cache
+        is not an error, the probes will just be run again next time.
+        """
+
+        with self.save_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                cache_text: str = json.dumps(
+                    {
+                        "version": PROBE_CACHE_VERSION,
+                        "fingerprint": self.fingerprint,
+                        "entries": self.entry_dict,
+                    }
+                )
+                self.dirty = False
+
+            write_cache_file(self.cache_file_path, cache_text)
@@ -0,0 +1,381 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+# pylint: disable=broad-exception-caught
+
+"""
+probeengine.py - Runs plugin repo probes (install status, capability, and
+unprivileged modification checks) concurrently and in priority order.
+"""
+
+import os
+import heapq
+import subprocess
+import threading
+import traceback
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+from browser_choice.tracer import trace_span
+
+## Probes spend nearly all of their time waiting on child processes, so more
+## workers than CPUs are useful. Spawning bash is not free though, so the
+## worker count still scales with the number of usable CPUs, and is capped so
+## that a large plugin set doesn't fork-bomb the machine.
+PROBE_WORKERS_PER_CPU: int = 4
+PROBE_WORKERS_MAX: int = 32
+
+## Probe priorities. Lower values run first.
+PRIORITY_SELECTED: int = 0
+PRIORITY_VISIBLE: int = 1
+PRIORITY_BACKGROUND: int = 2
+
+
+def usable_cpu_count() -> int:
+    """
+    Returns the number of CPUs this process is allowed to run on.
+    """
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def probe_worker_count(job_count: int) -> int:
+    """
+    Returns the number of worker threads to use for running the specified
+    number of probe jobs.
+    """
+
+    return max(
+        1,
+        min(
+            job_count,
+            usable_cpu_count() * PROBE_WORKERS_PER_CPU,
+            PROBE_WORKERS_MAX,
+        ),
+    )
+
+
+class ProbeMemo:
+    """
+    Runs probe scripts with bash, remembering the result of each distinct
+    script so that it is only ever run once per process. Many repos share
+    identical capability, install-status and unprivileged-check scripts. If
+    a script is requested while it is already running, the caller waits for
+    and shares the running process's result rather than starting another
+    one.
+    """
+
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.result_dict: dict[
+            str, Future[subprocess.CompletedProcess[bytes]]
+        ] = {}
+        self.hit_count: int = 0
+        self.inflight_hit_count: int = 0
+        self.miss_count: int = 0
+
+    def run(self, script: str) -> subprocess.CompletedProcess[bytes]:
+        """
+        Returns the result of running the script with bash, running it only
+        if it hasn't been run before.
+        """
+
+        run_script: bool = False
+        with self.lock:
+            result_future: Future[subprocess.CompletedProcess[bytes]] | None = (
+                self.result_dict.get(script)
+            )
+            if result_future is None:
+                self.miss_count += 1
+                result_future = Future()
+                self.result_dict[script] = result_future
+                run_script = True
+            else:
+                self.hit_count += 1
+                if not result_future.done():
+                    self.inflight_hit_count += 1
+
+        if run_script:
+            try:
+                with trace_span("run probe script", command=script):
+                    result_future.set_result(
+                        subprocess.run(
+                            [
+                                "/usr/bin/bash",
+                                "-c",
+                                "--",
+                                script,
+                            ],
+                            check=False,
+                            capture_output=True,
+                        )
+                    )
+            except Exception as e:
+                ## Don't remember failures to run the script at all, a later
+                ## request may succeed.
+                with self.lock:
+                    if self.result_dict.get(script) is result_future:
+                        del self.result_dict[script]
+                result_future.set_exception(e)
+        return result_future.result()
+
+    def forget(self, script_list: list[str]) -> None:
+        """
+        Forgets the results of the specified scripts, so that they are run
+        again the next time they are requested. Used once the system state
+        they check has changed. Callers already waiting on a running script
+        still get its result.
+        """
+
+        with self.lock:
+            for script in script_list:
+                self.result_dict.pop(script, None)
+
+    def counters(self) -> dict[str, int]:
+        """
+        Returns the memo's hit and miss counts. In-flight hits are hits that
+        had to wait for the shared process to finish, and are also included
+        in the hit count.
+        """
+
+        with self.lock:
+            return {
+                "hits": self.hit_count,
+                "inflight_hits": self.inflight_hit_count,
+                "misses": self.miss_count,
+            }
+
+
+# pylint: disable=too-few-public-methods
+class ProbeOwnerState:
+    """
+    Tracks the probe jobs belonging to a single owner (usually a plugin
+    repo).
+    """
+
+    def __init__(self, job_list: list[Callable[[], None]]):
+        self.job_list: list[Callable[[], None]] = job_list
+        self.job_started_list: list[bool] = [False] * len(job_list)
+        self.jobs_remaining: int = len(job_list)
+        self.priority: int | None = None
+        self.error: BaseException | None = None
+        self.done_event: threading.Event = threading.Event()
+        if self.jobs_remaining == 0:
+            self.done_event.set()
+
+
+class ProbeEngine:
+    """
+    Runs probe jobs on a bounded pool of background worker threads. Jobs are
+    grouped by owner, and the jobs of an owner can be moved to the front of
+    the queue at any time before they start, so that the probes the user is
+    waiting on run before the rest.
+    """
+
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        ## Heap of (priority, sequence number, owner, job index). Reprioritized
+        ## jobs are pushed again, stale entries are skipped when popped, so
+        ## jobs_queued counts unstarted jobs rather than heap entries.
+        self.job_heap: list[tuple[int, int, Hashable, int]] = []
+        self.job_seq: int = 0
+        self.jobs_queued: int = 0
+        self.worker_count: int = 0
+        self.owner_dict: dict[Hashable, ProbeOwnerState] = {}
+        self.owners_pending: int = 0
+        self.done_callback_list: list[Callable[[Hashable], None]] = []
+
+    def add_done_callback(self, callback: Callable[[Hashable], None]) -> None:
+        """
+        Registers a function to be called whenever all of an owner's probe
+        jobs have finished. The callback runs in a worker thread.
+        """
+
+        with self.lock:
+            self.done_callback_list.append(callback)
+
+    def submit(
+        self,
+        owner: Hashable,
+        job_list: list[Callable[[], None]],
+        priority: int = PRIORITY_BACKGROUND,
+    ) -> None:
+        """
+        Queues the probe jobs of an owner. Submitting the same owner twice
+        does nothing.
+        """
+
+        with self.lock:
+            if owner in self.owner_dict:
+                return
+            self.owner_dict[owner] = ProbeOwnerState(job_list)
+            if len(job_list) != 0:
+                self.owners_pending += 1
+            self.__queue_owner(owner, priority)
+        if len(job_list) == 0:
+            self.__run_done_callbacks(owner)
+
+    def prioritize(
+        self, owner_list: list[Hashable], priority: int = PRIORITY_VISIBLE
+    ) -> None:
+        """
+        Moves the jobs of the specified owners that haven't started yet ahead
+        of all queued jobs with a lower priority.
+        """
+
+        with self.lock:
+            for owner in owner_list:
+                if owner in self.owner_dict:
+                    self.__queue_owner(owner, priority)
+
+    def is_done(self, owner: Hashable) -> bool:
+        """
+        Returns True if all of an owner's probe jobs have finished.
+        """
+
+        with self.lock:
+            if owner not in self.owner_dict:
+                return False
+            return self.owner_dict[owner].done_event.is_set()
+
+    def all_done(self) -> bool:
+        """
+        Returns True if every probe job submitted so far has finished.
+        """
+
+        with self.lock:
+            return self.owners_pending == 0
+
+    def wait(self, owner: Hashable) -> None:
+        """
+        Waits for all of an owner's probe jobs to finish, moving them to the
+        front of the queue first. Re-raises the first exception raised by any
+        of the owner's jobs.
+        """
+
+        with self.lock:
+            owner_state: ProbeOwnerState = self.owner_dict[owner]
+        if not owner_state.done_event.is_set():
+            self.prioritize([owner], PRIORITY_SELECTED)
+            owner_state.done_event.wait()
+        if owner_state.error is not None:
+            raise owner_state.error
+
+    def forget(self, owner: Hashable) -> None:
+        """
+        Forgets an owner and the results of its probe jobs, so that it can be
+        submitted again. Waits for any of its jobs that are still queued or
+        running to finish first, so that they can't store stale results
+        after the owner is probed again.
+        """
+
+        with self.lock:
+            owner_state: ProbeOwnerState | None = self.owner_dict.get(owner)
+        if owner_state is None:
+            return
+        if not owner_state.done_event.is_set():
+            self.prioritize([owner], PRIORITY_SELECTED)
+            owner_state.done_event.wait()
+        with self.lock:
+            if self.owner_dict.get(owner) is owner_state:
+                del self.owner_dict[owner]
+
+    def __queue_owner(self, owner: Hashable, priority: int) -> None:
+        """
+        Pushes heap entries for an owner's unstarted jobs, and starts workers
+        as needed. Must be called with the lock held.
+        """
+
+        owner_state: ProbeOwnerState = self.owner_dict[owner]
+        if owner_state.priority is None:
+            self.jobs_queued += owner_state.job_started_list.count(False)
+        elif owner_state.priority <= priority:
+            return
+        owner_state.priority = priority
+        for job_idx, job_started in enumerate(owner_state.job_started_list):
+            if job_started:
+                continue
+            heapq.heappush(
+                self.job_heap, (priority, self.job_seq, owner, job_idx)
+            )
+            self.job_seq += 1
+
+        while self.worker_count < min(
+            self.jobs_queued, probe_worker_count(PROBE_WORKERS_MAX)
+        ):
+            self.worker_count += 1
+            threading.Thread(
+                target=self.__worker,
+                name="browser-choice-probe",
+                daemon=True,
+            ).start()
+
+    def __next_job(self) -> tuple[Hashable, int] | None:
+        """
+        Pops the highest priority job that hasn't started yet. Returns None if
+        there is nothing left to do. Must be called with the lock held.
+        """
+
+        while len(self.job_heap) > 0:
+            _, _, owner, job_idx = heapq.heappop(self.job_heap)
+            ## Entries of forgotten owners may still be in the heap.
+            owner_state: ProbeOwnerState | None = self.owner_dict.get(owner)
+            if owner_state is None or owner_state.job_started_list[job_idx]:
+                continue
+            owner_state.job_started_list[job_idx] = True
+            self.jobs_queued -= 1
+            return owner, job_idx
+        return None
+
+    def __worker(self) -> None:
+        """
+        Worker thread main loop. Runs queued jobs until none are left.
+        """
+
+        while True:
+            with self.lock:
+                next_job: tuple[Hashable, int] | None = self.__next_job()
+                if next_job is None:
+                    self.worker_count -= 1
+                    return
+                owner, job_idx = next_job
+                owner_state: ProbeOwnerState = self.owner_dict[owner]
+
+            job_error: BaseException | None = None
+            try:
+                owner_state.job_list[job_idx]()
+            except Exception as e:
+                job_error = e
+
+            with self.lock:
+                if job_error is not None and owner_state.error is None:
+                    owner_state.error = job_error
+                owner_state.jobs_remaining -= 1
+                owner_done: bool = owner_state.jobs_remaining == 0
+                if owner_done:
+                    owner_state.done_event.set()
+                    self.owners_pending -= 1
+            if owner_done:
+                self.__run_done_callbacks(owner)
+
+    def __run_done_callbacks(self, owner: Hashable) -> None:
+        """
+        Calls all registered done callbacks for an owner. A failing callback
+        must not take a worker thread down with it, so errors are only
+        printed.
+        """
+
+        with self.lock:
+            callback_list: list[Callable[[Hashable], None]] = list(
+                self.done_callback_list
+            )
+        for callback in callback_list:
+            try:
+                callback(owner)
+            except Exception:
+                traceback.print_exc()
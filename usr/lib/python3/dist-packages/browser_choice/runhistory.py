@@ -0,0 +1,283 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+runhistory.py - Keeps an index of the runs recorded in browser-choice's log
+file, so that the output of any past run can be read without scanning the
+whole log file.
+"""
+
+import gzip
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Iterator
+
+from browser_choice.logwriter import LOG_FILE_KEEP_COUNT, get_old_log_path
+
+## Size of the pieces a run's output is read in, in bytes.
+RUN_OUTPUT_CHUNK_SIZE: int = 65536
+
+
+def is_int(value: Any) -> bool:
+    """
+    Returns True if a value loaded from JSON is an integer. JSON booleans
+    load as bools, which Python also considers integers.
+    """
+
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_log_position(entry_dict: dict[str, Any]) -> bool:
+    """
+    Returns True if a run or operation has a valid "log-file" and "offset".
+    """
+
+    return all(
+        is_int(entry_dict.get(key)) and entry_dict[key] >= 0
+        for key in ("log-file", "offset")
+    )
+
+
+def is_valid_operation(operation_dict: Any) -> bool:
+    """
+    Returns True if an operation loaded from a run index has all keys
+    described in RunIndex, with values of the right types.
+    """
+
+    if not isinstance(operation_dict, dict) or not is_log_position(
+        operation_dict
+    ):
+        return False
+    exit_status: Any = operation_dict.get("exit-status")
+    successful: Any = operation_dict.get("successful")
+    return (
+        all(
+            isinstance(operation_dict.get(key), str)
+            for key in ("plugin", "repo", "mode")
+        )
+        and (exit_status is None or is_int(exit_status))
+        and (successful is None or isinstance(successful, bool))
+    )
+
+
+def is_valid_run(run_dict: Any) -> bool:
+    """
+    Returns True if a run loaded from a run index has all keys described in
+    RunIndex, with values of the right types. Its operations are checked
+    separately.
+    """
+
+    return (
+        isinstance(run_dict, dict)
+        and is_log_position(run_dict)
+        and isinstance(run_dict.get("timestamp"), str)
+        and isinstance(run_dict.get("operations"), list)
+    )
+
+
+def load_run_list(index_path: Path) -> list[dict[str, Any]]:
+    """
+    Loads the runs from a run index. Returns an empty list if the run index
+    doesn't exist or can't be read. Invalid runs and operations, as left by
+    a damaged or hand-edited run index, are dropped.
+    """
+
+    try:
+        index_dict: Any = json.loads(index_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return []
+    if not isinstance(index_dict, dict):
+        return []
+    run_list: Any = index_dict.get("runs")
+    if not isinstance(run_list, list):
+        return []
+    valid_run_list: list[dict[str, Any]] = []
+    for run_dict in run_list:
+        if not is_valid_run(run_dict):
+            continue
+        run_dict["operations"] = [
+            x for x in run_dict["operations"] if is_valid_operation(x)
+        ]
+        valid_run_list.append(run_dict)
+    return valid_run_list
+
+
+class RunIndex:
+    """
+    Records where each run starts in the log file, along with the software
+    changes it made. Each run is a dict with the following keys:
+
+    - "log-file": Which log file the run starts in. 0 is the log file
+      itself, 1 is log.txt.1.gz and so on.
+    - "offset": Where the run starts in that log file, in bytes.
+    - "timestamp": When the run started.
+    - "operations": The software changes made during the run, each a dict
+      with "log-file" and "offset" like the run, and "plugin", "repo",
+      "mode" and "exit-status". The exit status is null until the change
+      finishes, or if its script couldn't be started or crashed. "successful"
+      is null until the change finishes.
+
+    The run index is saved after every change. Except for loading it, it is
+    only used from the log writer thread.
+    """
+
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self.run_list: list[dict[str, Any]] = load_run_list(path)
+
+    def start_run(self, offset: int, timestamp: str) -> None:
+        """
+        Records a run starting at the specified offset in the log file.
+        """
+
+        self.run_list.append(
+            {
+                "log-file": 0,
+                "offset": offset,
+                "timestamp": timestamp,
+                "operations": [],
+            }
+        )
+        self.save()
+
+    def add_operation(
+        self, offset: int, plugin_name: str, repo_id: str, mode: str
+    ) -> None:
+        """
+        Records a software change of the current run, whose output starts at
+        the specified offset in the log file.
+        """
+
+        if len(self.run_list) == 0:
+            return
+        self.run_list[-1]["operations"].append(
+            {
+                "log-file": 0,
+                "offset": offset,
+                "plugin": plugin_name,
+                "repo": repo_id,
+                "mode": mode,
+                "exit-status": None,
+                "successful": None,
+            }
+        )
+        self.save()
+
+    def finish_operation(
+        self, operation_idx: int, exit_code: int | None
+    ) -> None:
+        """
+        Records the result of a software change of the current run.
+        """
+
+        if len(self.run_list) == 0:
+            return
+        operation_list: list[dict[str, Any]] = self.run_list[-1]["operations"]
+        if operation_idx >= len(operation_list):
+            return
+        operation_list[operation_idx]["exit-status"] = exit_code
+        operation_list[operation_idx]["successful"] = exit_code == 0
+        self.save()
+
+    def log_rotated(self) -> None:
+        """
+        Accounts for the log file having been rotated, forgetting runs that
+        started in old log files that have been deleted.
+        """
+
+        for run_dict in self.run_list:
+            run_dict["log-file"] += 1
+            for operation_dict in run_dict["operations"]:
+                operation_dict["log-file"] += 1
+        self.run_list = [
+            x for x in self.run_list if x["log-file"] <= LOG_FILE_KEEP_COUNT
+        ]
+        self.save()
+
+    def save(self) -> None:
+        """
+        Saves the run index, replacing the old one at once so that it is
+        never left half-written. Failing to save it is ignored.
+        """
+
+        temp_path: Path = self.path.with_name(self.path.name + ".tmp")
+        try:
+            temp_path.write_text(
+                json.dumps({"runs": self.run_list}), encoding="utf-8"
+            )
+            os.replace(temp_path, self.path)
+        except OSError:
+            pass
+
+
+def read_log_range(path: Path, start: int, end: int | None) -> Iterator[bytes]:
+    """
+    Reads part of a log file, from the start offset to the end offset, or to
+    the end of the file if end is None. Only the requested part of the log
+    file is read. Compressed old log files have to be decompressed up to the
+    start offset though.
+    """
+
+    try:
+        if path.name.endswith(".gz"):
+            with gzip.open(path, mode="rb") as compressed_file:
+                compressed_file.seek(start)
+                while end is None or start < end:
+                    chunk: bytes = compressed_file.read(
+                        RUN_OUTPUT_CHUNK_SIZE
+                        if end is None
+                        else min(RUN_OUTPUT_CHUNK_SIZE, end - start)
+                    )
+                    if chunk == b"":
+                        return
+                    start += len(chunk)
+                    yield chunk
+            return
+
+        with open(path, mode="rb") as log_file:
+            ## Empty files can't be memory-mapped.
+            if os.fstat(log_file.fileno()).st_size <= start:
+                return
+            with mmap.mmap(
+                log_file.fileno(), 0, access=mmap.ACCESS_READ
+            ) as log_map:
+                if end is None or end > len(log_map):
+                    end = len(log_map)
+                for chunk_start in range(start, end, RUN_OUTPUT_CHUNK_SIZE):
+                    yield log_map[
+                        chunk_start : min(
+                            chunk_start + RUN_OUTPUT_CHUNK_SIZE, end
+                        )
+                    ]
+    except (OSError, EOFError, gzip.BadGzipFile):
+        return
+
+
+def read_run_output(
+    log_path: Path, run_list: list[dict[str, Any]], run_idx: int
+) -> Iterator[bytes]:
+    """
+    Reads the part of the log files a run wrote, which ends where the next
+    run starts. A run may continue from an old log file into newer ones if
+    the log file was rotated while it was running.
+    """
+
+    run_dict: dict[str, Any] = run_list[run_idx]
+    start_file_idx: int = run_dict["log-file"]
+    start_offset: int = run_dict["offset"]
+    end_file_idx: int = 0
+    end_offset: int | None = None
+    if run_idx + 1 < len(run_list):
+        end_file_idx = run_list[run_idx + 1]["log-file"]
+        end_offset = run_list[run_idx + 1]["offset"]
+
+    for file_idx in range(start_file_idx, end_file_idx - 1, -1):
+        yield from read_log_range(
+            get_old_log_path(log_path, file_idx),
+            start_offset if file_idx == start_file_idx else 0,
+            end_offset if file_idx == end_file_idx else None,
+        )
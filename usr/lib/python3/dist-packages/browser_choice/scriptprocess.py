@@ -0,0 +1,60 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+scriptprocess.py - Runs plugin-defined scripts asynchronously with QProcess.
+"""
+
+from PyQt5.QtCore import (
+    QObject,
+    QProcess,
+)
+
+from browser_choice.browser_choice_core import ChoicePluginRepo
+
+
+def run_plugin_script(
+    script: str,
+    set_x: bool = False,
+    detach: bool = False,
+    parent: QObject | None = None,
+) -> QProcess:
+    """
+    Runs the provided script asynchronously with QProcess. Used to run
+    plugin-defined scripts.
+    """
+
+    if set_x:
+        script = "set -x; " + script
+
+    output_process: QProcess = QProcess(parent)
+    output_process.setProgram("/usr/bin/bash")
+    output_process.setProcessChannelMode(QProcess.MergedChannels)
+    output_process.setArguments(
+        [
+            "-c",
+            "--",
+            script,
+        ]
+    )
+    if detach:
+        output_process.startDetached()
+    else:
+        output_process.start()
+        if not output_process.waitForStarted():
+            raise OSError("Failed to start script!")
+    return output_process
+
+
+def run_launch(repo: ChoicePluginRepo, extra_args: str | None = None) -> None:
+    """
+    Run a repo's 'launch-script' asynchronously, detached from the parent so
+    the parent can terminate without terminating the child.
+    """
+
+    if extra_args is None:
+        run_plugin_script(repo.launch_script, detach=True)
+    else:
+        run_plugin_script(repo.launch_script + " " + extra_args, detach=True)
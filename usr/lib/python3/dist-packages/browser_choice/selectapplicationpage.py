@@ -9,7 +9,6 @@
 selectapplicationpage.py - Displays a list of applications to the user.
 """
 
-import copy
 import functools
 
 from PyQt5.QtCore import pyqtSignal
@@ -35,6 +34,7 @@ class SelectApplicationPage(QWidget):
 
     cancelClicked: pyqtSignal = pyqtSignal()
     continueClicked: pyqtSignal = pyqtSignal()
+    currentTabChanged: pyqtSignal = pyqtSignal(int)
 
     # pylint: disable=too-many-arguments
     def __init__(
@@ -54,6 +54,59 @@ class SelectApplicationPage(QWidget):
         self.ui.cancelButton.clicked.connect(self.cancelClicked)
         self.ui.continueButton.clicked.connect(self.continueClicked)
 
+        self.setRestrictType(restrict_type)
+        self.setShowUnofficialWarning(show_unofficial_warning)
+        self.setNetworkConnected(is_network_connected)
+
+        self.card_view_list: list[CardView] = []
+        self.app_type_list: list[str] = []
+        self.current_card: BrowserCard | None = None
+        self.continue_allowed: bool = True
+
+        for idx, app_type in enumerate(app_type_list):
+            self.addCategory(app_type)
+            for card in card_group_list[idx]:
+                self.addCard(idx, card)
+
+        self.ui.appChooserTabWidget.currentChanged.connect(
+            self.currentTabChanged
+        )
+
+    def addCategory(self, app_type: str) -> int:
+        """
+        Adds a tab for a new application category. Returns the index of the
+        new tab.
+        """
+
+        app_type_widget: QWidget = QWidget()
+        app_type_layout: QVBoxLayout = QVBoxLayout(app_type_widget)
+        card_view: CardView = CardView("BrowserCard")
+        card_view.itemSelected.connect(self.item_selected)
+        self.card_view_list.append(card_view)
+        self.app_type_list.append(app_type)
+        app_type_layout.addWidget(card_view)
+        return self.ui.appChooserTabWidget.addTab(app_type_widget, app_type)
+
+    def addCard(self, category_idx: int, card: BrowserCard) -> None:
+        """
+        Adds an application card to the tab of an application category.
+        """
+
+        self.card_view_list[category_idx].add_card(card)
+        card.toggled.connect(
+            functools.partial(
+                self.card_selected,
+                card,
+            )
+        )
+
+    def setRestrictType(self, restrict_type: str) -> None:
+        """
+        Shows the notice explaining how the environment browser-choice runs
+        in restricts software changes, if any.
+        """
+
+        self.ui.restrictNoticeLabel.setVisible(True)
         match restrict_type:
             case "appvm":
                 self.ui.restrictNoticeLabel.setText(GlobalData.appvm_warn_label)
@@ -76,36 +129,37 @@ class SelectApplicationPage(QWidget):
             case _:
                 self.ui.restrictNoticeLabel.setVisible(False)
 
-        if show_unofficial_warning:
-            self.ui.fossNoticeLabel.setVisible(False)
-        else:
-            self.ui.nonFossWarningLabel.setVisible(False)
+    def setNetworkConnected(self, is_network_connected: bool) -> None:
+        """
+        Shows or hides the warning about missing network access.
+        """
 
-        if is_network_connected:
-            self.ui.noNetworkWarningLabel.setVisible(False)
+        self.ui.noNetworkWarningLabel.setVisible(not is_network_connected)
 
-        self.card_view_list: list[CardView] = []
-        self.app_type_list = copy.copy(app_type_list)
-        self.current_card: BrowserCard | None = None
+    def setContinueAllowed(self, val: bool) -> None:
+        """
+        Allows or disallows continuing to the next page. If allowed, the
+        continue button is enabled once an application is selected.
+        """
 
-        for idx, app_type in enumerate(app_type_list):
-            app_type_widget: QWidget = QWidget()
-            app_type_layout: QVBoxLayout = QVBoxLayout(app_type_widget)
-            card_view: CardView = CardView("BrowserCard")
-            card_view.itemSelected.connect(
-                functools.partial(self.ui.continueButton.setEnabled, True)
-            )
-            self.card_view_list.append(card_view)
-            for card in card_group_list[idx]:
-                card_view.add_card(card)
-                card.toggled.connect(
-                    functools.partial(
-                        self.card_selected,
-                        card,
-                    )
-                )
-            app_type_layout.addWidget(card_view)
-            self.ui.appChooserTabWidget.addTab(app_type_widget, app_type)
+        self.continue_allowed = val
+        self.ui.continueButton.setEnabled(val and self.current_card is not None)
+
+    def item_selected(self) -> None:
+        """
+        Qt signal handler. Triggered when the user selects an application.
+        """
+
+        self.ui.continueButton.setEnabled(self.continue_allowed)
+
+    def setShowUnofficialWarning(self, show_unofficial_warning: bool) -> None:
+        """
+        Shows the warning about unofficial plugins, or the notice about
+        official plugins if there are none.
+        """
+
+        self.ui.fossNoticeLabel.setVisible(not show_unofficial_warning)
+        self.ui.nonFossWarningLabel.setVisible(show_unofficial_warning)
 
     def card_selected(self, card: BrowserCard) -> None:
         """
@@ -0,0 +1,312 @@
+#!/usr/bin/python3 -su
+
+# Copyright (C) 2025 - 2025 ENCRYPTED SUPPORT LLC <adrelanos@whonix.org>
+# See the file COPYING for copying conditions.
+
+"""
+tracer.py - Records how long each phase of browser-choice's startup takes,
+when enabled by setting BROWSER_CHOICE_TRACE to the path of a trace file.
+The trace is written in the Chrome trace event format, which can be viewed
+with chrome://tracing or https://ui.perfetto.dev/, along with a plain text
+summary of the slowest spans.
+"""
+
+## NOTE: This module must not import anything from browser_choice, since
+## it is used while the browser_choice package is initialized.
+
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Iterator,
+    ParamSpec,
+    TypeVar,
+)
+
+TRACE_ENV_VAR: str = "BROWSER_CHOICE_TRACE"
+## Number of entries in each list of the trace summary.
+TRACE_SUMMARY_COUNT: int = 15
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class TraceSpan:
+    """
+    A span being recorded. Spans started with Tracer.span are nested within
+    the span that was open in the same thread when they started. Async spans
+    may overlap other spans, so they are never nested.
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        owner: "Tracer",
+        name: str,
+        arg_dict: dict[str, Any],
+        parent: "TraceSpan | None",
+        is_async: bool = False,
+    ):
+        self.owner: Tracer = owner
+        self.name: str = name
+        self.arg_dict: dict[str, Any] = arg_dict
+        self.parent: TraceSpan | None = parent
+        self.is_async: bool = is_async
+        self.thread_id: int = threading.get_native_id()
+        self.thread_name: str = threading.current_thread().name
+        self.child_ns: int = 0
+        self.end_ns: int | None = None
+        self.start_ns: int = time.monotonic_ns()
+
+    def finish(self) -> None:
+        """
+        Ends the span.
+        """
+
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.monotonic_ns()
+        if self.parent is not None:
+            self.parent.child_ns += self.end_ns - self.start_ns
+        self.owner.add_span(self)
+
+
+class Tracer:
+    """
+    Records spans, if a trace file path is specified. Otherwise, recording
+    spans does nothing.
+    """
+
+    def __init__(self, trace_path: Path | None):
+        self.trace_path: Path | None = trace_path
+        self.enabled: bool = trace_path is not None
+        self.origin_ns: int = time.monotonic_ns()
+        self.lock: threading.Lock = threading.Lock()
+        self.span_list: list[TraceSpan] = []
+        self.thread_state: threading.local = threading.local()
+
+    @contextlib.contextmanager
+    def span(self, name: str, **arg_dict: Any) -> Iterator[None]:
+        """
+        Records a span covering a with block.
+        """
+
+        parent: TraceSpan | None = getattr(
+            self.thread_state, "current_span", None
+        )
+        recorded_span: TraceSpan = TraceSpan(self, name, arg_dict, parent)
+        self.thread_state.current_span = recorded_span
+        try:
+            yield
+        finally:
+            recorded_span.finish()
+            self.thread_state.current_span = parent
+
+    def add_span(self, recorded_span: TraceSpan) -> None:
+        """
+        Adds a finished span to the trace.
+        """
+
+        with self.lock:
+            self.span_list.append(recorded_span)
+
+    def write(self) -> None:
+        """
+        Writes the trace file, and the trace summary next to it, with a .txt
+        suffix.
+        """
+
+        if self.trace_path is None:
+            return
+        with self.lock:
+            span_list: list[TraceSpan] = list(self.span_list)
+        summary_path: Path = self.trace_path.with_suffix(".txt")
+        try:
+            self.trace_path.write_text(
+                json.dumps(self.__get_trace_dict(span_list)), encoding="utf-8"
+            )
+            summary_path.write_text(
+                get_trace_summary(span_list), encoding="utf-8"
+            )
+        except OSError as e:
+            print(f"WARNING: Could not write trace: {e}", file=sys.stderr)
+            return
+        print(
+            f"INFO: Wrote trace to '{self.trace_path}' and its summary to "
+            f"'{summary_path}'.",
+            file=sys.stderr,
+        )
+
+    def __get_trace_dict(self, span_list: list[TraceSpan]) -> dict[str, Any]:
+        """
+        Converts spans to Chrome trace events.
+        """
+
+        pid: int = os.getpid()
+        event_list: list[dict[str, Any]] = []
+        thread_name_dict: dict[int, str] = {}
+        for async_id, recorded_span in enumerate(span_list):
+            assert recorded_span.end_ns is not None
+            thread_name_dict[recorded_span.thread_id] = (
+                recorded_span.thread_name
+            )
+            event_dict: dict[str, Any] = {
+                "name": recorded_span.name,
+                "cat": "browser-choice",
+                "ts": (recorded_span.start_ns - self.origin_ns) / 1000,
+                "pid": pid,
+                "tid": recorded_span.thread_id,
+                "args": recorded_span.arg_dict,
+            }
+            if not recorded_span.is_async:
+                event_dict["ph"] = "X"
+                event_dict["dur"] = (
+                    recorded_span.end_ns - recorded_span.start_ns
+                ) / 1000
+                event_list.append(event_dict)
+                continue
+            event_dict["ph"] = "b"
+            event_dict["id"] = async_id
+            event_list.append(event_dict)
+            event_list.append(
+                {
+                    "name": recorded_span.name,
+                    "cat": "browser-choice",
+                    "ph": "e",
+                    "ts": (recorded_span.end_ns - self.origin_ns) / 1000,
+                    "pid": pid,
+                    "tid": recorded_span.thread_id,
+                    "id": async_id,
+                }
+            )
+        for thread_id, thread_name in thread_name_dict.items():
+            event_list.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": thread_id,
+                    "args": {"name": thread_name},
+                }
+            )
+        return {"traceEvents": event_list, "displayTimeUnit": "ms"}
+
+
+def get_trace_summary(span_list: list[TraceSpan]) -> str:
+    """
+    Returns a plain text summary of spans, listing the span names that took
+    the most time in total not counting nested spans, and the slowest
+    individual spans.
+    """
+
+    total_dict: dict[str, list[int]] = {}
+    for recorded_span in span_list:
+        assert recorded_span.end_ns is not None
+        ## Count, total time, time not spent in nested spans, longest time.
+        total_list: list[int] = total_dict.setdefault(
+            recorded_span.name, [0, 0, 0, 0]
+        )
+        duration_ns: int = recorded_span.end_ns - recorded_span.start_ns
+        total_list[0] += 1
+        total_list[1] += duration_ns
+        total_list[2] += duration_ns - recorded_span.child_ns
+        total_list[3] = max(total_list[3], duration_ns)
+
+    line_list: list[str] = [
+        "Span names by time not spent in nested spans:",
+        f"{'self ms':>10} {'total ms':>10} {'max ms':>10} {'count':>6}  name",
+    ]
+    for name, total_list in sorted(
+        total_dict.items(), key=lambda x: x[1][2], reverse=True
+    )[:TRACE_SUMMARY_COUNT]:
+        line_list.append(
+            f"{total_list[2] / 1e6:10.1f} {total_list[1] / 1e6:10.1f} "
+            f"{total_list[3] / 1e6:10.1f} {total_list[0]:6}  {name}"
+        )
+
+    line_list.extend(["", "Slowest spans:", f"{'ms':>10}  name"])
+    for recorded_span in sorted(
+        span_list,
+        key=lambda x: (x.end_ns or x.start_ns) - x.start_ns,
+        reverse=True,
+    )[:TRACE_SUMMARY_COUNT]:
+        assert recorded_span.end_ns is not None
+        arg_str: str = " ".join(
+            f"{key}={value!r}" for key, value in recorded_span.arg_dict.items()
+        )
+        line_list.append(
+            f"{(recorded_span.end_ns - recorded_span.start_ns) / 1e6:10.1f}  "
+            f"{recorded_span.name} {arg_str}".rstrip()
+        )
+    return "\n".join(line_list) + "\n"
+
+
+def get_trace_path() -> Path | None:
+    """
+    Returns the trace file path specified in the environment, or None if
+    tracing is disabled.
+    """
+
+    trace_path_str: str = os.environ.get(TRACE_ENV_VAR, "")
+    if trace_path_str == "":
+        return None
+    return Path(trace_path_str).absolute()
+
+
+tracer: Tracer = Tracer(get_trace_path())
+
+
+def trace_span(name: str, **arg_dict: Any) -> ContextManager[None]:
+    """
+    Records a span covering a with block, if tracing is enabled.
+    """
+
+    if not tracer.enabled:
+        return contextlib.nullcontext()
+    return tracer.span(name, **arg_dict)
+
+
+def start_async_span(name: str, **arg_dict: Any) -> TraceSpan | None:
+    """
+    Starts recording a span that is finished later, from a callback for
+    instance, if tracing is enabled. Returns None otherwise.
+    """
+
+    if not tracer.enabled:
+        return None
+    return TraceSpan(tracer, name, arg_dict, None, is_async=True)
+
+
+def finish_async_span(async_span: TraceSpan | None) -> None:
+    """
+    Finishes recording a span started with start_async_span.
+    """
+
+    if async_span is not None:
+        async_span.finish()
+
+
+def trace_function(func: Callable[P, R]) -> Callable[P, R]:
+    """
+    Decorator recording a span for each call of a function, named after it,
+    if tracing is enabled. Otherwise, the function is left alone.
+    """
+
+    if not tracer.enabled:
+        return func
+
+    @functools.wraps(func)
+    def traced_func(*args: P.args, **kwargs: P.kwargs) -> R:
+        with tracer.span(func.__qualname__):
+            return func(*args, **kwargs)
+
+    return traced_func